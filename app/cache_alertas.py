@@ -0,0 +1,67 @@
+import gzip
+import threading
+from collections import OrderedDict
+from datetime import datetime, timezone
+from scripts.base_datos import BD_PATH, estado_alertas, leer_alertas
+
+# Por debajo de este tamaño comprimir no compensa
+MIN_BYTES_GZIP = 1024
+
+
+class AlertasEnCache:
+    """
+    Sirve las alertas publicadas en la base de datos. Cada consulta filtra y pagina con los
+    indices de SQLite; las ultimas respuestas ya serializadas (y comprimidas) se guardan por
+    consulta y se descartan cuando el pipeline publica una nueva version de las alertas.
+    """
+    def __init__(self, ruta=BD_PATH, max_respuestas=64):
+        self.ruta = ruta
+        self.max_respuestas = max_respuestas
+        self._lock = threading.Lock()
+        self._version = None
+        self._respuestas = OrderedDict()
+
+    def _comprobar_version(self):
+        """Version de las alertas publicadas; vacia las respuestas guardadas si ha cambiado."""
+        version, _ = estado_alertas(self.ruta)
+        with self._lock:
+            if version != self._version:
+                self._version = version
+                self._respuestas.clear()
+        return version
+
+    def estado(self):
+        """(version, ultima_modificacion) de las alertas publicadas; (None, None) si no hay."""
+        version = self._comprobar_version()
+        if version is None:
+            return None, None
+        publicadas = datetime.fromtimestamp(int(version) / 1e9, tz=timezone.utc).replace(microsecond=0)
+        return version, publicadas
+
+    def consultar(self, fecha=None, sector=None, departamento=None, q=None, limit=None, offset=0, orden=()):
+        """
+        Filtra, ordena (ver leer_alertas) y pagina las alertas acumuladas (o solo las de `fecha`).
+        Devuelve (version, cuerpo_json, cuerpo_gzip, total), donde
+        `total` es el numero de alertas que cumplen los filtros antes de paginar y `cuerpo_gzip`
+        es None si el cuerpo es demasiado pequeño para comprimirlo.
+        """
+        version = self._comprobar_version()
+        consulta = (fecha, sector, departamento, q, limit, offset, tuple(orden))
+        with self._lock:
+            guardada = self._respuestas.get(consulta)
+            if guardada is not None:
+                self._respuestas.move_to_end(consulta)
+                return (version,) + guardada
+
+        total, df = leer_alertas(fecha, sector, departamento, q, limit, offset, orden, ruta=self.ruta)
+        cuerpo = df.to_json(orient="records", force_ascii=False).encode("utf-8")
+        comprimido = gzip.compress(cuerpo, compresslevel=6) if len(cuerpo) >= MIN_BYTES_GZIP else None
+        respuesta = (cuerpo, comprimido, total)
+
+        with self._lock:
+            # Solo la guardamos si no se han publicado alertas nuevas mientras la preparabamos
+            if self._version == version:
+                self._respuestas[consulta] = respuesta
+                if len(self._respuestas) > self.max_respuestas:
+                    self._respuestas.popitem(last=False)
+        return (version,) + respuesta
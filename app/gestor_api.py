@@ -1,13 +1,125 @@
-from flask import Flask, jsonify, request
+from flask import Flask, Response, g, jsonify, request
 from flask_cors import CORS
 import os
-import subprocess
-import sys
+import time
+import sqlite3
+import hashlib
+from datetime import date
+
+from run_prediction_pipeline import ejecutar_pipeline_predictivo
+from scripts.modelo import ModeloEnCaliente
+from app.trabajos import GestorTrabajos, ColaLlena
+from app.predictor import PredictorMicroLotes, ModeloNoDisponible
+from app.cache_alertas import AlertasEnCache
+from app.metricas import CONTENT_TYPE as CONTENT_TYPE_METRICAS, CUBOS_PIPELINE, Registro
+from scripts.alertas import ALERTAS_PATH
+from scripts.buscador import Buscador, MAX_RESULTADOS
+from scripts.base_datos import BD_MUESTRA, BD_PATH
+
+MAX_TITULOS_PREDICT = 10000
 
 # --- Inicialización de la App ---
 app = Flask(__name__)
 CORS(app)
 
+# El modelo se carga una vez y se recarga solo si se promueve otra version en el registro
+modelo_en_caliente = ModeloEnCaliente()
+# Un unico hilo ejecuta los pipelines: publican las alertas y no deben solaparse
+gestor_trabajos = GestorTrabajos(max_workers=1, max_pendientes=8)
+# Las peticiones a /predict que llegan a la vez se puntuan juntas en un solo lote
+predictor = PredictorMicroLotes(modelo_en_caliente.obtener_con_version, ventana=0.005)
+# Bases de datos consultables con ?bd=: la real (por defecto) y la del modo muestra del pipeline
+BASES_DATOS = {"real": BD_PATH, "muestra": BD_MUESTRA}
+# Alertas consultadas en cada base de datos; las respuestas se guardan hasta que se publican otras
+alertas_en_cache = {bd: AlertasEnCache(ruta) for bd, ruta in BASES_DATOS.items()}
+# Indice de texto completo sobre todas las normas de cada base de datos
+buscadores = {bd: Buscador(ruta) for bd, ruta in BASES_DATOS.items()}
+
+# --- Metricas (expuestas en /metrics) ---
+metricas = Registro()
+peticiones_http = metricas.contador(
+    "boe_api_peticiones_total", "Peticiones HTTP atendidas, por ruta, metodo y codigo de respuesta.",
+    ("ruta", "metodo", "codigo"))
+duracion_peticiones = metricas.histograma(
+    "boe_api_peticion_duracion_segundos", "Tiempo de respuesta de las peticiones HTTP, por ruta y metodo.",
+    ("ruta", "metodo"))
+peticiones_en_curso = metricas.indicador("boe_api_peticiones_en_curso", "Peticiones HTTP que se estan atendiendo.")
+ejecuciones_pipeline = metricas.contador(
+    "boe_pipeline_ejecuciones_total", "Ejecuciones del pipeline lanzadas desde la API, por modo y estado final.",
+    ("modo", "estado"))
+duracion_pipeline = metricas.histograma(
+    "boe_pipeline_duracion_segundos", "Duracion de las ejecuciones del pipeline, por modo.", ("modo",), CUBOS_PIPELINE)
+fin_pipeline = metricas.indicador(
+    "boe_pipeline_ultima_ejecucion_timestamp_segundos", "Momento (epoch) en que termino la ultima ejecucion, por modo.",
+    ("modo",))
+antiguedad_alertas = metricas.indicador(
+    "boe_alertas_json_antiguedad_segundos", f"Segundos desde la ultima escritura de {ALERTAS_PATH} (NaN si no existe).")
+modelo_info = metricas.indicador("boe_modelo_info", "Version del modelo cargado en memoria (siempre 1).", ("version",))
+carga_modelo = metricas.indicador("boe_modelo_carga_segundos", "Duracion de la ultima carga del modelo en memoria.")
+modelo_cargado_en = metricas.indicador(
+    "boe_modelo_carga_timestamp_segundos", "Momento (epoch) en que se cargo el modelo en memoria.")
+
+
+@metricas.al_exponer
+def _actualizar_metricas_calculadas():
+    """Valores que se leen al exponer las metricas, no en cada peticion."""
+    try:
+        antiguedad_alertas.fijar(valor=time.time() - os.path.getmtime(ALERTAS_PATH))
+    except OSError:
+        antiguedad_alertas.fijar(valor=float("nan"))
+    # Sin forzar la carga: solo lo que ya hay en memoria
+    version = modelo_en_caliente.version
+    modelo_info.reemplazar({(version,): 1} if version is not None else {})
+    if modelo_en_caliente.segundos_carga is not None:
+        carga_modelo.fijar(valor=modelo_en_caliente.segundos_carga)
+        modelo_cargado_en.fijar(valor=modelo_en_caliente.cargado_en)
+
+
+@app.before_request
+def _empezar_medicion():
+    g.inicio_peticion = time.perf_counter()
+    peticiones_en_curso.incrementar()
+
+
+@app.after_request
+def _anotar_codigo(respuesta):
+    g.codigo_respuesta = respuesta.status_code
+    return respuesta
+
+
+@app.teardown_request
+def _terminar_medicion(_error):
+    # Se ejecuta siempre, tambien si la peticion termina con una excepcion
+    if "inicio_peticion" not in g:
+        return
+    duracion = time.perf_counter() - g.inicio_peticion
+    # La regla ("/jobs/<job_id>") y no la URL, para tener una serie por ruta y no por id
+    ruta = request.url_rule.rule if request.url_rule is not None else "(sin_ruta)"
+    peticiones_http.incrementar(ruta, request.method, g.get("codigo_respuesta", 500))
+    duracion_peticiones.observar(ruta, request.method, valor=duracion)
+    peticiones_en_curso.incrementar(cantidad=-1)
+
+
+def _trabajo_pipeline(mode, progreso):
+    """Trabajo en segundo plano: pipeline con el modelo en memoria."""
+    # 'mode' llega de la query string: como etiqueta solo se admiten dos valores
+    modo = "sample" if mode == "sample" else "api"
+    inicio = time.perf_counter()
+    estado = "excepcion"
+    try:
+        artefactos, version = modelo_en_caliente.obtener_con_version()
+        if artefactos is None:
+            resultado = {"estado": "error", "mensaje": "Modelo no encontrado. Ejecuta 'entrenar_modelo.py' primero."}
+        else:
+            resultado = ejecutar_pipeline_predictivo(usar_muestra=(mode == 'sample'), artefactos=artefactos,
+                                                     progreso=progreso, version_modelo=version)
+        estado = resultado.get("estado", "desconocido")
+        return resultado
+    finally:
+        duracion_pipeline.observar(modo, valor=time.perf_counter() - inicio)
+        ejecuciones_pipeline.incrementar(modo, estado)
+        fin_pipeline.fijar(modo, valor=time.time())
+
 # --- Definición de Rutas (Endpoints) ---
 
 @app.route("/ping", methods=["GET"])
@@ -15,61 +127,179 @@ def ping():
     """Endpoint de salud para verificar que el servicio está activo."""
     return jsonify({"status": "ok", "message": "pong"})
 
+@app.route("/metrics", methods=["GET"])
+def metrics():
+    """Metricas del servicio en el formato de texto de Prometheus."""
+    return Response(metricas.exponer(), content_type=CONTENT_TYPE_METRICAS)
+
 @app.route("/actualizar", methods=["POST"])
 def actualizar():
     """
     Endpoint para lanzar el pipeline de predicción completo.
+    No espera a que termine: encola un trabajo y devuelve su id para consultarlo en /jobs/<id>.
+    Las peticiones repetidas para el mismo modo y fecha se agrupan en el trabajo ya en marcha.
     """
+    # El modo muestra guarda sus resultados en BD_MUESTRA: se consultan con /alertas?bd=muestra
     mode = request.args.get('mode', 'sample')
-    print(f"--- Peticion recibida en /actualizar (Modo: {mode}). Lanzando pipeline de IA... ---")
-    
+    clave = (mode, date.today().isoformat())
+    print(f"--- Peticion recibida en /actualizar (Modo: {mode}). Encolando pipeline de IA... ---")
+
     try:
-        python_executable = sys.executable
-        script_path = "run_prediction_pipeline.py"
-        
-        comando = [python_executable, script_path]
-        if mode == 'sample':
-            comando.append("--muestra")
-
-        # ---- LA CORRECCIÓN ESTÁ AQUÍ ----
-        # Añadimos 'errors='replace'' para que ignore caracteres extraños en la salida.
-        result = subprocess.run(
-            comando,
-            capture_output=True, text=True, check=True, 
-            encoding='utf-8', errors='replace' 
-        )
-        # ---------------------------------
-        
-        print(f"--- Pipeline de IA (Modo: {mode}) completado con exito. ---")
-        return jsonify({
-            "status": "success",
-            "message": f"Pipeline de prediccion (Modo: {mode}) ejecutado con exito."
-        }), 200
-
-    except subprocess.CalledProcessError as e:
-        print(f"--- ERROR: El pipeline de IA (Modo: {mode}) fallo. ---")
-        print("Error del script:", e.stderr)
-        return jsonify({"status": "error", "message": f"Fallo la ejecucion del pipeline de IA (Modo: {mode})."}), 500
-    except Exception as e:
-        print(f"--- ERROR CRITICO en el endpoint /actualizar: {e} ---")
-        return jsonify({"status": "error", "message": str(e)}), 500
+        trabajo, es_nuevo = gestor_trabajos.enviar(clave, _trabajo_pipeline, mode=mode)
+    except ColaLlena as e:
+        return jsonify({"status": "error", "message": str(e)}), 503
+
+    mensaje = (f"Pipeline de prediccion (Modo: {mode}) encolado." if es_nuevo
+               else f"Ya habia un pipeline (Modo: {mode}) en marcha; se reutiliza.")
+    respuesta = jsonify({"status": "accepted", "message": mensaje, "job_id": trabajo["id"],
+                         "deduplicado": not es_nuevo, "job": trabajo})
+    return respuesta, 202, {"Location": f"/jobs/{trabajo['id']}"}
+
+@app.route("/jobs/<job_id>", methods=["GET"])
+def get_job(job_id):
+    """Estado de un trabajo: estado, etapa, progreso, tiempos por etapa y resultado."""
+    trabajo = gestor_trabajos.estado(job_id)
+    if trabajo is None:
+        return jsonify({"status": "error", "message": f"Trabajo '{job_id}' no encontrado."}), 404
+    return jsonify(trabajo)
+
+@app.route("/predict", methods=["POST"])
+def predict():
+    """
+    Puntua titulos al vuelo con el modelo en memoria, sin pasar por el pipeline.
+    Cuerpo JSON: {"titulo": "..."} o {"titulos": ["...", ...]}.
+    Devuelve impacto_predicho, probabilidad (de impacto alto), sector y la version del modelo
+    que hizo la prediccion por titulo.
+    """
+    cuerpo = request.get_json(silent=True) or {}
+    unico = "titulo" in cuerpo
+    titulos = [cuerpo["titulo"]] if unico else cuerpo.get("titulos")
+    if not isinstance(titulos, list) or not titulos or not all(isinstance(t, str) for t in titulos):
+        return jsonify({"status": "error", "message": "Envia 'titulo' (texto) o 'titulos' (lista de textos no vacia)."}), 400
+    if len(titulos) > MAX_TITULOS_PREDICT:
+        return jsonify({"status": "error", "message": f"Como maximo {MAX_TITULOS_PREDICT} titulos por peticion."}), 413
+
+    try:
+        resultados = predictor.predecir(titulos)
+    except ModeloNoDisponible as e:
+        return jsonify({"status": "error", "message": str(e)}), 503
+    except TimeoutError as e:
+        return jsonify({"status": "error", "message": str(e)}), 504
+
+    if unico:
+        return jsonify(resultados[0])
+    return jsonify({"predicciones": resultados, "version_modelo": resultados[0]["version_modelo"]})
+
+def _parametro_entero(nombre, defecto=None):
+    """Parametro entero no negativo de la query string. Lanza ValueError si no lo es."""
+    valor = request.args.get(nombre)
+    if valor in (None, ""):
+        return defecto
+    numero = int(valor)
+    if numero < 0:
+        raise ValueError(f"'{nombre}' no puede ser negativo")
+    return numero
+
+def _base_datos():
+    """Nombre de la base de datos pedida con ?bd= (por defecto, la real). Lanza ValueError si no existe."""
+    bd = request.args.get('bd') or "real"
+    if bd not in BASES_DATOS:
+        raise ValueError(f"'bd' debe ser uno de: {', '.join(BASES_DATOS)}.")
+    return bd
+
+def _etag_consulta(version):
+    return f"{version}-{hashlib.sha1(request.query_string).hexdigest()[:8]}"
 
 @app.route("/alertas", methods=["GET"])
 def get_alertas():
-    """Endpoint para servir el archivo de alertas generado."""
-    ALERTAS_PATH = "data/alertas.json"
-    if not os.path.exists(ALERTAS_PATH):
+    """
+    Endpoint para servir las alertas acumuladas de todos los dias, filtradas y paginadas.
+    Parametros opcionales: fecha, sector, departamento, q (texto en el titulo), limit, offset,
+    orden (columnas separadas por comas, con '-' delante para orden descendente) y bd ('real'
+    o 'muestra', la base de datos del modo muestra del pipeline).
+    El total de alertas que cumplen los filtros va en la cabecera X-Total-Count.
+    Admite peticiones condicionales (ETag / Last-Modified) y comprime con gzip si el cliente lo acepta.
+    """
+    try:
+        limit = _parametro_entero('limit')
+        offset = _parametro_entero('offset', 0)
+    except ValueError:
+        return jsonify({"status": "error", "message": "'limit' y 'offset' deben ser enteros no negativos."}), 400
+    try:
+        alertas = alertas_en_cache[_base_datos()]
+    except ValueError as e:
+        return jsonify({"status": "error", "message": str(e)}), 400
+    filtros = {campo: request.args.get(campo) or None for campo in ('fecha', 'sector', 'departamento', 'q')}
+    orden = tuple(c for c in request.args.get('orden', '').split(',') if c)
+
+    try:
+        version, ultima_modificacion = alertas.estado()
+    except sqlite3.Error as e:
+        print(f"Error al consultar las alertas en la base de datos: {e}")
+        return jsonify({"error": "No se pudieron consultar las alertas"}), 500
+    if version is None:
         return jsonify([])
+
+    # La respuesta solo depende de las alertas publicadas y de la consulta: si el cliente ya la tiene, 304
+    etag = _etag_consulta(version)
+    if request.if_none_match.contains(etag) or (
+            not request.if_none_match and request.if_modified_since
+            and request.if_modified_since >= ultima_modificacion):
+        respuesta = Response(status=304)
+    else:
+        try:
+            version, cuerpo, comprimido, total = alertas.consultar(limit=limit, offset=offset, orden=orden, **filtros)
+        except ValueError as e:
+            return jsonify({"status": "error", "message": str(e)}), 400
+        except sqlite3.Error as e:
+            print(f"Error al consultar las alertas en la base de datos: {e}")
+            return jsonify({"error": "No se pudieron consultar las alertas"}), 500
+        etag = _etag_consulta(version)  # por si se publicaron alertas nuevas entre medias
+        respuesta = Response(cuerpo, mimetype="application/json")
+        respuesta.headers["X-Total-Count"] = str(total)
+        if comprimido is not None and "gzip" in request.accept_encodings:
+            respuesta.set_data(comprimido)
+            respuesta.headers["Content-Encoding"] = "gzip"
+
+    respuesta.set_etag(etag)
+    respuesta.last_modified = ultima_modificacion
+    respuesta.vary.add("Accept-Encoding")
+    respuesta.headers["Access-Control-Expose-Headers"] = "X-Total-Count, ETag"
+    return respuesta
+
+@app.route("/buscar", methods=["GET"])
+def buscar():
+    """
+    Busqueda de texto completo en todas las normas de la base de datos, ordenada por relevancia.
+    Parametros: q (obligatorio), limit, offset, sector, desde, hasta (fechas ISO) y
+    orden ('columna' o '-columna' para ordenar por esa columna en vez de por relevancia) y bd
+    ('real' o 'muestra', como en /alertas).
+    """
+    q = request.args.get('q', '').strip()
+    if not q:
+        return jsonify({"status": "error", "message": "Falta el parametro 'q'."}), 400
     try:
-        with open(ALERTAS_PATH, 'r', encoding='utf-8') as f:
-            data = f.read()
-            if not data: return jsonify([])
-            import json
-            return jsonify(json.loads(data))
-    except (IOError, json.JSONDecodeError) as e:
-        print(f"Error al leer o parsear alertas.json: {e}")
-        return jsonify({"error": "No se pudo procesar el archivo de alertas"}), 500
+        limit = min(_parametro_entero('limit', 20), MAX_RESULTADOS)
+        offset = _parametro_entero('offset', 0)
+    except ValueError:
+        return jsonify({"status": "error", "message": "'limit' y 'offset' deben ser enteros no negativos."}), 400
+
+    inicio = time.perf_counter()
+    try:
+        total, resultados = buscadores[_base_datos()].buscar(
+            q, limit=limit, offset=offset, sector=request.args.get('sector') or None,
+            desde=request.args.get('desde') or None, hasta=request.args.get('hasta') or None,
+            orden=request.args.get('orden') or None)
+    except ValueError as e:
+        return jsonify({"status": "error", "message": str(e)}), 400
+    except sqlite3.Error as e:
+        print(f"Error al consultar el indice de busqueda: {e}")
+        return jsonify({"status": "error", "message": "No se pudo consultar el indice de busqueda."}), 500
+
+    return jsonify({"q": q, "total": total, "limit": limit, "offset": offset, "resultados": resultados,
+                    "tiempo_ms": round((time.perf_counter() - inicio) * 1000, 2)})
 
 if __name__ == "__main__":
+    modelo_en_caliente.obtener()  # Precarga para que la primera peticion no pague la carga
     app.run(debug=False, host='127.0.0.1', port=5001)
 
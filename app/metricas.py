@@ -0,0 +1,156 @@
+import bisect
+import math
+import threading
+
+# --- Metricas en el formato de texto de Prometheus ---
+# Contadores, indicadores e histogramas con etiquetas. Cada metrica tiene su propio lock y
+# solo lo toma para sumar a un dict, asi que registrar una peticion cuesta unos microsegundos
+# aunque el servidor atienda con muchos hilos a la vez.
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+# Limites (en segundos) de los cubos de los histogramas de latencia
+CUBOS_PETICIONES = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+CUBOS_PIPELINE = (0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0, 600.0, 1800.0)
+
+
+def _escapar(valor):
+    return str(valor).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _numero(valor):
+    if math.isnan(valor):
+        return "NaN"
+    if math.isinf(valor):
+        return "+Inf" if valor > 0 else "-Inf"
+    return repr(float(valor)) if isinstance(valor, float) else str(valor)
+
+
+class _Metrica:
+    tipo = None
+
+    def __init__(self, nombre, ayuda, etiquetas=()):
+        self.nombre = nombre
+        self.ayuda = ayuda
+        self.etiquetas = tuple(etiquetas)
+        self._valores = {}
+        self._lock = threading.Lock()
+
+    def _clave(self, valores):
+        if len(valores) != len(self.etiquetas):
+            raise ValueError(f"'{self.nombre}' espera las etiquetas {self.etiquetas}, no {valores}.")
+        return tuple(str(v) for v in valores)
+
+    def _etiquetas(self, clave, extra=()):
+        pares = list(zip(self.etiquetas, clave)) + list(extra)
+        return "{" + ",".join(f'{n}="{_escapar(v)}"' for n, v in pares) + "}" if pares else ""
+
+    def _copia(self):
+        with self._lock:
+            return dict(self._valores)
+
+    def exponer(self):
+        lineas = [f"# HELP {self.nombre} {self.ayuda}", f"# TYPE {self.nombre} {self.tipo}"]
+        lineas.extend(self._muestras())
+        return lineas
+
+    def _muestras(self):
+        return [f"{self.nombre}{self._etiquetas(clave)} {_numero(valor)}" for clave, valor in self._copia().items()]
+
+
+class Contador(_Metrica):
+    """Valor que solo crece (peticiones, ejecuciones...)."""
+    tipo = "counter"
+
+    def incrementar(self, *valores, cantidad=1):
+        clave = self._clave(valores)
+        with self._lock:
+            self._valores[clave] = self._valores.get(clave, 0) + cantidad
+
+
+class Indicador(_Metrica):
+    """Valor que sube y baja (peticiones en curso, antiguedad de un archivo...)."""
+    tipo = "gauge"
+
+    def fijar(self, *valores, valor):
+        clave = self._clave(valores)
+        with self._lock:
+            self._valores[clave] = valor
+
+    def incrementar(self, *valores, cantidad=1):
+        clave = self._clave(valores)
+        with self._lock:
+            self._valores[clave] = self._valores.get(clave, 0) + cantidad
+
+    def reemplazar(self, valores):
+        """Sustituye todas las series por las de `valores` ({tupla de etiquetas: valor})."""
+        nuevos = {self._clave(clave): valor for clave, valor in valores.items()}
+        with self._lock:
+            self._valores = nuevos
+
+
+class Histograma(_Metrica):
+    """Distribucion de valores (duraciones) en cubos acumulados, con su suma y su cuenta."""
+    tipo = "histogram"
+
+    def __init__(self, nombre, ayuda, etiquetas=(), cubos=CUBOS_PETICIONES):
+        super().__init__(nombre, ayuda, etiquetas)
+        self.cubos = tuple(sorted(cubos))
+
+    def observar(self, *valores, valor):
+        clave = self._clave(valores)
+        # Primer cubo cuyo limite es >= valor; el ultimo hueco es +Inf
+        posicion = bisect.bisect_left(self.cubos, valor)
+        with self._lock:
+            serie = self._valores.get(clave)
+            if serie is None:
+                serie = self._valores[clave] = [[0] * (len(self.cubos) + 1), 0.0]
+            serie[0][posicion] += 1
+            serie[1] += valor
+
+    def _copia(self):
+        with self._lock:
+            return {clave: (list(cuentas), suma) for clave, (cuentas, suma) in self._valores.items()}
+
+    def _muestras(self):
+        lineas = []
+        for clave, (cuentas, suma) in self._copia().items():
+            acumulado = 0
+            for limite, cuenta in zip(self.cubos + (math.inf,), cuentas):
+                acumulado += cuenta
+                lineas.append(f"{self.nombre}_bucket{self._etiquetas(clave, [('le', _numero(limite))])} {acumulado}")
+            lineas.append(f"{self.nombre}_sum{self._etiquetas(clave)} {_numero(suma)}")
+            lineas.append(f"{self.nombre}_count{self._etiquetas(clave)} {acumulado}")
+        return lineas
+
+
+class Registro:
+    """
+    Conjunto de metricas que se exponen juntas. Las funciones de `al_exponer` se llaman justo
+    antes de cada exposicion, para los valores que se calculan al consultarlos.
+    """
+    def __init__(self):
+        self._metricas = []
+        self._actualizadores = []
+
+    def _nueva(self, metrica):
+        self._metricas.append(metrica)
+        return metrica
+
+    def contador(self, nombre, ayuda, etiquetas=()):
+        return self._nueva(Contador(nombre, ayuda, etiquetas))
+
+    def indicador(self, nombre, ayuda, etiquetas=()):
+        return self._nueva(Indicador(nombre, ayuda, etiquetas))
+
+    def histograma(self, nombre, ayuda, etiquetas=(), cubos=CUBOS_PETICIONES):
+        return self._nueva(Histograma(nombre, ayuda, etiquetas, cubos))
+
+    def al_exponer(self, funcion):
+        self._actualizadores.append(funcion)
+        return funcion
+
+    def exponer(self):
+        """Todas las metricas en el formato de texto de Prometheus."""
+        for funcion in self._actualizadores:
+            funcion()
+        return "\n".join(linea for metrica in self._metricas for linea in metrica.exponer()) + "\n"
@@ -0,0 +1,99 @@
+import queue
+import threading
+import time
+import pandas as pd
+
+from scripts.modelo import puntuar
+
+
+class ModeloNoDisponible(Exception):
+    """Se lanza cuando todavia no hay un modelo entrenado que servir."""
+
+
+class PredictorMicroLotes:
+    """
+    Agrupa en micro-lotes las peticiones de prediccion que llegan a la vez.
+    Cada peticion deja sus titulos en una cola; un unico hilo recoge todo lo que llega
+    durante `ventana` segundos (o hasta `max_lote` titulos) y lo puntua con una sola
+    llamada a vectorizer.transform / predict_proba. Despues reparte los resultados.
+    `obtener_artefactos` devuelve ((modelo, vectorizer), version) o (None, None)
+    (p. ej. ModeloEnCaliente.obtener_con_version).
+    """
+    def __init__(self, obtener_artefactos, ventana=0.005, max_lote=4096):
+        self.obtener_artefactos = obtener_artefactos
+        self.ventana = ventana
+        self.max_lote = max_lote
+        self.estadisticas = {"peticiones": 0, "titulos": 0, "lotes": 0}
+        self._cola = queue.Queue()
+        self._lock = threading.Lock()
+        self._hilo = None
+
+    def _arrancar(self):
+        with self._lock:
+            if self._hilo is None or not self._hilo.is_alive():
+                self._hilo = threading.Thread(target=self._bucle, name="predictor", daemon=True)
+                self._hilo.start()
+
+    def predecir(self, titulos, timeout=30):
+        """
+        Devuelve una lista de dicts (impacto_predicho, probabilidad, sector, version_modelo)
+        por titulo, en orden.
+        Lanza ModeloNoDisponible si no hay modelo y TimeoutError si el lote no llega a tiempo.
+        """
+        if not titulos:
+            return []
+        self._arrancar()
+        peticion = {"titulos": list(titulos), "hecho": threading.Event(), "resultado": None, "error": None}
+        self._cola.put(peticion)
+        if not peticion["hecho"].wait(timeout):
+            raise TimeoutError(f"La prediccion no termino en {timeout}s.")
+        if peticion["error"] is not None:
+            raise peticion["error"]
+        return peticion["resultado"]
+
+    def _bucle(self):
+        while True:
+            lote = [self._cola.get()]
+            total = len(lote[0]["titulos"])
+            limite = time.monotonic() + self.ventana
+            while total < self.max_lote:
+                restante = limite - time.monotonic()
+                if restante <= 0:
+                    break
+                try:
+                    peticion = self._cola.get(timeout=restante)
+                except queue.Empty:
+                    break
+                lote.append(peticion)
+                total += len(peticion["titulos"])
+            self._procesar(lote)
+
+    def _procesar(self, lote):
+        try:
+            # Todo el lote se puntua con un mismo modelo, aunque se promueva otro mientras tanto
+            artefactos, version = self.obtener_artefactos()
+            if artefactos is None:
+                raise ModeloNoDisponible("Modelo no encontrado. Ejecuta 'entrenar_modelo.py' primero "
+                                         "(o 'registro_modelos.py --importar-legado' si tienes los .pkl antiguos).")
+            titulos = pd.Series([t for p in lote for t in p["titulos"]], dtype=object)
+            predicciones, probabilidades, sectores = puntuar(*artefactos, titulos)
+            filas = [
+                {"titulo": t, "impacto_predicho": int(i), "probabilidad": round(float(p), 4), "sector": s,
+                 "version_modelo": version}
+                for t, i, p, s in zip(titulos, predicciones, probabilidades, sectores)
+            ]
+            inicio = 0
+            for peticion in lote:
+                fin = inicio + len(peticion["titulos"])
+                peticion["resultado"] = filas[inicio:fin]
+                inicio = fin
+        except Exception as e:
+            for peticion in lote:
+                peticion["error"] = e
+
+        with self._lock:
+            self.estadisticas["peticiones"] += len(lote)
+            self.estadisticas["titulos"] += sum(len(p["titulos"]) for p in lote)
+            self.estadisticas["lotes"] += 1
+        for peticion in lote:
+            peticion["hecho"].set()
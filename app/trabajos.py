@@ -0,0 +1,106 @@
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+ESTADOS_ACTIVOS = ("en_cola", "ejecutando")
+
+
+class ColaLlena(Exception):
+    """Se lanza cuando ya hay demasiados trabajos esperando."""
+
+
+class GestorTrabajos:
+    """
+    Ejecuta trabajos largos (el pipeline) en segundo plano con un pool acotado.
+    Cada trabajo tiene un id consultable con su estado, etapa, progreso y tiempos.
+    Si llega un trabajo con la misma clave que otro que aun esta en cola o ejecutandose,
+    no se lanza otro: se devuelve el existente.
+    """
+    def __init__(self, max_workers=1, max_pendientes=8, max_historial=200):
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="trabajo")
+        self.max_pendientes = max_pendientes
+        self.max_historial = max_historial
+        self._lock = threading.Lock()
+        self._trabajos = OrderedDict()
+        self._activos = {}  # clave -> id del trabajo en cola o ejecutandose
+
+    def enviar(self, clave, funcion, **kwargs):
+        """
+        Encola `funcion(progreso=..., **kwargs)`. Devuelve (trabajo, es_nuevo).
+        Lanza ColaLlena si se supera el numero maximo de trabajos en espera.
+        """
+        with self._lock:
+            if clave in self._activos:
+                return self._copia(self._activos[clave]), False
+            en_cola = sum(1 for t in self._trabajos.values() if t["estado"] == "en_cola")
+            if en_cola >= self.max_pendientes:
+                raise ColaLlena(f"Hay {en_cola} trabajos en espera. Intentalo mas tarde.")
+
+            trabajo_id = uuid.uuid4().hex[:12]
+            self._trabajos[trabajo_id] = {
+                "id": trabajo_id, "clave": list(clave), "estado": "en_cola",
+                "etapa": None, "progreso": 0.0, "tiempos": {},
+                "creado": time.time(), "inicio": None, "fin": None,
+                "resultado": None, "error": None,
+            }
+            self._activos[clave] = trabajo_id
+            self._podar_historial()
+        self._executor.submit(self._ejecutar, trabajo_id, clave, funcion, kwargs)
+        return self.estado(trabajo_id), True
+
+    def estado(self, trabajo_id):
+        """Copia del estado de un trabajo, o None si no existe (o ya se olvido)."""
+        with self._lock:
+            return self._copia(trabajo_id) if trabajo_id in self._trabajos else None
+
+    def _copia(self, trabajo_id):
+        trabajo = self._trabajos[trabajo_id]
+        return dict(trabajo, tiempos=dict(trabajo["tiempos"]))
+
+    def _ejecutar(self, trabajo_id, clave, funcion, kwargs):
+        trabajo = self._trabajos[trabajo_id]
+        etapa_actual = {"nombre": None, "inicio": None}
+
+        def cerrar_etapa(ahora):
+            if etapa_actual["nombre"] is not None:
+                trabajo["tiempos"][etapa_actual["nombre"]] = round(ahora - etapa_actual["inicio"], 4)
+
+        def progreso(etapa, fraccion):
+            ahora = time.perf_counter()
+            with self._lock:
+                cerrar_etapa(ahora)
+                etapa_actual.update(nombre=etapa, inicio=ahora)
+                trabajo["etapa"] = etapa
+                trabajo["progreso"] = round(fraccion, 3)
+
+        with self._lock:
+            trabajo["estado"] = "ejecutando"
+            trabajo["inicio"] = time.time()
+            trabajo["tiempos"]["espera"] = round(trabajo["inicio"] - trabajo["creado"], 4)
+
+        try:
+            resultado = funcion(progreso=progreso, **kwargs) or {}
+            estado = "error" if resultado.get("estado") == "error" else "completado"
+            error = resultado.get("mensaje") if estado == "error" else None
+        except Exception as e:
+            resultado, estado, error = None, "error", str(e)
+
+        with self._lock:
+            cerrar_etapa(time.perf_counter())
+            trabajo.update(estado=estado, resultado=resultado, error=error, fin=time.time())
+            if estado == "completado":
+                trabajo["progreso"] = 1.0
+            trabajo["tiempos"]["total"] = round(trabajo["fin"] - trabajo["inicio"], 4)
+            self._activos.pop(clave, None)
+
+    def _podar_historial(self):
+        # Olvidamos los trabajos terminados mas antiguos para que la memoria no crezca sin limite
+        sobrantes = len(self._trabajos) - self.max_historial
+        for trabajo_id in list(self._trabajos):
+            if sobrantes <= 0:
+                break
+            if self._trabajos[trabajo_id]["estado"] not in ESTADOS_ACTIVOS:
+                del self._trabajos[trabajo_id]
+                sobrantes -= 1
@@ -0,0 +1,78 @@
+"""
+Benchmark del almacen Parquet particionado frente al CSV monolitico.
+
+Genera un año de normas etiquetadas, lo guarda en ambos formatos y mide cuanto
+cuesta cargar solo 'titulo' e 'impacto' (lo que necesita el entrenamiento) y un
+mes concreto.
+
+Uso (desde la raiz del proyecto):
+    python benchmarks/bench_almacen.py --dias 365 --normas-por-dia 300
+"""
+import argparse
+import os
+import tempfile
+from datetime import date, timedelta
+
+from medicion import medir_en_subproceso
+
+
+def generar(directorio, dias, por_dia):
+    import numpy as np
+    import pandas as pd
+    from almacen import escribir
+
+    rng = np.random.default_rng(42)
+    n = dias * por_dia
+    fechas = [(date(2024, 1, 1) + timedelta(days=i)).isoformat() for i in range(dias)]
+    df = pd.DataFrame({
+        "titulo": [f"Resolución {i} por la que se convocan ayudas a la vivienda" for i in range(n)],
+        "url_pdf": [f"/boe/dias/{i}.pdf" for i in range(n)],
+        "departamento": rng.choice(["MINISTERIO DE HACIENDA", "MINISTERIO DE CULTURA"], n),
+        "fecha_publicacion": np.repeat(fechas, por_dia),
+        "tipo_norma": rng.choice(["Disposiciones generales", "Anuncios"], n),
+        "sector": rng.choice(["inmobiliario", "otros"], n),
+        "impacto": rng.integers(0, 2, n),
+    })
+    csv_path = os.path.join(directorio, "dataset_etiquetado.csv")
+    df.to_csv(csv_path, index=False, encoding="utf-8-sig")
+    escribir(df, os.path.join(directorio, "dataset_etiquetado"), modo="overwrite")
+    return csv_path
+
+
+def leer_csv(csv_path):
+    import pandas as pd
+    return len(pd.read_csv(csv_path)[["titulo", "impacto"]])
+
+
+def leer_parquet_columnas(ruta):
+    from almacen import leer
+    return len(leer(ruta, columnas=["titulo", "impacto"]))
+
+
+def leer_parquet_mes(ruta):
+    from almacen import leer
+    return len(leer(ruta, columnas=["titulo", "impacto"], desde="2024-03-01", hasta="2024-03-31"))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--dias", type=int, default=365)
+    parser.add_argument("--normas-por-dia", type=int, default=300)
+    args = parser.parse_args()
+
+    directorio = tempfile.mkdtemp(prefix="bench_almacen_")
+    _, _, csv_path = medir_en_subproceso(generar, directorio, args.dias, args.normas_por_dia)
+    ruta = os.path.join(directorio, "dataset_etiquetado")
+
+    print(f"{'lectura':<32} {'filas':>9} {'segundos':>9} {'pico MB':>8}")
+    for nombre, funcion, destino in [
+        ("CSV completo", leer_csv, csv_path),
+        ("Parquet titulo+impacto", leer_parquet_columnas, ruta),
+        ("Parquet titulo+impacto (1 mes)", leer_parquet_mes, ruta),
+    ]:
+        segundos, pico, filas = medir_en_subproceso(funcion, destino, precargar=("pandas", "almacen"))
+        print(f"{nombre:<32} {filas:>9} {segundos:>9.3f} {pico:>8.1f}")
+
+
+if __name__ == "__main__":
+    main()
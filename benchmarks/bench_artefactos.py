@@ -0,0 +1,130 @@
+"""
+Benchmark de los artefactos compactos (.npy mapeados en memoria) frente a los pickles.
+
+Entrena un RandomForest + TF-IDF sobre titulos sinteticos, lo guarda en los dos formatos
+y mide, cada carga en un proceso nuevo, el tiempo de carga en frio y la memoria: la
+privada del proceso (RssAnon) y la mapeada desde archivo (RssFile), que es la que
+comparten entre si varios procesos que abren los mismos artefactos. Tambien comprueba
+que las predicciones coinciden y mide lo que tarda cada formato en puntuar un lote.
+
+Uso (desde la raiz del proyecto):
+    python benchmarks/bench_artefactos.py --normas 50000 --arboles 100
+"""
+import argparse
+import os
+import tempfile
+
+from medicion import medir_en_subproceso
+
+PRECARGA = ("numpy", "scipy.sparse", "joblib", "sklearn.ensemble", "sklearn.feature_extraction.text")
+
+
+def _titulos(n, semilla):
+    import numpy as np
+    from generador_datos_falsos import ACCIONES, SECTORES_TEMAS
+
+    rng = np.random.default_rng(semilla)
+    temas = [t for lista in SECTORES_TEMAS.values() for t in lista]
+    relleno = [f"expediente{i}" for i in range(5000)]
+    return [f"{rng.choice(ACCIONES)} {rng.choice(temas)} {' '.join(rng.choice(relleno, 4))}." for _ in range(n)]
+
+
+def generar(directorio, normas, arboles):
+    import joblib
+    import numpy as np
+    from sklearn.ensemble import RandomForestClassifier
+    from sklearn.feature_extraction.text import TfidfVectorizer
+    from artefactos_compactos import exportar
+    from clasificador import clasificar_sectores
+
+    titulos = _titulos(normas, 42)
+    # Etiqueta de la heuristica del auto-etiquetador con un 10% de ruido, para que los arboles crezcan
+    y = np.isin(clasificar_sectores(titulos), ["inmobiliario", "financiero", "energético"]).astype(int)
+    ruido = np.random.default_rng(0).random(normas) < 0.1
+    y[ruido] = 1 - y[ruido]
+    vectorizer = TfidfVectorizer()
+    modelo = RandomForestClassifier(n_estimators=arboles, random_state=42, n_jobs=-1)
+    modelo.fit(vectorizer.fit_transform(titulos), y)
+    joblib.dump(modelo, os.path.join(directorio, "modelo.pkl"))
+    joblib.dump(vectorizer, os.path.join(directorio, "vectorizer.pkl"))
+    exportar(modelo, vectorizer, os.path.join(directorio, "compacto"))
+    return sum(arbol.tree_.node_count for arbol in modelo.estimators_), len(vectorizer.vocabulary_)
+
+
+def _memoria():
+    """(RssAnon, RssFile) del proceso en MB; (None, None) fuera de Linux."""
+    try:
+        with open("/proc/self/status") as f:
+            campos = dict(linea.split(":", 1) for linea in f)
+        return tuple(int(campos[c].split()[0]) / 1024 for c in ("RssAnon", "RssFile"))
+    except (OSError, KeyError):
+        return None, None
+
+
+def _cargar(directorio, formato):
+    import joblib
+    import artefactos_compactos
+    if formato == "pickle":
+        return (joblib.load(os.path.join(directorio, "modelo.pkl")),
+                joblib.load(os.path.join(directorio, "vectorizer.pkl")))
+    return artefactos_compactos.cargar(os.path.join(directorio, "compacto"))
+
+
+def cargar(directorio, formato):
+    """Carga en frio y devuelve la memoria que ocupa el modelo ya listo para predecir."""
+    anon_antes, archivo_antes = _memoria()
+    modelo, vectorizer = _cargar(directorio, formato)
+    if formato == "compacto":
+        # Toca todas las paginas, como haria una prediccion grande, para que cuenten en RssFile
+        sum(float(getattr(modelo, a).sum()) for a in ("izquierda", "derecha", "variable", "valor", "raices"))
+    anon, archivo = _memoria()
+    if anon is None:
+        return None, None
+    return anon - anon_antes, archivo - archivo_antes
+
+
+def comparar_predicciones(directorio, normas):
+    import time
+    import numpy as np
+
+    titulos = _titulos(normas, 7)
+    tiempos, probas = {}, {}
+    for formato in ("pickle", "compacto"):
+        modelo, vectorizer = _cargar(directorio, formato)
+        inicio = time.perf_counter()
+        probas[formato] = modelo.predict_proba(vectorizer.transform(titulos))
+        tiempos[formato] = time.perf_counter() - inicio
+    diferencia = float(np.abs(probas["pickle"] - probas["compacto"]).max())
+    iguales = bool((probas["pickle"].argmax(axis=1) == probas["compacto"].argmax(axis=1)).all())
+    return tiempos, diferencia, iguales
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--normas", type=int, default=50000, help="Titulos de entrenamiento.")
+    parser.add_argument("--arboles", type=int, default=100)
+    parser.add_argument("--prediccion", type=int, default=20000, help="Titulos del lote de prediccion.")
+    args = parser.parse_args()
+
+    directorio = tempfile.mkdtemp(prefix="bench_artefactos_")
+    _, _, (nodos, vocabulario) = medir_en_subproceso(generar, directorio, args.normas, args.arboles)
+    tamanos = {
+        "pickle": sum(os.path.getsize(os.path.join(directorio, f)) for f in ("modelo.pkl", "vectorizer.pkl")),
+        "compacto": sum(e.stat().st_size for e in os.scandir(os.path.join(directorio, "compacto"))),
+    }
+    print(f"--- Modelo: {args.arboles} arboles, {nodos} nodos, vocabulario de {vocabulario} terminos ---")
+    print(f"{'formato':<10} {'disco MB':>9} {'carga ms':>9} {'pico MB':>8} {'privada MB':>11} {'compartible MB':>15}")
+    for formato in ("pickle", "compacto"):
+        segundos, pico, (anon, archivo) = medir_en_subproceso(cargar, directorio, formato, precargar=PRECARGA)
+        memoria = f"{anon:>11.1f} {archivo:>15.1f}" if anon is not None else f"{'-':>11} {'-':>15}"
+        print(f"{formato:<10} {tamanos[formato] / 1e6:>9.1f} {segundos * 1000:>9.1f} {pico:>8.1f} {memoria}")
+
+    _, _, (tiempos, diferencia, iguales) = medir_en_subproceso(comparar_predicciones, directorio, args.prediccion)
+    print(f"\nPrediccion de {args.prediccion} titulos: pickle {tiempos['pickle']:.2f}s, "
+          f"compacto {tiempos['compacto']:.2f}s")
+    print(f"Misma clase en todas las filas: {'si' if iguales else 'NO'} "
+          f"(diferencia maxima de probabilidad {diferencia:.1e})")
+
+
+if __name__ == "__main__":
+    main()
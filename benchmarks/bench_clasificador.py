@@ -0,0 +1,67 @@
+"""
+Benchmark del clasificador de sectores: el `Series.apply` con la implementacion original
+de clasificar_sector frente a `clasificar_sectores(serie)`, en filas por segundo.
+
+Los titulos se construyen con los mismos ingredientes que generador_datos_falsos;
+`--unicos` controla que fraccion de ellos son distintos (en el BOE real se repiten mucho).
+
+Uso (desde la raiz del proyecto):
+    python benchmarks/bench_clasificador.py --filas 1000000 --unicos 0.05 1.0
+"""
+import argparse
+import re
+import time
+
+import medicion  # noqa: F401  (prepara sys.path)
+import numpy as np
+import pandas as pd
+from clasificador import SECTORES_KEYWORDS, clasificar_sectores
+from generador_datos_falsos import ACCIONES, SECTORES_TEMAS
+
+
+def clasificar_sector_original(texto):
+    """Implementacion original (una llamada por titulo), conservada como referencia."""
+    if not texto or not isinstance(texto, str):
+        return "desconocido"
+    texto_lower = texto.lower()
+    for sector, pattern in SECTORES_KEYWORDS.items():
+        if re.search(pattern, texto_lower):
+            return sector
+    return "otros"
+
+
+def generar_titulos(filas, fraccion_unicos, semilla=42):
+    """Genera `filas` titulos sacados de un catalogo de `filas * fraccion_unicos` titulos distintos."""
+    rng = np.random.default_rng(semilla)
+    temas = [t for lista in SECTORES_TEMAS.values() for t in lista]
+    n_unicos = max(1, int(filas * fraccion_unicos))
+    catalogo = np.array([f"{a} {t} n.º {i}." for i, (a, t) in
+                         enumerate(zip(rng.choice(ACCIONES, n_unicos), rng.choice(temas, n_unicos)))], dtype=object)
+    return pd.Series(catalogo[rng.integers(0, n_unicos, filas)], dtype=object)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--filas", type=int, default=1_000_000)
+    parser.add_argument("--unicos", type=float, nargs="+", default=[0.05, 1.0])
+    args = parser.parse_args()
+
+    print(f"{'filas':>9} {'unicos':>7} | {'apply filas/s':>14} | {'lote filas/s':>13} | {'x':>5}")
+    for fraccion in args.unicos:
+        serie = generar_titulos(args.filas, fraccion)
+
+        inicio = time.perf_counter()
+        esperado = serie.apply(clasificar_sector_original)
+        t_apply = time.perf_counter() - inicio
+
+        inicio = time.perf_counter()
+        obtenido = clasificar_sectores(serie)
+        t_lote = time.perf_counter() - inicio
+
+        assert obtenido.equals(esperado), "El clasificador por lotes no coincide con el original"
+        print(f"{args.filas:>9} {fraccion:>7.2f} | {args.filas / t_apply:>14,.0f} | "
+              f"{args.filas / t_lote:>13,.0f} | {t_apply / t_lote:>5.1f}")
+
+
+if __name__ == "__main__":
+    main()
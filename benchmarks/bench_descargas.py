@@ -0,0 +1,107 @@
+"""
+Benchmark de la descarga historica contra un servidor local que imita al BOE.
+
+Compara el bucle clasico (un dia cada vez + pausa fija) con el modo concurrente
+de `descargar_rango_fechas` y muestra los dias descargados por minuto.
+
+Uso (desde la raiz del proyecto):
+    python benchmarks/bench_descargas.py --dias 30 --latencia 0.3 --workers 8 --tasa 10
+"""
+import argparse
+import contextlib
+import io
+import os
+import sys
+import tempfile
+import threading
+import time
+from datetime import date, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(RAIZ, "scripts"))
+
+SUMARIO_FALSO = b"""<boe><sumario><boletin><seccion nombre="Disposiciones generales">
+<epigrafe><titulo>Real Decreto sobre medidas para la vivienda.</titulo><urlPdf>/boe.pdf</urlPdf></epigrafe>
+</seccion></boletin></sumario></boe>"""
+
+
+def lanzar_servidor(latencia):
+    """Arranca en segundo plano un servidor HTTP que responde cada sumario tras `latencia` segundos."""
+    class Manejador(BaseHTTPRequestHandler):
+        def do_GET(self):
+            time.sleep(latencia)
+            self.send_response(200)
+            self.send_header("Content-Type", "application/xml")
+            self.send_header("Content-Length", str(len(SUMARIO_FALSO)))
+            self.end_headers()
+            self.wfile.write(SUMARIO_FALSO)
+
+        def log_message(self, *args):
+            pass
+
+    servidor = ThreadingHTTPServer(("127.0.0.1", 0), Manejador)
+    threading.Thread(target=servidor.serve_forever, daemon=True).start()
+    return servidor
+
+
+def medir(nombre, funcion, dias):
+    inicio = time.perf_counter()
+    # Silenciamos la salida por dia para que no contamine la medicion
+    with contextlib.redirect_stdout(io.StringIO()):
+        funcion()
+    segundos = time.perf_counter() - inicio
+    print(f"  {nombre:<12} {dias} dias en {segundos:6.2f}s -> {dias / segundos * 60:8.1f} dias/min")
+    return segundos
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--dias", type=int, default=20)
+    parser.add_argument("--latencia", type=float, default=0.3, help="Segundos que tarda el servidor falso en responder.")
+    parser.add_argument("--pausa", type=float, default=1.0, help="Pausa fija del modo clasico.")
+    parser.add_argument("--workers", type=int, default=8)
+    parser.add_argument("--tasa", type=float, default=10.0)
+    args = parser.parse_args()
+
+    # Trabajamos en un directorio temporal para no tocar 'data/' del proyecto
+    os.chdir(tempfile.mkdtemp(prefix="bench_descargas_"))
+    import actualizador_diario
+    from descargar_historicos import descargar_rango_fechas, RAW_DIR
+
+    servidor = lanzar_servidor(args.latencia)
+    actualizador_diario.BOE_XML_URL = f"http://127.0.0.1:{servidor.server_port}/sumario?id=BOE-S-{{fecha}}"
+    actualizador_diario.log.disabled = True
+
+    fin = date(2024, 1, 1)
+    inicio = fin - timedelta(days=args.dias - 1)
+
+    def limpiar():
+        if os.path.exists(RAW_DIR):
+            for f in os.listdir(RAW_DIR):
+                os.remove(os.path.join(RAW_DIR, f))
+
+    def clasico():
+        fecha = inicio
+        while fecha <= fin:
+            actualizador_diario.descargar_boe(fecha.isoformat())
+            time.sleep(args.pausa)
+            fecha += timedelta(days=1)
+
+    def concurrente():
+        descargar_rango_fechas(inicio, fin, workers=args.workers, peticiones_por_segundo=args.tasa,
+                               ruta_bd="bench_descargas.sqlite")
+
+    print(f"--- Benchmark de descargas: {args.dias} dias, latencia {args.latencia}s ---")
+    limpiar()
+    t_clasico = medir("clasico", clasico, args.dias)
+    limpiar()
+    if os.path.exists("bench_descargas.sqlite"):
+        os.remove("bench_descargas.sqlite")
+    t_concurrente = medir("concurrente", concurrente, args.dias)
+    print(f"  Aceleracion: x{t_clasico / t_concurrente:.1f}")
+    servidor.shutdown()
+
+
+if __name__ == "__main__":
+    main()
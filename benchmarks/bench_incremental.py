@@ -0,0 +1,101 @@
+"""
+Benchmark del entrenamiento incremental frente al reentrenamiento completo.
+
+Simula etiquetas que van llegando: parte de un conjunto inicial etiquetado y, en cada
+ronda, etiqueta un lote nuevo. Tras cada lote mide cuanto tarda en publicarse un modelo
+actualizado por los dos caminos (`entrenar_modelo.py --incremental`, HashingVectorizer +
+SGDClassifier, frente a `entrenar_modelo.py`, TF-IDF + RandomForest desde cero) y su
+accuracy sobre un conjunto de prueba fijo que ningun modelo ve al entrenar.
+
+Uso (desde la raiz del proyecto):
+    python benchmarks/bench_incremental.py --iniciales 5000 --rondas 5 --lote 500
+"""
+import argparse
+import contextlib
+import io
+import os
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+import medicion  # anade la raiz del proyecto y scripts/ al path
+
+SECTORES_IMPACTO = ["inmobiliario", "financiero", "energético"]
+
+
+def generar_normas(n, semilla, ruido=0.1):
+    """Titulos sinteticos etiquetados con la heuristica de sectores y un `ruido` de etiquetas cambiadas."""
+    from generador_datos_falsos import ACCIONES, SECTORES_TEMAS
+    from clasificador import clasificar_sectores
+
+    rng = np.random.default_rng(semilla)
+    temas = [t for lista in SECTORES_TEMAS.values() for t in lista]
+    relleno = [f"expediente{i}" for i in range(2000)]
+    titulos = [f"{rng.choice(ACCIONES)} {rng.choice(temas)} {' '.join(rng.choice(relleno, 3))}." for _ in range(n)]
+    impacto = np.isin(clasificar_sectores(titulos), SECTORES_IMPACTO).astype(int)
+    cambiadas = rng.random(n) < ruido
+    impacto[cambiadas] = 1 - impacto[cambiadas]
+    return pd.DataFrame({
+        "identificador": [f"BENCH-{semilla}-{i}" for i in range(n)],
+        "titulo": titulos,
+        "fecha_publicacion": "2024-01-01",
+        "impacto": impacto,
+    })
+
+
+def accuracy(version, prueba):
+    from modelo import cargar_artefactos, puntuar
+    modelo, vectorizer = cargar_artefactos(version, compacto=False)
+    predicciones, _, _ = puntuar(modelo, vectorizer, prueba["titulo"])
+    return float((predicciones == prueba["impacto"].to_numpy()).mean())
+
+
+def medir(funcion):
+    """Segundos de `funcion()` con su salida silenciada, y lo que devuelva."""
+    inicio = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        resultado = funcion()
+    return time.perf_counter() - inicio, resultado
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--iniciales", type=int, default=5000, help="Normas etiquetadas antes de la primera ronda.")
+    parser.add_argument("--rondas", type=int, default=5)
+    parser.add_argument("--lote", type=int, default=500, help="Etiquetas nuevas por ronda.")
+    parser.add_argument("--prueba", type=int, default=2000, help="Normas del conjunto de prueba.")
+    args = parser.parse_args()
+
+    # Base de datos y registro de modelos en un directorio temporal para no tocar los del proyecto
+    os.chdir(tempfile.mkdtemp(prefix="bench_incremental_"))
+    from base_datos import ORIGEN_MANUAL, guardar_etiquetas, guardar_normas
+    from entrenar_modelo import entrenar, entrenar_incremental
+    from modelo import version_artefactos
+
+    normas = generar_normas(args.iniciales + args.rondas * args.lote, semilla=1)
+    prueba = generar_normas(args.prueba, semilla=2, ruido=0.0)
+    ids = np.asarray(guardar_normas(normas.drop(columns="impacto"), completo=True))
+
+    print(f"--- Incremental frente a reentrenamiento: {args.iniciales} etiquetas iniciales, "
+          f"{args.rondas} rondas de {args.lote} ---")
+    print(f"{'ronda':>5} {'etiquetas':>10} {'incr. s':>8} {'incr. acc':>10} {'completo s':>11} {'completo acc':>13}")
+    etiquetadas = 0
+    for ronda in range(args.rondas + 1):
+        nuevas = args.iniciales if ronda == 0 else args.lote
+        guardar_etiquetas(ids[etiquetadas:etiquetadas + nuevas],
+                          normas["impacto"].iloc[etiquetadas:etiquetadas + nuevas], ORIGEN_MANUAL)
+        etiquetadas += nuevas
+        # Cada camino termina registrando y promoviendo su version: se mide hasta que esta publicada
+        # (el incremental sustituye al modelo completo que promovio la ronda anterior)
+        t_incremental, version_incremental = medir(lambda: entrenar_incremental(forzar_promocion=True))
+        t_completo, _ = medir(entrenar)
+        version_completo = version_artefactos()
+        print(f"{ronda:>5} {etiquetadas:>10} {t_incremental:>8.2f} {accuracy(version_incremental, prueba):>10.3f} "
+              f"{t_completo:>11.2f} {accuracy(version_completo, prueba):>13.3f}")
+    print("La ronda 0 crea el modelo incremental desde cero; las demas solo leen las etiquetas nuevas.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,115 @@
+"""
+Benchmark del parser de sumarios XML: ruta clasica con xmltodict (arbol completo en memoria)
+frente al parser en streaming `iterar_disposiciones`.
+
+Genera sumarios sinteticos de varios tamaños, comprueba que ambos producen exactamente
+los mismos registros y muestra el tiempo por archivo y la memoria pico de cada ruta.
+
+Uso (desde la raiz del proyecto):
+    python benchmarks/bench_parser.py --tamanos 1000 20000 200000
+"""
+import argparse
+import os
+import random
+import tempfile
+
+from medicion import medir_en_subproceso
+
+
+def parsear_boe_xmltodict(xml_path):
+    """Implementacion original de parsear_boe (xmltodict), conservada como referencia."""
+    import xmltodict
+    with open(xml_path, "rb") as f:
+        data = xmltodict.parse(f)
+
+    procesadas = []
+    sumario = data.get("boe", {}).get("sumario", {})
+    boletines = sumario.get("boletin", [])
+    if not isinstance(boletines, list):
+        boletines = [boletines]
+    for boletin in boletines:
+        secciones = boletin.get("seccion", [])
+        if not isinstance(secciones, list):
+            secciones = [secciones]
+        for seccion in secciones:
+            disposiciones = seccion.get("epigrafe", [])
+            if not isinstance(disposiciones, list):
+                disposiciones = [disposiciones]
+            for dispo in disposiciones:
+                procesadas.append({
+                    "titulo": dispo.get("titulo"),
+                    "url_pdf": dispo.get("urlPdf"),
+                    "departamento": dispo.get("departamento", "No especificado"),
+                    "fecha_publicacion": os.path.basename(xml_path).replace('boe_', '').replace('.xml', '').replace('_', '-'),
+                    "tipo_norma": seccion.get("@nombre", "No especificado")
+                })
+    return procesadas
+
+
+def parsear_boe_streaming(xml_path):
+    from parser_normas import parsear_boe
+    return parsear_boe(xml_path)
+
+
+def _contar(funcion, xml_path):
+    return len(funcion(xml_path))
+
+
+def contar_xmltodict(xml_path):
+    return _contar(parsear_boe_xmltodict, xml_path)
+
+
+def contar_streaming(xml_path):
+    # Consumimos el generador sin acumular, que es como lo usa un consumidor en streaming
+    from parser_normas import iterar_disposiciones
+    return sum(1 for _ in iterar_disposiciones(xml_path))
+
+
+def verificar_identicos(xml_path):
+    return parsear_boe_xmltodict(xml_path) == parsear_boe_streaming(xml_path)
+
+
+def generar_sumario(ruta, num_disposiciones, semilla=42):
+    """Escribe un sumario sintetico con la estructura boe/sumario/boletin/seccion/epigrafe."""
+    rng = random.Random(semilla)
+    secciones = ["Disposiciones generales", "Autoridades y personal", "Anuncios"]
+    with open(ruta, "w", encoding="utf-8") as f:
+        f.write("<boe><sumario><boletin>\n")
+        por_seccion = max(1, num_disposiciones // len(secciones))
+        escritas = 0
+        for nombre in secciones:
+            f.write(f'<seccion nombre="{nombre}">\n')
+            for _ in range(por_seccion if nombre != secciones[-1] else num_disposiciones - escritas):
+                escritas += 1
+                departamento = f"<departamento>MINISTERIO {rng.randint(1, 20)}</departamento>" if rng.random() < 0.8 else ""
+                f.write(f"<epigrafe><titulo>Resolución {escritas} sobre ayudas a la vivienda y energía "
+                        f"{rng.random():.6f}.</titulo><urlPdf szBytes=\"{rng.randint(1000, 99999)}\">/boe/{escritas}.pdf</urlPdf>"
+                        f"{departamento}</epigrafe>\n")
+            f.write("</seccion>\n")
+        f.write("</boletin></sumario></boe>\n")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--tamanos", type=int, nargs="+", default=[1000, 20000, 200000])
+    args = parser.parse_args()
+
+    directorio = tempfile.mkdtemp(prefix="bench_parser_")
+    print(f"{'disposiciones':>14} {'MB':>7} | {'xmltodict s':>11} {'pico MB':>8} | {'streaming s':>11} {'pico MB':>8}")
+    for tamano in args.tamanos:
+        ruta = os.path.join(directorio, f"boe_2024-01-{len(str(tamano)):02d}.xml")
+        generar_sumario(ruta, tamano)
+        # La verificacion tambien va en un subproceso: en Linux la memoria pico del padre
+        # se hereda en los hijos y falsearia las mediciones
+        _, _, identicos = medir_en_subproceso(verificar_identicos, ruta)
+        assert identicos, "Los parsers no producen los mismos registros"
+
+        t_clasico, pico_clasico, n_clasico = medir_en_subproceso(contar_xmltodict, ruta, precargar=("xmltodict",))
+        t_stream, pico_stream, n_stream = medir_en_subproceso(contar_streaming, ruta, precargar=("parser_normas",))
+        assert n_clasico == n_stream
+        mb = os.path.getsize(ruta) / (1024 * 1024)
+        print(f"{tamano:>14} {mb:>7.1f} | {t_clasico:>11.3f} {pico_clasico:>8.1f} | {t_stream:>11.3f} {pico_stream:>8.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,49 @@
+"""Utilidades comunes de medicion (tiempo y memoria pico) para los benchmarks."""
+import multiprocessing
+import os
+import sys
+import time
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+for ruta in (RAIZ, os.path.join(RAIZ, "scripts")):
+    if ruta not in sys.path:
+        sys.path.insert(0, ruta)
+
+
+def pico_rss_mb():
+    """Memoria residente maxima del proceso actual, en MB."""
+    try:
+        import resource
+        pico = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # Linux lo da en KB y macOS en bytes
+        return pico / (1024 * 1024) if sys.platform == "darwin" else pico / 1024
+    except ImportError:  # Windows
+        import psutil
+        return psutil.Process().memory_info().peak_wset / (1024 * 1024)
+
+
+def _ejecutar_y_medir(funcion, args, cola, precargar):
+    for modulo in precargar:
+        __import__(modulo)
+    inicio = time.perf_counter()
+    resultado = funcion(*args)
+    segundos = time.perf_counter() - inicio
+    cola.put((segundos, pico_rss_mb(), resultado))
+
+
+def medir_en_subproceso(funcion, *args, precargar=()):
+    """
+    Ejecuta `funcion(*args)` en un proceso nuevo para que la memoria pico no
+    se contamine con mediciones anteriores. Devuelve (segundos, pico_mb, resultado).
+    Los modulos de `precargar` se importan antes de empezar a cronometrar.
+
+    Ojo: en Linux el hijo hereda la memoria pico del padre, asi que el proceso
+    que lanza las mediciones debe evitar importar librerias pesadas.
+    """
+    ctx = multiprocessing.get_context("spawn")
+    cola = ctx.Queue()
+    proceso = ctx.Process(target=_ejecutar_y_medir, args=(funcion, args, cola, tuple(precargar)))
+    proceso.start()
+    medida = cola.get()
+    proceso.join()
+    return medida
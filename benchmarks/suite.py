@@ -0,0 +1,309 @@
+"""
+Suite de benchmarks del camino critico: parseo -> clasificacion -> prediccion -> alertas.
+
+Genera entradas sinteticas reproducibles (misma semilla, mismos archivos) a varias escalas
+-un dia, un año, diez años de sumarios- y mide cada etapa en un proceso nuevo: tiempo de la
+etapa (sin contar la carga de sus entradas) y memoria pico del proceso. Los resultados se
+guardan en JSON; con --comparar se contrastan con una linea base guardada y el programa
+termina con codigo 1 si alguna etapa empeora mas que el umbral.
+
+Uso (desde la raiz del proyecto):
+    python benchmarks/suite.py --escalas dia anio --salida resultados.json
+    python benchmarks/suite.py --escalas dia anio --comparar linea_base.json --umbral 0.2
+    python benchmarks/suite.py --resultados resultados.json --comparar linea_base.json
+"""
+import argparse
+import contextlib
+import glob
+import io
+import json
+import os
+import platform
+import shutil
+import sys
+import tempfile
+import time
+from datetime import date, datetime, timedelta
+
+from medicion import medir_en_subproceso
+
+# Dias de sumarios de cada escala
+ESCALAS = {"dia": 1, "anio": 365, "decada": 3650}
+NORMAS_POR_DIA = 250
+SEMILLA = 42
+INICIO = date(2015, 1, 1)
+# Normas etiquetadas con las que se entrena el modelo de la etapa de prediccion
+NORMAS_ENTRENAMIENTO = 5000
+UMBRAL = 0.20
+# Diferencias por debajo de estos minimos son ruido de medicion y no cuentan como regresion
+MIN_SEGUNDOS = 0.05
+MIN_MB = 5.0
+
+
+@contextlib.contextmanager
+def _silencio():
+    with contextlib.redirect_stdout(io.StringIO()), contextlib.redirect_stderr(io.StringIO()):
+        yield
+
+
+# --- Entradas sinteticas ---
+
+def preparar(directorio, dias, por_dia, semilla):
+    """Sumarios XML y JSON de `dias` dias y la tabla de todas sus normas. Devuelve cuantas normas hay."""
+    import numpy as np
+    import pandas as pd
+    from generador_datos_falsos import escribir_sumarios, generar_lotes
+
+    partes = []
+    for lote in generar_lotes(desde=INICIO, hasta=INICIO + timedelta(days=dias - 1), por_dia=por_dia, semilla=semilla):
+        escribir_sumarios(lote, ("xml", "json"), os.path.join(directorio, "data", "raw_boe"),
+                          os.path.join(directorio, "data", "raw_boe_json"))
+        partes.append(lote)
+    normas = pd.concat(partes, ignore_index=True)
+    # Alrededor de un 15% de alertas, como el modelo real
+    rng = np.random.default_rng(semilla)
+    normas["impacto_predicho"] = (rng.random(len(normas)) < 0.15).astype(int)
+    normas["probabilidad"] = rng.random(len(normas)).round(4)
+    normas.to_parquet(os.path.join(directorio, "normas.parquet"), index=False)
+    return len(normas)
+
+
+def preparar_modelo(directorio, n, semilla):
+    """Entrena con titulos sinteticos el mismo tipo de modelo que entrenar_modelo.py."""
+    import joblib
+    import numpy as np
+    import pandas as pd
+    from sklearn.ensemble import RandomForestClassifier
+    from sklearn.feature_extraction.text import TfidfVectorizer
+    from clasificador import clasificar_sectores, matriz_palabras_clave
+    from entrenar_modelo import STOP_WORDS
+    from features import combinar
+    from generador_datos_falsos import generar_lotes
+
+    titulos = pd.concat(generar_lotes(n, semilla=semilla), ignore_index=True)["titulo"]
+    y = np.isin(clasificar_sectores(titulos), ["inmobiliario", "financiero", "energético"]).astype(int)
+    vectorizer = TfidfVectorizer(max_features=1500, stop_words=STOP_WORDS)
+    X = combinar(vectorizer.fit_transform(titulos), matriz_palabras_clave(titulos))
+    modelo = RandomForestClassifier(n_estimators=100, random_state=42, class_weight="balanced", n_jobs=1)
+    modelo.fit(X, y)
+    joblib.dump(modelo, os.path.join(directorio, "modelo.pkl"))
+    joblib.dump(vectorizer, os.path.join(directorio, "vectorizer.pkl"))
+
+
+# --- Etapas ---
+# Cada una recibe la carpeta de la escala (y la del modelo), carga sus entradas fuera del
+# cronometro y devuelve (elementos procesados, segundos de la etapa).
+
+def _titulos(directorio):
+    import pandas as pd
+    return pd.read_parquet(os.path.join(directorio, "normas.parquet"), columns=["titulo"])["titulo"]
+
+
+def etapa_parsear_boe(directorio, _):
+    from parser_normas import parsear_boe
+    rutas = sorted(glob.glob(os.path.join(directorio, "data", "raw_boe", "*.xml")))
+    inicio = time.perf_counter()
+    n = sum(len(parsear_boe(ruta)) for ruta in rutas)
+    return n, time.perf_counter() - inicio
+
+
+def etapa_procesar_sumario_json(directorio, _):
+    os.chdir(directorio)  # al importarse, descargador_api crea su carpeta de logs
+    with _silencio():
+        from run_prediction_pipeline import procesar_sumario_json
+    rutas = sorted(glob.glob(os.path.join(directorio, "data", "raw_boe_json", "*.json")))
+    inicio = time.perf_counter()
+    n = sum(len(procesar_sumario_json(ruta)) for ruta in rutas)
+    return n, time.perf_counter() - inicio
+
+
+def etapa_clasificar_sector(directorio, _):
+    from clasificador import clasificar_sector
+    titulos = _titulos(directorio).tolist()
+    inicio = time.perf_counter()
+    for titulo in titulos:
+        clasificar_sector(titulo)
+    return len(titulos), time.perf_counter() - inicio
+
+
+def etapa_clasificar_sectores(directorio, _):
+    from clasificador import clasificar_sectores
+    titulos = _titulos(directorio)
+    inicio = time.perf_counter()
+    clasificar_sectores(titulos)
+    return len(titulos), time.perf_counter() - inicio
+
+
+def _modelo(directorio_modelo):
+    import joblib
+    return (joblib.load(os.path.join(directorio_modelo, "modelo.pkl")),
+            joblib.load(os.path.join(directorio_modelo, "vectorizer.pkl")))
+
+
+def etapa_vectorizar(directorio, directorio_modelo):
+    """vectorizer.transform + palabras clave: las features que recibe el modelo."""
+    from features import construir_features
+    modelo, vectorizer = _modelo(directorio_modelo)
+    titulos = _titulos(directorio)
+    inicio = time.perf_counter()
+    construir_features(vectorizer, titulos, modelo)
+    return len(titulos), time.perf_counter() - inicio
+
+
+def etapa_predecir(directorio, directorio_modelo):
+    from features import construir_features
+    modelo, vectorizer = _modelo(directorio_modelo)
+    titulos = _titulos(directorio)
+    X = construir_features(vectorizer, titulos, modelo)
+    inicio = time.perf_counter()
+    modelo.predict_proba(X)
+    return len(titulos), time.perf_counter() - inicio
+
+
+def etapa_generar_alertas(directorio, _):
+    import pandas as pd
+    from alertas import generar_alertas
+    df = pd.read_parquet(os.path.join(directorio, "normas.parquet"))
+    os.chdir(directorio)  # escribe data/alertas.json
+    inicio = time.perf_counter()
+    with _silencio():
+        generar_alertas(df)
+    return len(df), time.perf_counter() - inicio
+
+
+def etapa_consolidar_historicos(directorio, _):
+    """Consolidacion completa de todos los XML: parseo, clasificacion, Parquet y base de datos."""
+    from almacen import DATASET_PARA_ETIQUETAR
+    from base_datos import BD_PATH
+    from procesar_historicos import MANIFIESTO_PATH, consolidar_historicos
+    os.chdir(directorio)  # lee data/raw_boe y escribe en data/
+    # Cada repeticion parte de cero
+    shutil.rmtree(DATASET_PARA_ETIQUETAR, ignore_errors=True)
+    for ruta in (MANIFIESTO_PATH, BD_PATH, BD_PATH + "-wal", BD_PATH + "-shm"):
+        if os.path.exists(ruta):
+            os.remove(ruta)
+    n = len(glob.glob(os.path.join("data", "raw_boe", "*.xml")))
+    inicio = time.perf_counter()
+    with _silencio():
+        consolidar_historicos(completo=True)
+    return n, time.perf_counter() - inicio
+
+
+ETAPAS = {
+    "parsear_boe": etapa_parsear_boe,
+    "procesar_sumario_json": etapa_procesar_sumario_json,
+    "clasificar_sector": etapa_clasificar_sector,
+    "clasificar_sectores": etapa_clasificar_sectores,
+    "vectorizar": etapa_vectorizar,
+    "predecir": etapa_predecir,
+    "generar_alertas": etapa_generar_alertas,
+    "consolidar_historicos": etapa_consolidar_historicos,
+}
+# Se importan antes de cronometrar para que la memoria base sea la misma en todas las etapas
+PRECARGA = ("numpy", "pandas", "pyarrow.parquet", "joblib", "sklearn.ensemble", "sklearn.feature_extraction.text")
+
+
+# --- Ejecucion y comparacion ---
+
+def ejecutar(escalas, etapas, por_dia, repeticiones, semilla=SEMILLA):
+    """Mide `etapas` en cada escala. De `repeticiones` ejecuciones se queda con la mejor."""
+    directorio = tempfile.mkdtemp(prefix="bench_suite_")
+    directorio_modelo = os.path.join(directorio, "modelo")
+    os.makedirs(directorio_modelo)
+    medir_en_subproceso(preparar_modelo, directorio_modelo, NORMAS_ENTRENAMIENTO, semilla)
+    resultados = {
+        "fecha": datetime.now().isoformat(timespec="seconds"),
+        "entorno": {"python": platform.python_version(), "plataforma": platform.platform(),
+                    "nucleos": os.cpu_count()},
+        "parametros": {"normas_por_dia": por_dia, "semilla": semilla, "repeticiones": repeticiones},
+        "escalas": {},
+    }
+    for escala in escalas:
+        carpeta = os.path.join(directorio, escala)
+        segundos, _, normas = medir_en_subproceso(preparar, carpeta, ESCALAS[escala], por_dia, semilla)
+        print(f"\n--- Escala '{escala}': {ESCALAS[escala]} dias, {normas} normas (generadas en {segundos:.1f}s) ---")
+        print(f"{'etapa':<24} {'elementos':>10} {'segundos':>9} {'elem/s':>11} {'pico MB':>8}")
+        medidas = {}
+        for nombre in etapas:
+            ejecuciones = [medir_en_subproceso(ETAPAS[nombre], carpeta, directorio_modelo, precargar=PRECARGA)
+                           for _ in range(repeticiones)]
+            elementos, t = min((r[2] for r in ejecuciones), key=lambda r: r[1])
+            pico = min(r[1] for r in ejecuciones)
+            medidas[nombre] = {"elementos": elementos, "segundos": round(t, 4), "pico_mb": round(pico, 1),
+                               "elementos_por_segundo": round(elementos / t, 1) if t > 0 else None}
+            print(f"{nombre:<24} {elementos:>10} {t:>9.3f} {medidas[nombre]['elementos_por_segundo'] or 0:>11.0f} "
+                  f"{pico:>8.1f}")
+        resultados["escalas"][escala] = {"dias": ESCALAS[escala], "normas": normas, "etapas": medidas}
+        shutil.rmtree(carpeta, ignore_errors=True)
+    shutil.rmtree(directorio, ignore_errors=True)
+    return resultados
+
+
+def comparar(actual, base, umbral=UMBRAL, umbral_memoria=UMBRAL):
+    """Compara dos resultados etapa a etapa. Devuelve la lista de regresiones (escala, etapa, motivo)."""
+    regresiones = []
+    print(f"\n--- Comparacion con la linea base del {base.get('fecha', '?')} "
+          f"(umbral: +{umbral:.0%} tiempo, +{umbral_memoria:.0%} memoria) ---")
+    print(f"{'escala':<8} {'etapa':<24} {'base s':>8} {'actual s':>9} {'cambio':>8} "
+          f"{'base MB':>8} {'actual MB':>10} {'cambio':>8}  estado")
+    for escala, datos in actual["escalas"].items():
+        etapas_base = base.get("escalas", {}).get(escala, {}).get("etapas", {})
+        for etapa, medida in datos["etapas"].items():
+            ref = etapas_base.get(etapa)
+            if ref is None:
+                continue
+            if ref["elementos"] != medida["elementos"]:
+                print(f"{escala:<8} {etapa:<24} [AVISO] entradas distintas ({ref['elementos']} frente a "
+                      f"{medida['elementos']} elementos), no se compara")
+                continue
+            cambio_t = medida["segundos"] / ref["segundos"] - 1 if ref["segundos"] else 0.0
+            cambio_m = medida["pico_mb"] / ref["pico_mb"] - 1 if ref["pico_mb"] else 0.0
+            motivos = []
+            if cambio_t > umbral and medida["segundos"] - ref["segundos"] > MIN_SEGUNDOS:
+                motivos.append("tiempo")
+            if cambio_m > umbral_memoria and medida["pico_mb"] - ref["pico_mb"] > MIN_MB:
+                motivos.append("memoria")
+            regresiones.extend((escala, etapa, motivo) for motivo in motivos)
+            print(f"{escala:<8} {etapa:<24} {ref['segundos']:>8.3f} {medida['segundos']:>9.3f} {cambio_t:>+8.0%} "
+                  f"{ref['pico_mb']:>8.1f} {medida['pico_mb']:>10.1f} {cambio_m:>+8.0%}  "
+                  f"{'REGRESION (' + ', '.join(motivos) + ')' if motivos else 'ok'}")
+    return regresiones
+
+
+def _leer(ruta):
+    with open(ruta, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--escalas", nargs="+", choices=list(ESCALAS), default=["dia", "anio"])
+    parser.add_argument("--etapas", nargs="+", choices=list(ETAPAS), default=list(ETAPAS))
+    parser.add_argument("--normas-por-dia", type=int, default=NORMAS_POR_DIA)
+    parser.add_argument("--repeticiones", type=int, default=1, help="Se guarda la mejor de N ejecuciones por etapa.")
+    parser.add_argument("--salida", help="Archivo JSON donde guardar los resultados.")
+    parser.add_argument("--resultados", help="Compara este JSON ya guardado en lugar de ejecutar la suite.")
+    parser.add_argument("--comparar", metavar="LINEA_BASE", help="JSON de referencia con el que comparar.")
+    parser.add_argument("--umbral", type=float, default=UMBRAL, help="Empeoramiento de tiempo tolerado (0.2 = 20%%).")
+    parser.add_argument("--umbral-memoria", type=float, default=UMBRAL, help="Empeoramiento de memoria pico tolerado.")
+    args = parser.parse_args()
+
+    if args.resultados:
+        resultados = _leer(args.resultados)
+    else:
+        resultados = ejecutar(args.escalas, args.etapas, args.normas_por_dia, args.repeticiones)
+        if args.salida:
+            with open(args.salida, "w", encoding="utf-8") as f:
+                json.dump(resultados, f, indent=2, ensure_ascii=False)
+            print(f"\n[OK] Resultados guardados en '{args.salida}'.")
+
+    if args.comparar:
+        regresiones = comparar(resultados, _leer(args.comparar), args.umbral, args.umbral_memoria)
+        if regresiones:
+            print(f"\n[ERROR] {len(regresiones)} regresiones respecto a '{args.comparar}'.")
+            sys.exit(1)
+        print("\n[OK] Ninguna etapa empeora por encima del umbral.")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,35 +1,79 @@
 import dash
 from dash import dcc, html, dash_table, Input, Output, State, callback_context
-import pandas as pd
-import os
 import requests
 from datetime import datetime
+from scripts.base_datos import BD_MUESTRA, BD_PATH, leer_alertas, sectores_alertas
 
 # --- Constantes ---
 API_URL = "http://127.0.0.1:5001"
-ALERTAS_PATH = "data/alertas.json"
+JOB_POLL_MS = 1000
+PAGE_SIZE = 15
+# Segundos sin teclear antes de enviar la busqueda al servidor
+DEBOUNCE_BUSQUEDA = 0.4
+# Las alertas se acumulan dia a dia, asi que mostramos tambien la fecha
+COLUMNAS = ['fecha_publicacion', 'titulo', 'sector', 'tipo_norma', 'departamento']
+# Modo del pipeline (parametro 'mode' de /actualizar): la muestra de laboratorio guarda sus
+# resultados en su propia base de datos, que la tabla consulta con ?bd=muestra
+MODOS = {'sample': "Muestra de laboratorio", 'api': "BOE del dia (API)"}
+MODO_POR_DEFECTO = 'sample'
+ESTILO_OK = {'border': '2px solid green', 'backgroundColor': '#e6ffed', 'padding': '10px', 'borderRadius': '5px'}
+ESTILO_EN_CURSO = {'border': '2px solid #1f77b4', 'backgroundColor': '#e8f1fb', 'padding': '10px', 'borderRadius': '5px'}
+ESTILO_ERROR = {'border': '2px solid red', 'backgroundColor': '#ffe6e6', 'padding': '10px', 'borderRadius': '5px'}
 
 # --- Inicialización de la App ---
 app = dash.Dash(__name__, external_stylesheets=['https://codepen.io/chriddyp/pen/bWLwgP.css'])
 app.title = "Gestor Predictivo BOE"
 
 # --- Funciones Auxiliares ---
-def cargar_datos():
-    """Carga los datos desde el archivo JSON de alertas de forma segura."""
-    if os.path.exists(ALERTAS_PATH) and os.path.getsize(ALERTAS_PATH) > 0:
-        try:
-            # Leemos el archivo y nos aseguramos de que las columnas esperadas existan
-            df = pd.read_json(ALERTAS_PATH)
-            expected_cols = ['titulo', 'sector', 'tipo_norma', 'departamento']
-            for col in expected_cols:
-                if col not in df.columns:
-                    df[col] = None # Añade la columna vacía si no existe
-            return df
-        except ValueError:
-            # Si el JSON está malformado, devuelve un DataFrame vacío pero con la estructura correcta
-            return pd.DataFrame(columns=['titulo', 'sector', 'tipo_norma', 'departamento'])
-    # Si el archivo no existe o está vacío, también devolvemos la estructura correcta
-    return pd.DataFrame(columns=['titulo', 'sector', 'tipo_norma', 'departamento'])
+# Las alertas se acumulan sin limite dia a dia: el dashboard no las guarda, pide a la API solo
+# la pagina visible (ya filtrada y ordenada en SQLite) y el total para el paginador.
+
+def _es_muestra(modo):
+    return (modo or MODO_POR_DEFECTO) == 'sample'
+
+def pagina_alertas(sector, busqueda, orden, page_current, page_size, modo=MODO_POR_DEFECTO):
+    """
+    Una pagina de alertas de /alertas y el total de la cabecera X-Total-Count. Si la API no
+    responde, la misma consulta se hace directamente en la base de datos.
+    Con el modo muestra se consultan las alertas de la base de datos de la muestra.
+    Devuelve (total, filas, aviso).
+    """
+    params = {'limit': page_size, 'offset': page_current * page_size}
+    if _es_muestra(modo):
+        params['bd'] = 'muestra'
+    if sector:
+        params['sector'] = sector
+    if busqueda:
+        params['q'] = busqueda
+    columnas_orden = [('-' if direccion == 'desc' else '') + columna for columna, direccion in orden if columna in COLUMNAS]
+    if columnas_orden:
+        params['orden'] = ','.join(columnas_orden)
+    try:
+        response = requests.get(f"{API_URL}/alertas", params=params, timeout=5)
+        response.raise_for_status()
+        return int(response.headers.get('X-Total-Count', 0)), response.json(), ""
+    except requests.exceptions.RequestException:
+        total, df = leer_alertas(sector=sector, q=busqueda, limit=page_size, offset=params['offset'],
+                                 orden=columnas_orden, ruta=BD_MUESTRA if _es_muestra(modo) else BD_PATH)
+        return total, df.to_dict('records'), " (API no disponible: leidas de la base de datos)"
+
+def columnas_tabla(nombres):
+    return [{"name": i.replace('_', ' ').title(), "id": i} for i in nombres]
+
+def buscar_en_historico(texto, sector, orden, page_current, page_size, modo=MODO_POR_DEFECTO):
+    """Pide a la API (/buscar) una pagina de resultados. Devuelve (total, filas) o lanza RequestException."""
+    params = {'q': texto, 'limit': page_size, 'offset': page_current * page_size}
+    if _es_muestra(modo):
+        params['bd'] = 'muestra'
+    if sector:
+        params['sector'] = sector
+    if orden:
+        columna, direccion = orden[0]
+        params['orden'] = ('-' if direccion == 'desc' else '') + columna
+    response = requests.get(f"{API_URL}/buscar", params=params, timeout=5)
+    response.raise_for_status()
+    respuesta = response.json()
+    return respuesta['total'], respuesta['resultados']
 
 # --- Layout de la Interfaz (UI) ---
 app.layout = html.Div(style={'fontFamily': 'sans-serif', 'padding': '20px'}, children=[
@@ -37,24 +81,38 @@ app.layout = html.Div(style={'fontFamily': 'sans-serif', 'padding': '20px'}, chi
     html.Hr(),
 
     html.Div([
+        dcc.RadioItems(id='modo-datos', options=[{'label': v, 'value': k} for k, v in MODOS.items()],
+                       value=MODO_POR_DEFECTO, inline=True, style={'marginBottom': '10px'}),
         html.Button('🔄 Actualizar Datos y Predecir con IA', id='update-button', n_clicks=0, style={'fontSize': '16px'}),
         dcc.Loading(id="loading-spinner", type="circle", children=html.Div(id="loading-output"))
     ], style={'marginBottom': '20px'}),
+    # Trabajo del pipeline en curso y sondeo periodico de su estado en la API
+    dcc.Store(id='job-store'),
+    dcc.Interval(id='job-poll', interval=JOB_POLL_MS, disabled=True),
     
     html.Div(id='notification-area', style={'marginBottom': '20px', 'padding': '10px', 'borderRadius': '5px'}),
 
     html.Div([
         dcc.Dropdown(id='sector-filter', placeholder="Filtrar por sector..."),
-        dcc.Input(id='search-input', type='text', placeholder='Buscar por palabra clave...', style={'marginLeft': '10px', 'width': '300px'}),
+        dcc.Input(id='search-input', type='text', placeholder='Buscar en todo el historico...', debounce=DEBOUNCE_BUSQUEDA, style={'marginLeft': '10px', 'width': '300px'}),
     ], className='row', style={'marginBottom': '20px'}),
     
     html.Hr(),
 
     html.H2(children='🚨 Alertas y Disposiciones'),
+    # Cambia cada vez que termina un pipeline para que la tabla y los filtros se refresquen
+    dcc.Store(id='datos-version'),
+    html.Div(id='total-alertas', style={'marginBottom': '10px'}),
+    # Paginacion y orden en el servidor: el navegador solo recibe la pagina visible
     dash_table.DataTable(
         id='alertas-table',
-        columns=[{"name": i.replace('_', ' ').title(), "id": i} for i in ['titulo', 'sector', 'tipo_norma', 'departamento']],
-        page_size=15,
+        columns=columnas_tabla(COLUMNAS),
+        page_current=0,
+        page_size=PAGE_SIZE,
+        page_action='custom',
+        sort_action='custom',
+        sort_mode='multi',
+        sort_by=[],
         style_table={'overflowX': 'auto'},
         style_header={'backgroundColor': 'rgb(230, 230, 230)', 'fontWeight': 'bold'},
         style_cell={'textAlign': 'left', 'padding': '10px', 'whiteSpace': 'normal', 'height': 'auto'},
@@ -63,54 +121,128 @@ app.layout = html.Div(style={'fontFamily': 'sans-serif', 'padding': '20px'}, chi
 
 # --- Lógica Interactiva (Callbacks) ---
 
+def alarma_conexion():
+    timestamp = datetime.now().strftime("%H:%M:%S")
+    mensaje = f"No se pudo conectar o la API falló. Asegúrate de que el servidor de la API (gestor_api.py) se está ejecutando y revisa su terminal para ver los errores."
+    return html.Div([html.H4(f"🚨 ALARMA DE CONEXIÓN/PROCESAMIENTO ({timestamp})"), html.P(mensaje)])
+
 @app.callback(
     Output('notification-area', 'children'),
     Output('notification-area', 'style'),
-    Output('alertas-table', 'data'),      # Actualizamos la tabla directamente
-    Output('sector-filter', 'options'), # Actualizamos las opciones del filtro
+    Output('job-store', 'data'),
+    Output('job-poll', 'disabled'),
     Input('update-button', 'n_clicks'),
+    State('modo-datos', 'value'),
     prevent_initial_call=True
 )
-def handle_update_click(n_clicks):
-    """Se dispara SOLO al hacer clic en el botón de actualizar."""
+def handle_update_click(n_clicks, modo):
+    """Se dispara SOLO al hacer clic en el botón de actualizar: encola el pipeline y empieza a sondear."""
     try:
-        response = requests.post(f"{API_URL}/actualizar", timeout=30)
+        response = requests.post(f"{API_URL}/actualizar", params={'mode': modo or MODO_POR_DEFECTO}, timeout=5)
         response.raise_for_status()
         api_response = response.json()
 
-        timestamp = datetime.now().strftime("%H:%M:%S")
-        mensaje = f"✅ Éxito ({timestamp}): {api_response.get('message', 'Proceso completado.')}"
-        notificacion = html.Div([html.H4("Actualización Correcta"), html.P(mensaje)])
-        estilo = {'border': '2px solid green', 'backgroundColor': '#e6ffed', 'padding': '10px', 'borderRadius': '5px'}
-        
-        # Recargamos los datos y actualizamos la tabla Y los filtros
-        df_nuevos = cargar_datos()
-        opciones_filtro = [{'label': i, 'value': i} for i in df_nuevos['sector'].unique()]
-        return notificacion, estilo, df_nuevos.to_dict('records'), opciones_filtro
+        mensaje = f"⏳ {api_response.get('message', 'Pipeline encolado.')} (trabajo {api_response['job_id']})"
+        notificacion = html.Div([html.H4("Actualización en curso"), html.P(mensaje)])
+        return notificacion, ESTILO_EN_CURSO, api_response['job_id'], False
 
     except requests.exceptions.RequestException as e:
-        timestamp = datetime.now().strftime("%H:%M:%S")
-        mensaje = f"No se pudo conectar o la API falló. Asegúrate de que el servidor de la API (gestor_api.py) se está ejecutando y revisa su terminal para ver los errores."
-        alarma = html.Div([html.H4(f"🚨 ALARMA DE CONEXIÓN/PROCESAMIENTO ({timestamp})"), html.P(mensaje)])
-        estilo = {'border': '2px solid red', 'backgroundColor': '#ffe6e6', 'padding': '10px', 'borderRadius': '5px'}
-        return alarma, estilo, dash.no_update, dash.no_update
+        return alarma_conexion(), ESTILO_ERROR, None, True
+
+@app.callback(
+    Output('notification-area', 'children', allow_duplicate=True),
+    Output('notification-area', 'style', allow_duplicate=True),
+    Output('job-poll', 'disabled', allow_duplicate=True),
+    Output('datos-version', 'data'),  # Avisa a la tabla y a los filtros de que hay datos nuevos
+    Input('job-poll', 'n_intervals'),
+    State('job-store', 'data'),
+    prevent_initial_call=True
+)
+def poll_job(n_intervals, job_id):
+    """Consulta el estado del trabajo; cuando termina deja de sondear y recarga la tabla."""
+    if not job_id:
+        return dash.no_update, dash.no_update, True, dash.no_update
+    try:
+        response = requests.get(f"{API_URL}/jobs/{job_id}", timeout=5)
+        response.raise_for_status()
+        trabajo = response.json()
+    except requests.exceptions.RequestException:
+        return alarma_conexion(), ESTILO_ERROR, True, dash.no_update
+
+    timestamp = datetime.now().strftime("%H:%M:%S")
+    if trabajo['estado'] in ('en_cola', 'ejecutando'):
+        etapa = trabajo.get('etapa') or 'en cola'
+        mensaje = f"⏳ ({timestamp}) Etapa: {etapa} - {trabajo.get('progreso', 0):.0%}"
+        return html.Div([html.H4("Actualización en curso"), html.P(mensaje)]), ESTILO_EN_CURSO, False, dash.no_update
+
+    if trabajo['estado'] == 'error':
+        mensaje = f"El pipeline falló: {trabajo.get('error')}"
+        alarma = html.Div([html.H4(f"🚨 ERROR EN EL PIPELINE ({timestamp})"), html.P(mensaje)])
+        return alarma, ESTILO_ERROR, True, dash.no_update
+
+    resultado = trabajo.get('resultado') or {}
+    total = trabajo.get('tiempos', {}).get('total', 0)
+    mensaje = f"✅ Éxito ({timestamp}): {resultado.get('mensaje', 'Proceso completado.')} ({total:.1f}s)"
+    notificacion = html.Div([html.H4("Actualización Correcta"), html.P(mensaje)])
+
+    # La tabla y los filtros se recargan al cambiar 'datos-version'
+    return notificacion, ESTILO_OK, True, job_id
+
+@app.callback(
+    Output('sector-filter', 'options'),
+    Input('datos-version', 'data'),
+    Input('modo-datos', 'value'),
+)
+def update_sector_options(_, modo):
+    """Opciones del filtro de sector: los sectores que tienen alguna alerta."""
+    return [{'label': i, 'value': i} for i in sectores_alertas(BD_MUESTRA if _es_muestra(modo) else BD_PATH)]
 
 @app.callback(
-    Output('alertas-table', 'data', allow_duplicate=True), # Usamos allow_duplicate para que la tabla pueda ser actualizada por dos callbacks
+    Output('alertas-table', 'data'),
+    Output('alertas-table', 'columns'),
+    Output('alertas-table', 'page_count'),
+    Output('alertas-table', 'page_current'),
+    Output('total-alertas', 'children'),
+    Input('alertas-table', 'page_current'),
+    Input('alertas-table', 'page_size'),
+    Input('alertas-table', 'sort_by'),
     Input('sector-filter', 'value'),
     Input('search-input', 'value'),
-    prevent_initial_call=True
+    Input('datos-version', 'data'),
+    Input('modo-datos', 'value'),
 )
-def handle_filtering(sector_value, search_value):
-    """Se dispara SOLO al cambiar los filtros."""
-    df_filtrado = cargar_datos() # Siempre trabajamos con los datos más frescos del disco
-
-    if sector_value:
-        df_filtrado = df_filtrado[df_filtrado['sector'] == sector_value]
-    if search_value:
-        df_filtrado = df_filtrado[df_filtrado['titulo'].str.contains(search_value, case=False, na=False)]
-    
-    return df_filtrado.to_dict('records')
+def handle_table(page_current, page_size, sort_by, sector_value, search_value, _, modo):
+    """
+    Filtra, ordena y pagina en el servidor; solo se envia la pagina visible.
+    Sin texto de busqueda muestra las alertas acumuladas; con texto, los resultados del indice
+    de todo el historico (/buscar), o solo las alertas si la API no responde.
+    """
+    orden = tuple((s['column_id'], s['direction']) for s in sort_by or [])
+    # Si cambian los filtros o los datos, volvemos a la primera pagina
+    if callback_context.triggered_id in ('sector-filter', 'search-input', 'datos-version', 'modo-datos'):
+        page_current = 0
+    page_current = page_current or 0
+    page_size = page_size or PAGE_SIZE
+
+    aviso = ""
+    if search_value and search_value.strip():
+        try:
+            total, filas = buscar_en_historico(search_value, sector_value, orden, page_current, page_size, modo)
+            page_count = max(1, -(-total // page_size))
+            filas = [{c: fila.get(c) for c in COLUMNAS} for fila in filas]
+            return (filas, columnas_tabla(COLUMNAS), page_count, page_current,
+                    f"{total} normas del historico para '{search_value}'")
+        except requests.exceptions.RequestException:
+            aviso = " (API no disponible: busqueda solo en las alertas)"
+
+    total, filas, aviso_api = pagina_alertas(sector_value, search_value, orden, page_current, page_size, modo)
+    page_count = max(1, -(-total // page_size))
+    if page_current >= page_count:
+        # La pagina pedida ya no existe (hay menos alertas que antes): mostramos la ultima
+        page_current = page_count - 1
+        total, filas, aviso_api = pagina_alertas(sector_value, search_value, orden, page_current, page_size, modo)
+    filas = [{c: fila.get(c) for c in COLUMNAS} for fila in filas]
+    return filas, columnas_tabla(COLUMNAS), page_count, page_current, f"{total} alertas{aviso or aviso_api}"
 
 
 # --- Punto de Entrada ---
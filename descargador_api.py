@@ -3,6 +3,8 @@ from datetime import date
 import os
 import logging
 import json
+from scripts.cliente_http import get, guardar_respuesta, necesita_revalidacion
+from scripts.base_datos import registrar_descargas
 
 # --- Configuración del Logging ---
 log = logging.getLogger(__name__)
@@ -17,12 +19,19 @@ if not log.handlers:
 
 # --- Constante para la URL base de la API ---
 API_BASE_URL = "https://www.boe.es/datosabiertos/api/boe/sumario/"
+# Nombre de esta fuente en la tabla de descargas de la base de datos
+FUENTE = "api"
 
 def descargar_boe_api(fecha: date):
     """
     Descarga el sumario del BOE para una fecha específica usando la API oficial.
-    Guarda el resultado en un archivo JSON.
+    Guarda el resultado en un archivo JSON y registra la descarga en la base de datos.
     """
+    archivo, estado = _descargar_sumario(fecha)
+    registrar_descargas([(fecha.isoformat(), archivo, estado)], FUENTE)
+    return archivo, estado
+
+def _descargar_sumario(fecha: date):
     fecha_str_url = fecha.strftime("%Y%m%d")
     fecha_str_archivo = fecha.strftime("%Y-%m-%d")
     
@@ -32,8 +41,10 @@ def descargar_boe_api(fecha: date):
     carpeta = "data/raw_boe_json"
     archivo = os.path.join(carpeta, f"boe_{fecha_str_archivo}.json")
 
-    # Verificamos si ya existe para no descargarlo de nuevo
-    if os.path.exists(archivo):
+    # Verificamos si ya existe para no descargarlo de nuevo.
+    # Los sumarios recientes se revalidan con una peticion condicional (304 si no han cambiado).
+    revalidar = os.path.exists(archivo) and necesita_revalidacion(fecha)
+    if os.path.exists(archivo) and not revalidar:
         log.info(f"Archivo '{archivo}' ya existe. No se necesita descarga.")
         return archivo, "EXISTED"
 
@@ -41,7 +52,10 @@ def descargar_boe_api(fecha: date):
     try:
         # La API requiere que especifiquemos que aceptamos JSON
         headers = {'Accept': 'application/json'}
-        response = requests.get(url, headers=headers, timeout=30)
+        response = get(url, headers=headers, timeout=30, archivo_cache=archivo if revalidar else None)
+        if response.status_code == 304:
+            log.info(f"Sumario del {fecha_str_archivo} sin cambios en el servidor (304).")
+            return archivo, "EXISTED"
         
         # La API puede devolver 200 OK pero con un mensaje de error dentro del JSON.
         if response.status_code == 200:
@@ -53,18 +67,18 @@ def descargar_boe_api(fecha: date):
              # Si el código no es 200, lanzamos una excepción para que la capture el bloque except.
             response.raise_for_status()
 
-        os.makedirs(carpeta, exist_ok=True)
-        with open(archivo, "w", encoding='utf-8') as f:
-            json.dump(data, f, ensure_ascii=False, indent=4)
+        contenido = json.dumps(data, ensure_ascii=False, indent=4).encode('utf-8')
+        guardar_respuesta(archivo, contenido, response)
         
         log.info(f"[OK] Sumario del {fecha_str_archivo} descargado en {archivo}")
         return archivo, "DOWNLOADED"
     
     except requests.exceptions.HTTPError as e:
         if e.response.status_code == 404:
+            # Dia sin BOE: mismo estado que el descargador XML, para no confundirlo con un fallo
             log.warning(f"No se encontró sumario para la fecha {fecha_str_archivo}. Posiblemente no hubo publicación.")
-        else:
-            log.error(f"[ERROR] HTTP {e.response.status_code} al descargar desde la API.")
+            return None, "NOT_FOUND"
+        log.error(f"[ERROR] HTTP {e.response.status_code} al descargar desde la API.")
         return None, "HTTP_ERROR"
     except requests.exceptions.RequestException as e:
         log.error(f"[ERROR] de red al descargar desde la API: {e}")
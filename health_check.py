@@ -1,6 +1,8 @@
 import os
+import json
 import requests
 import subprocess
+import tempfile
 import time
 import pandas as pd
 from datetime import date
@@ -27,9 +29,33 @@ SAMPLE_XML_DATA = """
 </boe>
 """
 
+# --- Un mismo dia como sumario XML (consolidacion) y como JSON de la API (pipeline diario) ---
+FECHA_PERSISTENCIA = "2024-03-05"
+NORMAS_PERSISTENCIA = [
+    ("BOE-A-2024-4001", "Real Decreto sobre vivienda protegida.", "MINISTERIO DE VIVIENDA Y AGENDA URBANA"),
+    ("BOE-A-2024-4002", "Orden sobre la pesca de bajura.", "MINISTERIO DE AGRICULTURA, PESCA Y ALIMENTACIÓN"),
+    ("BOE-A-2024-4003", "Resolución sobre energía eólica marina.", "MINISTERIO PARA LA TRANSICIÓN ECOLÓGICA"),
+]
+
+
+def _url_pdf(identificador):
+    return f"/boe/dias/{FECHA_PERSISTENCIA.replace('-', '/')}/pdfs/{identificador}.pdf"
+
+
+def _sumario_xml(normas):
+    epigrafes = "".join(f"<epigrafe><titulo>{t}</titulo><urlPdf>{_url_pdf(i)}</urlPdf>"
+                        f"<departamento>{d}</departamento></epigrafe>" for i, t, d in normas)
+    return f'<boe><sumario><boletin><seccion nombre="Disposiciones generales">{epigrafes}</seccion></boletin></sumario></boe>'
+
+
+def _sumario_json(normas):
+    items = [{"identificador": i, "titulo": t, "departamento": d, "urlPdf": _url_pdf(i)} for i, t, d in normas]
+    return {"sumario": {"metadatos": {"fecha_publicacion": FECHA_PERSISTENCIA.replace('-', '')},
+                        "diario": {"seccion": [{"nombre": "Disposiciones generales", "item": items}]}}}
+
 def test_descarga():
     """Verifica el módulo de descarga."""
-    print("\n[TEST 1/5] Verificando descarga del BOE...")
+    print("\n[TEST 1/7] Verificando descarga del BOE...")
     try:
         from scripts.actualizador_diario import descargar_boe
         fecha_ayer = date.today() - pd.Timedelta(days=1)
@@ -47,7 +73,7 @@ def test_descarga():
 
 def test_parser():
     """Verifica el parser con datos de prueba internos para ser 100% fiable."""
-    print("\n[TEST 2/5] Verificando el parser de normas...")
+    print("\n[TEST 2/7] Verificando el parser de normas...")
     try:
         from scripts.parser_normas import parsear_boe
         # Creamos un archivo de prueba temporal
@@ -69,11 +95,38 @@ def test_parser():
         print(f"  [ERROR CRITICO] en el parser: {e}")
         return False
 
+def _paridad_clasificador():
+    """
+    clasificar_sectores frente a la version original (re.search sector a sector, gana el
+    primero): con las palabras clave del proyecto y con palabras clave que se solapan.
+    """
+    import re
+    from scripts import clasificador
+
+    titulos = ["Impuesto sobre la vivienda y la energía eléctrica", "Energía renovable: ayuda al alquiler",
+               "Orden de pesca", "", None, "Ayuda de vivienda protegida"]
+
+    def original(texto, keywords):
+        if not texto or not isinstance(texto, str):
+            return "desconocido"
+        return next((s for s, p in keywords.items() if re.search(p, texto.lower())), "otros")
+
+    if clasificador.clasificar_sectores(titulos) != [original(t, clasificador.SECTORES_KEYWORDS) for t in titulos]:
+        return False
+    # "ayuda de" (2º sector) empieza antes que "de vivienda" (1º) y se solapan: gana el 1º
+    solapadas = {"inmobiliario": r"\bde vivienda\b", "financiero": r"\bayuda de\b"}
+    guardados = clasificador._PATRONES_SECTOR
+    clasificador._PATRONES_SECTOR = [re.compile(p) for p in solapadas.values()]
+    try:
+        return clasificador.clasificar_sectores(titulos) == [original(t, solapadas) for t in titulos]
+    finally:
+        clasificador._PATRONES_SECTOR = guardados
+
 def test_clasificador_y_alertas():
     """Verifica la clasificación y la generación de alertas con datos de prueba."""
-    print("\n[TEST 3/5] Verificando clasificador y generacion de alertas...")
+    print("\n[TEST 3/7] Verificando clasificador y generacion de alertas...")
     try:
-        from scripts.clasificador import clasificar_sector
+        from scripts.clasificador import clasificar_sectores
         from scripts.alertas import generar_alertas
         
         df_test = pd.DataFrame([
@@ -81,11 +134,14 @@ def test_clasificador_y_alertas():
             {"titulo": "Real Decreto-ley de energia electrica", "impacto_predicho": 1}
         ])
         
-        df_test['sector'] = df_test['titulo'].apply(clasificar_sector)
+        df_test['sector'] = clasificar_sectores(df_test['titulo'])
         # BUG CORREGIDO: 'energético' con tilde
         if 'inmobiliario' not in df_test['sector'].iloc[0] or 'energético' not in df_test['sector'].iloc[1]:
             print("  [FALLO] Resultado: La clasificacion de sectores no funciona como se esperaba")
             return False
+        if not _paridad_clasificador():
+            print("  [FALLO] Resultado: clasificar_sectores no coincide con la busqueda sector a sector")
+            return False
         
         generar_alertas(df_test)
         if os.path.exists("data/alertas.json"):
@@ -98,9 +154,150 @@ def test_clasificador_y_alertas():
         print(f"  [ERROR CRITICO] en clasificacion/alertas: {e}")
         return False
 
+def test_base_datos():
+    """
+    Carga el mismo dia por el camino del XML y por el del JSON en una base de datos temporal:
+    deben ser las mismas normas, con sus etiquetas y predicciones. Comprueba tambien la
+    actualizacion por clave, la sustitucion de un dia, los borrados en cascada y la migracion
+    de las claves antiguas.
+    """
+    print("\n[TEST 4/7] Verificando la base de datos (normas, etiquetas y predicciones)...")
+    try:
+        from scripts.base_datos import (ORIGEN_MANUAL, _migrar_claves, clave_norma, conexion, guardar_etiquetas,
+                                        guardar_normas, guardar_predicciones, leer_etiquetadas, leer_normas,
+                                        transaccion)
+        from scripts.parser_normas import parsear_boe
+        from run_prediction_pipeline import procesar_sumario_json
+
+        fallos = []
+        with tempfile.TemporaryDirectory(ignore_cleanup_errors=True) as tmp:
+            ruta = os.path.join(tmp, "boe.sqlite")
+
+            def cargar_json(normas):
+                archivo = os.path.join(tmp, f"boe_{FECHA_PERSISTENCIA}.json")
+                with open(archivo, "w", encoding="utf-8") as f:
+                    json.dump(_sumario_json(normas), f, ensure_ascii=False)
+                return guardar_normas(pd.DataFrame(procesar_sumario_json(archivo)), borrar_ausentes=True, ruta=ruta)
+
+            def cuenta(tabla):
+                return conexion(ruta).execute(f"SELECT COUNT(*) FROM {tabla}").fetchone()[0]
+
+            # 1. Camino XML (consolidacion de historicos): el parser no da identificador
+            archivo_xml = os.path.join(tmp, f"boe_{FECHA_PERSISTENCIA.replace('-', '_')}.xml")
+            with open(archivo_xml, "w", encoding="utf-8") as f:
+                f.write(_sumario_xml(NORMAS_PERSISTENCIA))
+            ids = guardar_normas(pd.DataFrame(parsear_boe(archivo_xml)), borrar_ausentes=True, ruta=ruta)
+            guardar_normas(pd.DataFrame([{"identificador": "BOE-A-2024-4100", "titulo": "Otro dia.",
+                                          "fecha_publicacion": "2024-03-06"}]), ruta=ruta)
+            guardar_etiquetas(ids[:1], [1], origen=ORIGEN_MANUAL, ruta=ruta)
+            guardar_etiquetas(ids[1:], [0, 1], ruta=ruta)
+            guardar_predicciones(ids, [1, 0, 1], ruta=ruta)
+
+            # 2. Camino JSON (pipeline diario) del mismo dia: mismas normas, nada se pierde
+            if cargar_json(NORMAS_PERSISTENCIA) != ids:
+                fallos.append("El XML y el JSON del mismo dia no dan las mismas normas")
+            if (cuenta("normas"), cuenta("etiquetas"), cuenta("predicciones")) != (4, 3, 3):
+                fallos.append("Recargar el dia desde el JSON ha borrado normas, etiquetas o predicciones")
+
+            # 3. Actualizacion por clave: mismo id y la prediccion del titulo cambiado se descarta
+            cambiadas = [NORMAS_PERSISTENCIA[0], (NORMAS_PERSISTENCIA[1][0], "Orden sobre la pesca de altura.",
+                                                  NORMAS_PERSISTENCIA[1][2]), NORMAS_PERSISTENCIA[2]]
+            if cargar_json(cambiadas) != ids or cuenta("predicciones") != 2:
+                fallos.append("Actualizar un titulo no conserva el id o no invalida su prediccion")
+
+            # 4. Sustitucion del dia: la norma que desaparece se borra con su etiqueta y su
+            #    prediccion; la del otro dia y la que tiene etiqueta manual se conservan
+            cargar_json(cambiadas[1:2])
+            restantes = set(leer_normas(columnas=["id"], ruta=ruta)["id"])
+            if ids[2] in restantes or cuenta("predicciones") != 1:
+                fallos.append("Sustituir el dia no borra en cascada la norma desaparecida")
+            if ids[0] not in restantes or len(restantes) != 3:
+                fallos.append("Sustituir el dia ha borrado una norma con etiqueta manual o de otro dia")
+            etiquetadas = leer_etiquetadas(ruta)
+            if etiquetadas[etiquetadas["origen"] == ORIGEN_MANUAL]["id"].tolist() != ids[:1]:
+                fallos.append("Se ha perdido la etiqueta manual")
+
+            # 5. Migracion de claves: la copia del XML guardada con la regla antigua (hash) y
+            #    etiquetada a mano, y la copia del JSON del mismo dia, se funden en una sola norma
+            ruta_migracion = os.path.join(tmp, "migracion.sqlite")
+            ids_xml = guardar_normas(pd.DataFrame(parsear_boe(archivo_xml)), ruta=ruta_migracion)
+            guardar_etiquetas(ids_xml[:1], [1], origen=ORIGEN_MANUAL, ruta=ruta_migracion)
+            identificador, titulo, departamento = NORMAS_PERSISTENCIA[0]
+            with transaccion(ruta_migracion) as c:
+                c.execute("UPDATE normas SET clave = ? WHERE id = ?",
+                          (clave_norma(titulo, departamento, FECHA_PERSISTENCIA), ids_xml[0]))
+            archivo_json = os.path.join(tmp, "migracion.json")
+            with open(archivo_json, "w", encoding="utf-8") as f:
+                json.dump(_sumario_json(NORMAS_PERSISTENCIA[:1]), f, ensure_ascii=False)
+            ids_json = guardar_normas(pd.DataFrame(procesar_sumario_json(archivo_json)), ruta=ruta_migracion)
+            guardar_etiquetas(ids_json, [0], ruta=ruta_migracion)
+            with transaccion(ruta_migracion) as c:
+                _migrar_claves(c)
+                copias = c.execute("SELECT id FROM normas WHERE titulo = ?", (titulo,)).fetchall()
+                clave = c.execute("SELECT clave FROM normas WHERE id = ?", (ids_json[0],)).fetchone()
+            etiquetadas = leer_etiquetadas(ruta_migracion).set_index("id")
+            if copias != [(ids_json[0],)] or clave != (identificador,):
+                fallos.append("La migracion de claves no funde la copia del XML con la del JSON")
+            elif etiquetadas.loc[ids_json[0], "origen"] != ORIGEN_MANUAL or etiquetadas.loc[ids_json[0], "impacto"] != 1:
+                fallos.append("La migracion de claves ha perdido la etiqueta manual")
+
+            # 6. Recargar el dia sin la norma etiquetada a mano (borrar_ausentes=True) no la borra
+            guardar_normas(pd.DataFrame(parsear_boe(archivo_xml)).iloc[1:], borrar_ausentes=True, ruta=ruta_migracion)
+            etiquetadas = leer_etiquetadas(ruta_migracion)
+            if etiquetadas[etiquetadas["origen"] == ORIGEN_MANUAL]["id"].tolist() != ids_json[:1]:
+                fallos.append("borrar_ausentes ha borrado una norma con etiqueta manual")
+
+        for fallo in fallos:
+            print(f"  [FALLO] Resultado: {fallo}")
+        if not fallos:
+            print("  [OK] Resultado: XML y JSON comparten normas; etiquetas, predicciones, cascadas y migracion correctas")
+        return not fallos
+    except Exception as e:
+        print(f"  [ERROR CRITICO] en la base de datos: {e}")
+        return False
+
+def test_buscador():
+    """Verifica que el indice de texto completo sigue a las altas, cambios y bajas de normas."""
+    print("\n[TEST 5/7] Verificando el buscador de texto completo...")
+    try:
+        from scripts.base_datos import guardar_normas
+        from scripts.buscador import Buscador
+
+        fallos = []
+        with tempfile.TemporaryDirectory(ignore_cleanup_errors=True) as tmp:
+            ruta = os.path.join(tmp, "boe.sqlite")
+            buscador = Buscador(ruta)
+            df = pd.DataFrame([{"identificador": i, "titulo": t, "departamento": d, "fecha_publicacion": FECHA_PERSISTENCIA,
+                                "sector": "otros"} for i, t, d in NORMAS_PERSISTENCIA])
+            guardar_normas(df, ruta=ruta)
+
+            total, resultados = buscador.buscar("energia eolica")
+            if total != 1 or resultados[0]["titulo"] != NORMAS_PERSISTENCIA[2][1]:
+                fallos.append("La busqueda sin tildes no encuentra la norma")
+            if buscador.buscar("eoli")[0] != 1:
+                fallos.append("La ultima palabra no funciona como prefijo")
+            if buscador.buscar("pesca", sector="inmobiliario")[0] != 0:
+                fallos.append("El filtro por sector no se aplica")
+
+            df.loc[1, "titulo"] = "Orden sobre la flota de altura."
+            guardar_normas(df.iloc[:2], borrar_ausentes=True, ruta=ruta)
+            if buscador.buscar("bajura")[0] != 0 or buscador.buscar("flota")[0] != 1:
+                fallos.append("El indice no refleja el titulo actualizado")
+            if buscador.buscar("eolica")[0] != 0:
+                fallos.append("El indice sigue devolviendo una norma borrada")
+
+        for fallo in fallos:
+            print(f"  [FALLO] Resultado: {fallo}")
+        if not fallos:
+            print("  [OK] Resultado: El indice encuentra, actualiza y borra normas correctamente")
+        return not fallos
+    except Exception as e:
+        print(f"  [ERROR CRITICO] en el buscador: {e}")
+        return False
+
 def test_microservicio():
     """Lanza la API, comprueba el endpoint /ping y la detiene."""
-    print("\n[TEST 4/5] Verificando el microservicio Flask (API)...")
+    print("\n[TEST 6/7] Verificando el microservicio Flask (API)...")
     proceso_api = None
     try:
         comando_api = ["python", "-m", "app.gestor_api"]
@@ -149,7 +346,7 @@ def test_microservicio():
 
 def test_dashboard():
     """Verifica que el comando para lanzar el dashboard es válido."""
-    print("\n[TEST 5/5] Verificando el dashboard...")
+    print("\n[TEST 7/7] Verificando el dashboard...")
     try:
         comando = ["streamlit", "run", "dashboards/streamlit_app.py", "--server.runOnSave=false"]
         proc = subprocess.Popen(comando, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
@@ -174,6 +371,8 @@ if __name__ == "__main__":
         "Descarga": test_descarga(),
         "Parser": test_parser(),
         "Clasificacion y Alertas": test_clasificador_y_alertas(),
+        "Base de datos": test_base_datos(),
+        "Buscador": test_buscador(),
         "Microservicio API": test_microservicio(),
         "Dashboard": test_dashboard(),
     }
@@ -1,18 +1,24 @@
 import os
-import sys
+import time
+import argparse
+import numpy as np
 import pandas as pd
-import joblib
-from datetime import date
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime, timedelta
 import json
 
 # --- CAMBIO IMPORTANTE: Importamos la nueva función del nuevo archivo ---
-from scripts.descargador_api import descargar_boe_api
+# (descargador_api vive en la raiz y descarga a traves del cliente HTTP compartido)
+from descargador_api import descargar_boe_api
 # Ya no necesitamos el parser de XML, pero sí el clasificador
-from scripts.clasificador import clasificar_sector
+from scripts.clasificador import matriz_palabras_clave, sector_desde_matriz
 from scripts.alertas import generar_alertas
-
-MODEL_PATH = "modelos/modelo_impacto.pkl"
-VECTORIZER_PATH = "modelos/vectorizer.pkl"
+from scripts.modelo import cargar_artefactos, version_artefactos
+from scripts.cache_predicciones import predecir_con_cache
+from scripts.instrumentacion import ejecucion
+from scripts.base_datos import (BD_MUESTRA, BD_PATH, guardar_normas, guardar_predicciones, ids_con_prediccion,
+                                 leer_alertas, leer_normas, publicar_alertas)
 
 def procesar_sumario_json(archivo_json):
     """
@@ -26,6 +32,14 @@ def procesar_sumario_json(archivo_json):
         print(f"  [ERROR] No se pudo leer o procesar el archivo JSON: {e}")
         return None
     
+    # Fecha del sumario (AAAAMMDD en la API), si el archivo la trae
+    fecha = data.get('sumario', {}).get('metadatos', {}).get('fecha_publicacion')
+    try:
+        fecha = datetime.strptime(fecha.replace('-', ''), "%Y%m%d").date().isoformat() if fecha else None
+    except (AttributeError, ValueError):
+        print(f"  [AVISO] Fecha de sumario no valida en '{archivo_json}': {fecha}")
+        fecha = None
+
     normas = []
     # La estructura del JSON de la API es diferente, navegamos por ella de forma segura.
     for seccion in data.get('sumario', {}).get('diario', {}).get('seccion', []):
@@ -36,70 +50,315 @@ def procesar_sumario_json(archivo_json):
             
         for item in items:
             normas.append({
+                # Identificador del BOE (p. ej. BOE-A-2024-1234): la clave de la norma en la base de datos
+                'identificador': item.get('identificador'),
                 'titulo': item.get('titulo'),
                 'departamento': item.get('departamento'),
                 # Construimos la URL completa para que sea un enlace directo
                 'url_pdf': "https://www.boe.es" + item.get('urlPdf', ''),
-                'tipo_norma': seccion.get('nombre')
+                'tipo_norma': seccion.get('nombre'),
+                'fecha_publicacion': fecha
             })
     return normas
 
 
-def ejecutar_pipeline_predictivo(usar_muestra=False):
+ETAPAS = ["descarga", "procesado", "carga_modelo", "prediccion", "alertas"]
+
+
+def ejecutar_pipeline_predictivo(usar_muestra=False, artefactos=None, progreso=None,
+                                 version_modelo=None, usar_cache=True, trazar=True):
     """
     Pipeline actualizado para usar la API del BOE y procesar JSON.
+    Es incremental por norma: cada item se identifica por su identificador del BOE (o su URL)
+    y solo se puntuan los que aun no tienen prediccion de la version actual del modelo, asi
+    repetir un dia sin cambios apenas cuesta y las alertas se acumulan dia a dia.
+    `artefactos` permite pasar un (modelo, vectorizer) ya cargado en memoria (p. ej. desde
+    la API) para no leerlos de disco en cada ejecucion; `version_modelo` es su version, que
+    se usa para saber que normas ya estan puntuadas y como parte de la clave de la cache de
+    predicciones. Con `usar_cache=False` se vuelven a puntuar todas las normas del dia.
+    Con `usar_muestra`, el sumario de laboratorio se procesa en BD_MUESTRA, con su propia fecha,
+    y no se exporta alertas.json.
+    `progreso(etapa, fraccion)` se llama al empezar cada una de las ETAPAS.
+    Con `trazar`, los tiempos, la CPU, la memoria y los contadores de cada etapa se añaden al
+    registro de ejecuciones (ver scripts/instrumentacion.py).
+    Devuelve un resumen con 'estado' ("completado", "sin_datos" o "error") y 'mensaje'.
     """
+    with ejecucion("diario", activa=trazar) as traza:
+        resultado = _pipeline_diario(traza, usar_muestra, artefactos, progreso, version_modelo, usar_cache)
+        traza.finalizar(resultado)
+    return resultado
+
+
+def _pipeline_diario(traza, usar_muestra, artefactos, progreso, version_modelo, usar_cache):
+    def avisar(paso):
+        if progreso is not None:
+            progreso(ETAPAS[paso - 1], (paso - 1) / len(ETAPAS))
+
     print("--- Iniciando Pipeline de Prediccion (Version API v2.0) ---")
+    avisar(1)
+    ruta_bd = BD_MUESTRA if usar_muestra else BD_PATH
 
     archivo_json = None
-    if usar_muestra:
-        print("\n[Paso 1/5] MODO SIMULADOR ACTIVADO")
-        # Para el modo muestra, ahora necesitamos un 'sample_boe.json'
-        archivo_json = "data/sample_boe.json"
-        if not os.path.exists(archivo_json):
-            print(f"  [ERROR] Archivo de muestra '{archivo_json}' no encontrado.")
-            return
-        print(f"  [OK] Usando archivo de laboratorio: {archivo_json}")
-    else:
-        print("\n[Paso 1/5] Descargando sumario del BOE via API...")
-        archivo_json, status = descargar_boe_api(date.today())
-        if status not in ["DOWNLOADED", "EXISTED"]:
-            print(f"  [AVISO] No se pudo descargar el sumario. Pipeline detenido. (Estado: {status})")
-            return
+    with traza.etapa("descarga"):
+        if usar_muestra:
+            print("\n[Paso 1/5] MODO SIMULADOR ACTIVADO")
+            # Para el modo muestra, ahora necesitamos un 'sample_boe.json'
+            archivo_json = "data/sample_boe.json"
+            if not os.path.exists(archivo_json):
+                print(f"  [ERROR] Archivo de muestra '{archivo_json}' no encontrado.")
+                return {"estado": "error", "mensaje": f"Archivo de muestra '{archivo_json}' no encontrado."}
+            print(f"  [OK] Usando archivo de laboratorio: {archivo_json}")
+        else:
+            print("\n[Paso 1/5] Descargando sumario del BOE via API...")
+            archivo_json, status = descargar_boe_api(date.today())
+            if status not in ["DOWNLOADED", "EXISTED"]:
+                print(f"  [AVISO] No se pudo descargar el sumario. Pipeline detenido. (Estado: {status})")
+                return {"estado": "error", "mensaje": f"No se pudo descargar el sumario (Estado: {status})."}
 
+    avisar(2)
     print("\n[Paso 2/5] Procesando normas desde JSON...")
-    normas_hoy = procesar_sumario_json(archivo_json)
+    with traza.etapa("procesado") as etapa:
+        normas_hoy = procesar_sumario_json(archivo_json)
+        etapa.contar("elementos", len(normas_hoy or ()))
     if not normas_hoy:
         print("  [AVISO] No se encontraron normas validas. Pipeline finalizado.")
-        return
-    df_hoy = pd.DataFrame(normas_hoy)
-    df_hoy['sector'] = df_hoy['titulo'].apply(clasificar_sector)
+        return {"estado": "sin_datos", "mensaje": "No se encontraron normas validas."}
+    with traza.etapa("clasificacion") as etapa:
+        df_hoy = pd.DataFrame(normas_hoy)
+        fecha = normas_hoy[0]['fecha_publicacion'] or date.today().isoformat()
+        df_hoy['fecha_publicacion'] = fecha
+        # Una sola pasada de palabras clave: da el sector y, mas adelante, features para el modelo
+        matriz_palabras = matriz_palabras_clave(df_hoy['titulo'])
+        df_hoy['sector'] = sector_desde_matriz(matriz_palabras, df_hoy['titulo'])
+        etapa.contar("elementos", len(df_hoy))
+    with traza.etapa("guardado_normas") as etapa:
+        # Las normas se guardan ya: las que no cambian conservan su id y su prediccion, y las
+        # que han desaparecido del sumario (que es el del dia completo) se borran con la suya
+        ids_antes = set(leer_normas(columnas=['id'], desde=fecha, hasta=fecha, ruta=ruta_bd)['id'])
+        ids = guardar_normas(df_hoy, borrar_ausentes=True, ruta=ruta_bd)
+        borradas = len(ids_antes - set(ids))
+        etapa.contar("elementos", len(ids))
     print(f"  [OK] Se han procesado {len(df_hoy)} normas.")
 
-    # El resto del pipeline (pasos 3, 4 y 5) no necesita cambios,
-    # ya que opera sobre el DataFrame 'df_hoy', que ahora creamos a partir del JSON.
-    
+    # Si el modelo viene de disco, la version promovida se resuelve una sola vez y luego se
+    # carga justo esa: aunque se promueva otra a mitad de ejecucion, todas las predicciones
+    # de esta ejecucion son de un mismo modelo y llevan su version
+    if artefactos is None:
+        version_modelo = version_artefactos()
+    ya_puntuadas = ids_con_prediccion(ids, version_modelo, ruta=ruta_bd) if usar_cache and version_modelo else set()
+    pendientes = [posicion for posicion, i in enumerate(ids) if i not in ya_puntuadas]
+    print(f"  [OK] {len(pendientes)} normas nuevas o modificadas por puntuar, "
+          f"{len(ids) - len(pendientes)} ya puntuadas con el modelo actual.")
+
+    if not pendientes:
+        avisar(5)
+        if borradas:
+            with traza.etapa("alertas"):
+                publicar_alertas(fecha, ruta=ruta_bd)
+                if not usar_muestra:
+                    exportar_alertas()
+        print("\n--- Nada nuevo que predecir: las alertas ya estaban al dia. ---")
+        return {"estado": "completado", "mensaje": f"{len(df_hoy)} normas ya estaban procesadas.",
+                "normas": len(df_hoy), "nuevas": 0, "alertas": 0, "cache": None}
+
+    avisar(3)
     print("\n[Paso 3/5] Cargando modelo de Inteligencia Artificial...")
-    if not os.path.exists(MODEL_PATH) or not os.path.exists(VECTORIZER_PATH):
-        print(f"  [ERROR] Modelo no encontrado. Ejecuta 'entrenar_modelo.py' primero.")
-        return
-    modelo = joblib.load(MODEL_PATH)
-    vectorizer = joblib.load(VECTORIZER_PATH)
-    print("  [OK] Cerebro de IA cargado con exito.")
+    if artefactos is not None:
+        modelo, vectorizer = artefactos
+        print("  [OK] Cerebro de IA ya estaba cargado en memoria.")
+    else:
+        if version_modelo is None:
+            print(f"  [ERROR] Modelo no encontrado. Ejecuta 'entrenar_modelo.py' primero.")
+            return {"estado": "error", "mensaje": "Modelo no encontrado. Ejecuta 'entrenar_modelo.py' primero."}
+        with traza.etapa("carga_modelo"):
+            modelo, vectorizer = cargar_artefactos(version_modelo)
+        print(f"  [OK] Cerebro de IA cargado con exito (version {version_modelo}).")
 
+    avisar(4)
     print("\n[Paso 4/5] Realizando predicciones de impacto...")
-    X_hoy = vectorizer.transform(df_hoy['titulo'].astype(str))
-    predicciones = modelo.predict(X_hoy)
-    df_hoy['impacto_predicho'] = predicciones
-    num_alertas = df_hoy['impacto_predicho'].sum()
-    print(f"  [OK] Prediccion completada. Se han detectado {num_alertas} posibles alertas.")
-
-    print("\n[Paso 5/5] Generando archivo final de alertas...")
-    generar_alertas(df_hoy)
+    with traza.etapa("prediccion") as etapa:
+        # Solo las normas pendientes, y de ellas solo los titulos que no estan en la cache, llegan al modelo
+        df_nuevas = df_hoy.iloc[pendientes]
+        predicciones, probabilidades, resumen_cache = predecir_con_cache(
+            modelo, vectorizer, df_nuevas['titulo'], version_modelo if usar_cache else None,
+            matriz_palabras[pendientes])
+        etapa.contar("elementos", len(pendientes))
+        etapa.contar("aciertos_cache", resumen_cache['aciertos'])
+    num_alertas = int(predicciones.sum())
+    print(f"  [OK] Cache de predicciones: {resumen_cache['aciertos']}/{resumen_cache['consultas']} aciertos "
+          f"({resumen_cache['tasa_aciertos']:.0%}), {resumen_cache['puntuadas']} titulos enviados al modelo.")
+    print(f"  [OK] Prediccion completada. Se han detectado {num_alertas} posibles alertas nuevas.")
+
+    avisar(5)
+    print("\n[Paso 5/5] Guardando predicciones y actualizando las alertas acumuladas...")
+    with traza.etapa("alertas") as etapa:
+        # Las predicciones se guardan junto con la nueva version de las alertas publicadas,
+        # que es lo que la API y el dashboard vigilan para refrescarse
+        guardar_predicciones([ids[p] for p in pendientes], predicciones, probabilidades, version_modelo,
+                             publicar_fecha=fecha, ruta=ruta_bd)
+        print(f"  [OK] {len(pendientes)} predicciones guardadas en '{ruta_bd}'.")
+        if not usar_muestra:
+            exportar_alertas()
+        etapa.contar("elementos", num_alertas)
     print("\n--- ¡Pipeline de Prediccion completado con exito! ---")
+    return {"estado": "completado",
+            "mensaje": f"{len(df_hoy)} normas procesadas ({len(pendientes)} nuevas), {num_alertas} alertas nuevas.",
+            "normas": len(df_hoy), "nuevas": len(pendientes), "alertas": num_alertas, "cache": resumen_cache,
+            "version_modelo": version_modelo}
+
+
+def exportar_alertas():
+    """alertas.json se sigue generando, con todas las alertas acumuladas, para quien lo consuma directamente."""
+    _, alertas = leer_alertas()
+    generar_alertas(alertas)
+
+# --- Relleno de un periodo (backfill) ---
+# Productor-consumidor: un pool de hilos descarga y parsea los dias siguientes mientras el
+# hilo principal clasifica y puntua los anteriores en lotes grandes que mezclan varios dias,
+# con el modelo cargado una sola vez.
+
+WORKERS_BACKFILL = 4
+# Normas que se acumulan antes de enviarlas juntas al modelo
+TAMANO_LOTE_BACKFILL = 20000
+# Dias descargados por delante del que se esta puntuando (acota la memoria)
+DIAS_EN_VUELO_POR_WORKER = 4
+
+
+def _descargar_y_procesar_dia(fecha):
+    """Trabajo de los hilos productores: (fecha, estado, normas, segundos de descarga y de parseo)."""
+    inicio = time.perf_counter()
+    archivo_json, estado = descargar_boe_api(fecha)
+    descarga = time.perf_counter() - inicio
+    normas = procesar_sumario_json(archivo_json) if estado in ("DOWNLOADED", "EXISTED") else None
+    return fecha, estado, normas, descarga, time.perf_counter() - inicio - descarga
+
+
+def ejecutar_backfill(desde, hasta, workers=WORKERS_BACKFILL, tamano_lote=TAMANO_LOTE_BACKFILL, usar_cache=True,
+                      trazar=True):
+    """
+    Descarga, puntua y guarda todos los dias entre `desde` y `hasta` (incluidos). Las normas
+    de cada dia se guardan por fecha y, como en el pipeline diario, solo se puntuan las que no
+    tienen prediccion del modelo actual. Al final se publican las alertas una sola vez.
+    Con `trazar`, la ejecucion se añade al registro de ejecuciones (ver scripts/instrumentacion.py).
+    Devuelve un resumen con dias por estado, normas, tiempos por etapa y rendimiento.
+    """
+    with ejecucion("backfill", activa=trazar) as traza:
+        resumen = _backfill(traza, desde, hasta, workers, tamano_lote, usar_cache)
+        traza.finalizar(resumen)
+    return resumen
+
+
+def _backfill(traza, desde, hasta, workers, tamano_lote, usar_cache):
+    print(f"--- Backfill de predicciones: de {desde} a {hasta} ({workers} hilos de descarga) ---")
+    version_modelo = version_artefactos()
+    if version_modelo is None:
+        print(f"  [ERROR] Modelo no encontrado. Ejecuta 'entrenar_modelo.py' primero.")
+        return {"estado": "error", "mensaje": "Modelo no encontrado. Ejecuta 'entrenar_modelo.py' primero."}
+    inicio_total = time.perf_counter()
+    with traza.etapa("carga_modelo"):
+        # Para puntuar decenas de miles de normas el predict compilado de los pickles es mas rapido
+        # que recorrer los artefactos compactos; aqui la carga se paga una sola vez
+        modelo, vectorizer = cargar_artefactos(version_modelo, compacto=False)
+    resumen = {"dias": {}, "normas": 0, "puntuadas": 0, "alertas": 0, "version_modelo": version_modelo}
+    lote = []
+
+    def procesar_lote():
+        """Guarda las normas del lote dia a dia y puntua juntas todas las pendientes."""
+        if not lote:
+            return
+        with traza.etapa("clasificacion") as etapa:
+            df = pd.concat(lote, ignore_index=True)
+            lote.clear()
+            matriz_palabras = matriz_palabras_clave(df['titulo'])
+            df['sector'] = sector_desde_matriz(matriz_palabras, df['titulo'])
+            etapa.contar("elementos", len(df))
+
+        with traza.etapa("escritura") as etapa:
+            # Una sola transaccion para todo el lote; cada dia del lote trae su sumario completo
+            # y sustituye a lo que hubiera de ese dia
+            ids = guardar_normas(df, borrar_ausentes=True)
+            ya_puntuadas = ids_con_prediccion(ids, version_modelo) if usar_cache else set()
+            pendientes = [posicion for posicion, i in enumerate(ids) if i not in ya_puntuadas]
+            etapa.contar("elementos", len(ids))
+        if not pendientes:
+            return
+
+        with traza.etapa("prediccion") as etapa:
+            predicciones, probabilidades, _ = predecir_con_cache(
+                modelo, vectorizer, df['titulo'].iloc[pendientes], version_modelo if usar_cache else None,
+                matriz_palabras[pendientes])
+            etapa.contar("elementos", len(pendientes))
+
+        with traza.etapa("escritura"):
+            guardar_predicciones(np.asarray(ids)[pendientes], predicciones, probabilidades, version_modelo)
+        resumen["puntuadas"] += len(pendientes)
+        resumen["alertas"] += int(predicciones.sum())
+
+    fechas = [desde + timedelta(days=i) for i in range(max((hasta - desde).days + 1, 0))]
+    en_vuelo = deque()
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as executor:
+        siguientes = iter(fechas)
+        for fecha in siguientes:
+            en_vuelo.append(executor.submit(_descargar_y_procesar_dia, fecha))
+            if len(en_vuelo) >= workers * DIAS_EN_VUELO_POR_WORKER:
+                break
+        # Se consumen en orden de fecha; cada dia consumido deja sitio para descargar otro
+        while en_vuelo:
+            with traza.etapa("espera_descargas"):
+                fecha, estado, normas, t_descarga, t_procesado = en_vuelo.popleft().result()
+            traza.anotar("descarga", t_descarga)
+            traza.anotar("procesado", t_procesado, elementos=len(normas or ()))
+            siguiente = next(siguientes, None)
+            if siguiente is not None:
+                en_vuelo.append(executor.submit(_descargar_y_procesar_dia, siguiente))
+
+            if estado in ("DOWNLOADED", "EXISTED") and not normas:
+                estado = "SIN_NORMAS"
+            resumen["dias"][estado] = resumen["dias"].get(estado, 0) + 1
+            if not normas:
+                continue
+            df_dia = pd.DataFrame(normas)
+            df_dia['fecha_publicacion'] = fecha.isoformat()
+            lote.append(df_dia)
+            resumen["normas"] += len(df_dia)
+            if sum(len(d) for d in lote) >= tamano_lote:
+                procesar_lote()
+        procesar_lote()
+
+    if resumen["puntuadas"]:
+        with traza.etapa("alertas"):
+            publicar_alertas(hasta.isoformat())
+            exportar_alertas()
+    segundos = time.perf_counter() - inicio_total
+    resumen.update(estado="completado", segundos=round(segundos, 2),
+                   tiempos={etapa: round(t, 2) for etapa, t in traza.segundos_por_etapa().items()},
+                   dias_por_minuto=round(len(fechas) / segundos * 60, 1),
+                   normas_por_segundo=round(resumen["normas"] / segundos, 1))
+    resumen["mensaje"] = (f"{len(fechas)} dias, {resumen['normas']} normas ({resumen['puntuadas']} puntuadas), "
+                          f"{resumen['alertas']} alertas nuevas.")
+
+    print(f"\n--- Backfill completado en {segundos:.1f}s: {resumen['mensaje']} ---")
+    print(f"  - Dias por estado: {resumen['dias']}")
+    print(f"  - Rendimiento: {resumen['dias_por_minuto']} dias/min, {resumen['normas_por_segundo']} normas/s")
+    # descarga y procesado suman el tiempo de todos los hilos; el resto es del hilo principal
+    for etapa, t in resumen["tiempos"].items():
+        print(f"  - {etapa:<17} {t:8.2f}s")
+    return resumen
 
 if __name__ == "__main__":
-    if '--muestra' in sys.argv:
-        ejecutar_pipeline_predictivo(usar_muestra=True)
+    parser = argparse.ArgumentParser(description="Pipeline de prediccion de impacto sobre el sumario del BOE.")
+    parser.add_argument("--muestra", action="store_true",
+                        help=f"Usa el archivo de laboratorio data/sample_boe.json, en la base de datos '{BD_MUESTRA}'.")
+    parser.add_argument("--sin-cache", action="store_true", help="Vuelve a puntuar todas las normas, sin usar la cache.")
+    parser.add_argument("--desde", type=date.fromisoformat, help="Primer dia de un backfill (AAAA-MM-DD).")
+    parser.add_argument("--hasta", type=date.fromisoformat, help="Ultimo dia del backfill (por defecto, hoy).")
+    parser.add_argument("--workers", type=int, default=WORKERS_BACKFILL, help="Descargas simultaneas del backfill.")
+    parser.add_argument("--sin-traza", action="store_true",
+                        help="No añade la ejecucion al registro de trazas (ver scripts/instrumentacion.py).")
+    args = parser.parse_args()
+    if args.desde:
+        ejecutar_backfill(args.desde, args.hasta or date.today(), workers=args.workers, usar_cache=not args.sin_cache,
+                          trazar=not args.sin_traza)
     else:
-        ejecutar_pipeline_predictivo(usar_muestra=False)
+        ejecutar_pipeline_predictivo(usar_muestra=args.muestra, usar_cache=not args.sin_cache,
+                                     trazar=not args.sin_traza)
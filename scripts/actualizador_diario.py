@@ -2,6 +2,10 @@ import requests
 from datetime import date
 import os
 import logging
+try:
+    from cliente_http import get, guardar_respuesta, necesita_revalidacion
+except ImportError:  # importado como paquete desde la raiz del proyecto
+    from scripts.cliente_http import get, guardar_respuesta, necesita_revalidacion
 
 log = logging.getLogger(__name__)
 log.setLevel(logging.INFO)
@@ -13,36 +17,48 @@ if not log.handlers:
     log.addHandler(handler)
     log.addHandler(logging.StreamHandler())
 
-def descargar_boe(dia=None):
+# --- Constante para la URL del sumario XML (se puede redirigir a un servidor local en pruebas) ---
+BOE_XML_URL = "https://www.boe.es/diario_boe/xml.php?id=BOE-S-{fecha}"
+
+def descargar_boe(dia=None, limitador=None):
+    """
+    Descarga el sumario XML del BOE de `dia` (ISO, por defecto hoy) en data/raw_boe.
+    `limitador` (p. ej. un LimitadorTasa) se respeta en cada peticion, reintentos incluidos.
+    Devuelve (archivo, estado).
+    """
     dia_obj = date.fromisoformat(dia) if dia else date.today()
     dia_str_archivo = dia_obj.strftime("%Y-%m-%d")
     dia_str_url = dia_obj.strftime("%Y%m%d")
 
-    url = f"https://www.boe.es/diario_boe/xml.php?id=BOE-S-{dia_str_url}"
+    url = BOE_XML_URL.format(fecha=dia_str_url)
     carpeta = "data/raw_boe"
     archivo = os.path.join(carpeta, f"boe_{dia_str_archivo}.xml")
 
-    if os.path.exists(archivo):
+    # Los sumarios recientes pueden estar incompletos: en vez de darlos por finales, los revalidamos
+    revalidar = os.path.exists(archivo) and necesita_revalidacion(dia_obj)
+    if os.path.exists(archivo) and not revalidar:
         log.info(f"Archivo '{archivo}' ya existe. No se necesita descarga.")
         return archivo, "EXISTED"
 
     log.info(f"Intentando descargar BOE del {dia_str_archivo}...")
     try:
-        r = requests.get(url, timeout=20)
+        r = get(url, timeout=20, archivo_cache=archivo if revalidar else None, limitador=limitador)
+        if r.status_code == 304:
+            log.info(f"BOE del {dia_str_archivo} sin cambios en el servidor (304).")
+            return archivo, "EXISTED"
         r.raise_for_status()
 
-        os.makedirs(carpeta, exist_ok=True)
-        with open(archivo, "wb") as f:
-            f.write(r.content)
+        guardar_respuesta(archivo, r.content, r)
         
         log.info(f"[OK] BOE del {dia_str_archivo} descargado en {archivo}") # Emoji eliminado
         return archivo, "DOWNLOADED"
     
     except requests.exceptions.HTTPError as e:
         if e.response.status_code == 404:
+            # Dia sin BOE (p. ej. domingo): estado propio para no confundirlo con un fallo
             log.warning(f"No se encontro BOE para la fecha {dia_str_archivo}.")
-        else:
-            log.error(f"[ERROR] HTTP {e.response.status_code} al descargar BOE.")
+            return None, "NOT_FOUND"
+        log.error(f"[ERROR] HTTP {e.response.status_code} al descargar BOE.")
         return None, "HTTP_ERROR"
     except requests.exceptions.RequestException as e:
         log.error(f"[ERROR] de red al descargar BOE: {e}")
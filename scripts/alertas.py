@@ -1,6 +1,8 @@
 import pandas as pd
 import os
 
+ALERTAS_PATH = "data/alertas.json"
+
 def generar_alertas(df):
     """
     Filtra las normas predichas como de alto impacto y las guarda en un archivo JSON.
@@ -14,13 +16,16 @@ def generar_alertas(df):
 
     alertas = df[df["impacto_predicho"] == 1]
     
-    output_path = "data/alertas.json"
+    output_path = ALERTAS_PATH
     
     # Asegurarse de que el directorio 'data' existe
     os.makedirs(os.path.dirname(output_path), exist_ok=True)
     
     # Guardamos las alertas. Usamos 'force_ascii=False' para una correcta visualización de acentos.
-    alertas.to_json(output_path, orient="records", indent=4, force_ascii=False)
+    # Se escribe aparte y se renombra, para que la API nunca lea un archivo a medio escribir.
+    tmp_path = output_path + ".tmp"
+    alertas.to_json(tmp_path, orient="records", indent=4, force_ascii=False)
+    os.replace(tmp_path, output_path)
     
     # Reemplazamos el emoji por texto simple.
     print(f"[OK] {len(alertas)} alertas/normas guardadas en {output_path}.")
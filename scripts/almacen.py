@@ -0,0 +1,122 @@
+import os
+import shutil
+import time
+import argparse
+import pandas as pd
+import pyarrow as pa
+import pyarrow.dataset as ds
+
+# --- Almacen columnar del proyecto ---
+# Cada dataset es una carpeta de archivos Parquet particionada por 'fecha_publicacion'
+# (estilo Hive: data/<dataset>/fecha_publicacion=2024-01-31/parte-....parquet).
+# Asi podemos añadir dias sin reescribir nada, leer solo las columnas necesarias
+# y saltarnos las particiones fuera de un rango de fechas.
+
+DATASET_PARA_ETIQUETAR = "data/dataset_para_etiquetar"
+DATASET_ETIQUETADO = "data/dataset_etiquetado"
+COLUMNA_PARTICION = "fecha_publicacion"
+
+_PARTICIONADO = ds.partitioning(pa.schema([(COLUMNA_PARTICION, pa.string())]), flavor="hive")
+
+
+def existe(ruta):
+    """Indica si el dataset existe y contiene al menos un archivo Parquet."""
+    if not os.path.isdir(ruta):
+        return False
+    for _, _, archivos in os.walk(ruta):
+        if any(a.endswith(".parquet") for a in archivos):
+            return True
+    return False
+
+
+def _a_tabla(df):
+    """Convierte el DataFrame a Arrow con tipos estables entre escrituras."""
+    if COLUMNA_PARTICION not in df.columns:
+        df = df.assign(**{COLUMNA_PARTICION: None})
+    df = df.astype({COLUMNA_PARTICION: object})
+    tabla = pa.Table.from_pandas(df, preserve_index=False)
+    # Una columna que en este lote es toda nula sale con tipo 'null'; la fijamos a texto
+    # para que no choque con los archivos ya escritos.
+    esquema = pa.schema([
+        campo.with_type(pa.string()) if pa.types.is_null(campo.type) else campo
+        for campo in tabla.schema
+    ])
+    return tabla.cast(esquema)
+
+
+def _escribir_tabla(tabla, ruta, comportamiento):
+    ds.write_dataset(
+        tabla, ruta, format="parquet", partitioning=_PARTICIONADO,
+        # Prefijo temporal para que las partes se lean en orden de escritura
+        basename_template=f"parte-{time.time_ns()}-{{i}}.parquet",
+        existing_data_behavior=comportamiento,
+    )
+
+
+def escribir(df, ruta, modo="append"):
+    """
+    Escribe un DataFrame en el dataset.
+      - "append": añade las filas como archivos nuevos, sin tocar los existentes.
+      - "overwrite": sustituye el dataset completo (se escribe aparte y se cambia al final).
+      - "reemplazar_particiones": sustituye solo las fechas presentes en `df`.
+    """
+    tabla = _a_tabla(df)
+    if modo == "append":
+        _escribir_tabla(tabla, ruta, "overwrite_or_ignore")
+    elif modo == "reemplazar_particiones":
+        _escribir_tabla(tabla, ruta, "delete_matching")
+    elif modo == "overwrite":
+        tmp, viejo = ruta + ".tmp", ruta + ".old"
+        shutil.rmtree(tmp, ignore_errors=True)
+        _escribir_tabla(tabla, tmp, "overwrite_or_ignore")
+        if os.path.exists(ruta):
+            os.replace(ruta, viejo)
+        os.replace(tmp, ruta)
+        shutil.rmtree(viejo, ignore_errors=True)
+    else:
+        raise ValueError(f"Modo de escritura desconocido: {modo}")
+
+
+def eliminar_particiones(ruta, fechas):
+    """Borra las particiones de las fechas indicadas (si existen)."""
+    for fecha in fechas:
+        shutil.rmtree(os.path.join(ruta, f"{COLUMNA_PARTICION}={fecha}"), ignore_errors=True)
+
+
+def leer(ruta, columnas=None, desde=None, hasta=None):
+    """
+    Lee el dataset como DataFrame.
+    `columnas` limita las columnas leidas del disco; `desde`/`hasta` (fechas o cadenas ISO,
+    ambos inclusive) descartan particiones enteras sin abrirlas.
+    """
+    if not existe(ruta):
+        return pd.DataFrame(columns=columnas or [])
+    dataset = ds.dataset(ruta, format="parquet", partitioning=_PARTICIONADO)
+
+    filtro = None
+    if desde is not None:
+        filtro = ds.field(COLUMNA_PARTICION) >= str(desde)
+    if hasta is not None:
+        condicion = ds.field(COLUMNA_PARTICION) <= str(hasta)
+        filtro = condicion if filtro is None else filtro & condicion
+
+    return dataset.to_table(columns=columnas, filter=filtro).to_pandas()
+
+
+def importar_csv(csv_path, ruta):
+    """Migra uno de los antiguos CSV monoliticos al almacen particionado."""
+    df = pd.read_csv(csv_path, dtype={COLUMNA_PARTICION: str})
+    escribir(df, ruta, modo="overwrite")
+    print(f"[OK] {len(df)} filas de '{csv_path}' importadas en '{ruta}'.")
+    return len(df)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Utilidades del almacen Parquet particionado.")
+    parser.add_argument("--importar", nargs=2, metavar=("CSV", "DATASET"),
+                        help="Importa un CSV antiguo, p. ej.: data/dataset_etiquetado.csv data/dataset_etiquetado")
+    args = parser.parse_args()
+    if args.importar:
+        importar_csv(*args.importar)
+    else:
+        parser.print_help()
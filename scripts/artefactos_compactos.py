@@ -0,0 +1,163 @@
+import os
+import json
+import shutil
+import numpy as np
+from scipy import sparse
+from sklearn.feature_extraction.text import TfidfVectorizer
+
+# --- Artefactos compactos del modelo ---
+# El RandomForest y el vectorizador TF-IDF guardados como arrays .npy planos (nodos de
+# todos los arboles concatenados, pesos IDF y vocabulario) mas un meta.json. Se cargan
+# con np.load(mmap_mode='r'): abrir el modelo no deserializa nada y varios procesos
+# (workers de la API, pipeline) comparten las mismas paginas de solo lectura del disco.
+# Cada version del registro de modelos guarda los suyos en su propia carpeta 'compacto'.
+
+# Celdas (filas x columnas) de la tanda densa que se recorre junta por los arboles (~16 MB)
+VALORES_POR_TANDA = 4 * 1024 * 1024
+_ARRAYS = ("izquierda", "derecha", "variable", "umbral", "valor", "raices", "terminos", "idf")
+
+
+def disponible(ruta):
+    return os.path.exists(os.path.join(ruta, "meta.json"))
+
+
+def _arrays_bosque(modelo):
+    """Nodos de todos los arboles en arrays globales; las hojas apuntan a si mismas."""
+    izquierda, derecha, variable, umbral, valor, raices = [], [], [], [], [], []
+    desplazamiento, profundidad = 0, 0
+    for arbol in modelo.estimators_:
+        t = arbol.tree_
+        hoja = t.children_left == -1
+        nodos = np.arange(t.node_count) + desplazamiento
+        izquierda.append(np.where(hoja, nodos, t.children_left + desplazamiento))
+        derecha.append(np.where(hoja, nodos, t.children_right + desplazamiento))
+        variable.append(np.where(hoja, 0, t.feature))
+        umbral.append(np.where(hoja, np.inf, t.threshold))
+        # Igual que DecisionTreeClassifier.predict_proba: cada hoja normalizada a probabilidades
+        v = t.value[:, 0, :].astype(np.float64)
+        suma = v.sum(axis=1, keepdims=True)
+        suma[suma == 0] = 1
+        valor.append(v / suma)
+        raices.append(desplazamiento)
+        desplazamiento += t.node_count
+        profundidad = max(profundidad, t.max_depth)
+    return {
+        "izquierda": np.concatenate(izquierda).astype(np.int32),
+        "derecha": np.concatenate(derecha).astype(np.int32),
+        "variable": np.concatenate(variable).astype(np.int32),
+        "umbral": np.concatenate(umbral).astype(np.float64),
+        "valor": np.concatenate(valor),
+        "raices": np.asarray(raices, dtype=np.int32),
+    }, profundidad
+
+
+def _parametros_vectorizer(vectorizer):
+    parametros = vectorizer.get_params()
+    for nombre in ("tokenizer", "preprocessor"):
+        if parametros.get(nombre) is not None:
+            raise ValueError(f"El vectorizador usa un '{nombre}' propio y no se puede exportar.")
+    if callable(parametros.get("analyzer")):
+        raise ValueError("El vectorizador usa un 'analyzer' propio y no se puede exportar.")
+    parametros["dtype"] = np.dtype(parametros["dtype"]).name
+    parametros["ngram_range"] = list(parametros["ngram_range"])
+    parametros["vocabulary"] = None
+    return parametros
+
+
+def exportar(modelo, vectorizer, ruta):
+    """
+    Escribe los artefactos compactos en la carpeta `ruta`, que no debe existir aun.
+    Se escriben en una carpeta temporal y se renombra al final: un lector nunca ve una a medias.
+    """
+    if not all(hasattr(arbol, "tree_") for arbol in getattr(modelo, "estimators_", [None])):
+        raise ValueError(f"Solo se exportan bosques de arboles, no {type(modelo).__name__}.")
+    arrays, profundidad = _arrays_bosque(modelo)
+    terminos = sorted(vectorizer.vocabulary_, key=vectorizer.vocabulary_.get)
+    arrays["terminos"] = np.asarray(terminos, dtype=str)
+    arrays["idf"] = np.asarray(vectorizer.idf_, dtype=np.float64)
+    meta = {
+        "clases": np.asarray(modelo.classes_).tolist(),
+        "n_features_in": int(modelo.n_features_in_),
+        "n_arboles": len(modelo.estimators_),
+        "profundidad_maxima": int(profundidad),
+        "vectorizer": _parametros_vectorizer(vectorizer),
+    }
+
+    tmp = ruta + f".tmp{os.getpid()}"
+    shutil.rmtree(tmp, ignore_errors=True)
+    os.makedirs(tmp)
+    for nombre, array in arrays.items():
+        np.save(os.path.join(tmp, f"{nombre}.npy"), array)
+    with open(os.path.join(tmp, "meta.json"), "w", encoding="utf-8") as f:
+        json.dump(meta, f, indent=2, ensure_ascii=False)
+    os.replace(tmp, ruta)
+    return ruta
+
+
+class BosqueCompacto:
+    """
+    RandomForest de solo lectura sobre los arrays compactos. Expone lo que usa el proyecto
+    (classes_, n_features_in_, predict_proba, predict) y da las mismas probabilidades que el
+    modelo original: mismas comparaciones (X en float32 frente a umbrales en float64) y la
+    misma media de las hojas de cada arbol.
+    """
+    def __init__(self, arrays, meta):
+        # Vistas ndarray del mismo buffer mapeado: np.memmap anade sobrecarga a cada indexado
+        self.izquierda = np.asarray(arrays["izquierda"])
+        self.derecha = np.asarray(arrays["derecha"])
+        self.variable = np.asarray(arrays["variable"])
+        self.umbral = np.asarray(arrays["umbral"])
+        self.valor = np.asarray(arrays["valor"])
+        self.raices = np.asarray(arrays["raices"])
+        self.classes_ = np.asarray(meta["clases"])
+        self.n_features_in_ = meta["n_features_in"]
+        self.profundidad_maxima = meta["profundidad_maxima"]
+
+    def _hojas(self, X):
+        """Hoja a la que llega cada fila en cada arbol, como array (n_arboles, n_filas)."""
+        n_filas, n_cols = X.shape
+        # Tanda densa y aplanada: X[fila, columna] es un solo acceso a fila * n_cols + columna
+        x_plano = np.asarray(X.toarray() if sparse.issparse(X) else X, dtype=np.float32).ravel()
+        base = np.tile(np.arange(n_filas, dtype=np.int64) * n_cols, len(self.raices))
+        nodos = np.repeat(self.raices, n_filas).astype(np.int64)
+
+        # Solo se siguen moviendo las parejas (arbol, fila) que aun no han llegado a una hoja
+        activas = np.flatnonzero(self.izquierda[nodos] != nodos)
+        while activas.size:
+            actuales = nodos[activas]
+            x = x_plano[base[activas] + self.variable[actuales]]
+            siguientes = np.where(x <= self.umbral[actuales], self.izquierda[actuales], self.derecha[actuales])
+            nodos[activas] = siguientes
+            activas = activas[self.izquierda[siguientes] != siguientes]
+        return nodos.reshape(len(self.raices), n_filas)
+
+    def predict_proba(self, X):
+        n_filas = X.shape[0]
+        probas = np.zeros((n_filas, len(self.classes_)))
+        por_tanda = max(1, VALORES_POR_TANDA // max(X.shape[1], 1))
+        for inicio in range(0, n_filas, por_tanda):
+            hojas = self._hojas(X[inicio:inicio + por_tanda])
+            tanda = probas[inicio:inicio + por_tanda]
+            # Se suman arbol a arbol, en el mismo orden que RandomForestClassifier
+            for hojas_arbol in hojas:
+                tanda += self.valor[hojas_arbol]
+        probas /= len(self.raices)
+        return probas
+
+    def predict(self, X):
+        return self.classes_[self.predict_proba(X).argmax(axis=1)]
+
+
+def cargar(ruta):
+    """(BosqueCompacto, TfidfVectorizer) de la carpeta `ruta`, con los arrays mapeados en memoria."""
+    with open(os.path.join(ruta, "meta.json"), "r", encoding="utf-8") as f:
+        meta = json.load(f)
+    arrays = {nombre: np.load(os.path.join(ruta, f"{nombre}.npy"), mmap_mode="r") for nombre in _ARRAYS}
+
+    parametros = dict(meta["vectorizer"])
+    parametros["dtype"] = np.dtype(parametros["dtype"]).type
+    parametros["ngram_range"] = tuple(parametros["ngram_range"])
+    vectorizer = TfidfVectorizer(**parametros)
+    vectorizer.vocabulary_ = {termino: i for i, termino in enumerate(arrays["terminos"].tolist())}
+    vectorizer.idf_ = arrays["idf"]
+    return BosqueCompacto(arrays, meta), vectorizer
@@ -0,0 +1,507 @@
+import os
+import re
+import time
+import hashlib
+import sqlite3
+import argparse
+import threading
+from contextlib import contextmanager
+from datetime import datetime
+import pandas as pd
+
+# --- Base de datos del proyecto ---
+# SQLite embebido en modo WAL como registro central: normas, etiquetas, predicciones y
+# descargas. En WAL los lectores (API, dashboard) consultan con indices mientras el
+# pipeline escribe, sin esperarse ni ver escrituras a medias.
+# La tabla 'normas_fts' es el indice de texto completo del buscador, mantenido por triggers.
+# El almacen Parquet (almacen.py) sigue siendo el archivo columnar de los historicos.
+
+BD_PATH = "data/boe.sqlite"
+# Base de datos del modo muestra del pipeline: las normas de laboratorio nunca se mezclan con las
+# reales. La API (?bd=muestra) y el dashboard la consultan cuando se trabaja en ese modo.
+BD_MUESTRA = "data/boe_muestra.sqlite"
+CAMPOS_NORMA = ["titulo", "departamento", "fecha_publicacion", "tipo_norma", "sector", "url_pdf"]
+# Origen de una etiqueta: las automaticas nunca pisan a las demas
+ORIGEN_AUTO = "auto"
+ORIGEN_MANUAL = "manual"
+ORIGEN_IMPORTADO = "importado"
+# Identificador del BOE dentro de la URL del PDF (/boe/dias/AAAA/MM/DD/pdfs/BOE-A-AAAA-N.pdf)
+PATRON_IDENTIFICADOR = re.compile(r"BOE-[A-Z]-\d{4}-\d+")
+# Version de la regla de clave_norma; al abrir una base de datos anterior se migran sus claves
+VERSION_CLAVES = "2"
+
+_ESQUEMA = """
+CREATE TABLE IF NOT EXISTS normas (
+    id INTEGER PRIMARY KEY,
+    clave TEXT NOT NULL UNIQUE,
+    titulo TEXT,
+    departamento TEXT COLLATE NOCASE,
+    fecha_publicacion TEXT,
+    tipo_norma TEXT,
+    sector TEXT COLLATE NOCASE,
+    url_pdf TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_normas_fecha ON normas(fecha_publicacion);
+CREATE INDEX IF NOT EXISTS idx_normas_departamento ON normas(departamento);
+CREATE INDEX IF NOT EXISTS idx_normas_sector ON normas(sector);
+
+CREATE TABLE IF NOT EXISTS etiquetas (
+    norma_id INTEGER PRIMARY KEY REFERENCES normas(id) ON DELETE CASCADE,
+    impacto INTEGER NOT NULL,
+    origen TEXT NOT NULL,
+    actualizado TEXT NOT NULL
+);
+
+-- Registro de cambios de etiquetas, que solo crece: el entrenamiento incremental
+-- consume las entradas posteriores a su ultimo punto de control
+CREATE TABLE IF NOT EXISTS cambios_etiquetas (
+    secuencia INTEGER PRIMARY KEY AUTOINCREMENT,
+    norma_id INTEGER NOT NULL REFERENCES normas(id) ON DELETE CASCADE
+);
+CREATE INDEX IF NOT EXISTS idx_cambios_etiquetas_norma ON cambios_etiquetas(norma_id);
+CREATE TRIGGER IF NOT EXISTS etiquetas_ai AFTER INSERT ON etiquetas BEGIN
+    INSERT INTO cambios_etiquetas(norma_id) VALUES (new.norma_id);
+END;
+CREATE TRIGGER IF NOT EXISTS etiquetas_au AFTER UPDATE OF impacto ON etiquetas
+WHEN old.impacto IS NOT new.impacto BEGIN
+    INSERT INTO cambios_etiquetas(norma_id) VALUES (new.norma_id);
+END;
+
+CREATE TABLE IF NOT EXISTS predicciones (
+    norma_id INTEGER PRIMARY KEY REFERENCES normas(id) ON DELETE CASCADE,
+    impacto_predicho INTEGER NOT NULL,
+    probabilidad REAL,
+    version_modelo TEXT,
+    actualizado TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_predicciones_impacto ON predicciones(impacto_predicho);
+
+CREATE TABLE IF NOT EXISTS descargas (
+    fecha TEXT NOT NULL,
+    fuente TEXT NOT NULL,
+    archivo TEXT,
+    estado TEXT NOT NULL,
+    actualizado TEXT NOT NULL,
+    PRIMARY KEY (fecha, fuente)
+);
+
+CREATE TABLE IF NOT EXISTS metadatos (
+    clave TEXT PRIMARY KEY,
+    valor TEXT
+);
+
+CREATE VIRTUAL TABLE IF NOT EXISTS normas_fts USING fts5(
+    titulo, departamento, content='normas', content_rowid='id',
+    tokenize='unicode61 remove_diacritics 2'
+);
+CREATE TRIGGER IF NOT EXISTS normas_ai AFTER INSERT ON normas BEGIN
+    INSERT INTO normas_fts(rowid, titulo, departamento) VALUES (new.id, new.titulo, new.departamento);
+END;
+CREATE TRIGGER IF NOT EXISTS normas_ad AFTER DELETE ON normas BEGIN
+    INSERT INTO normas_fts(normas_fts, rowid, titulo, departamento)
+    VALUES ('delete', old.id, old.titulo, old.departamento);
+END;
+CREATE TRIGGER IF NOT EXISTS normas_au AFTER UPDATE OF titulo, departamento ON normas BEGIN
+    INSERT INTO normas_fts(normas_fts, rowid, titulo, departamento)
+    VALUES ('delete', old.id, old.titulo, old.departamento);
+    INSERT INTO normas_fts(rowid, titulo, departamento) VALUES (new.id, new.titulo, new.departamento);
+END;
+-- La prediccion depende del titulo: si se corrige, hay que volver a puntuar la norma
+CREATE TRIGGER IF NOT EXISTS normas_au_prediccion AFTER UPDATE OF titulo ON normas
+WHEN old.titulo IS NOT new.titulo BEGIN
+    DELETE FROM predicciones WHERE norma_id = new.id;
+END;
+"""
+
+_local = threading.local()
+
+
+def conexion(ruta=BD_PATH):
+    """
+    Conexion del hilo actual con la base de datos (una por hilo, proceso y ruta).
+    La primera vez crea el archivo y el esquema si no existen.
+    """
+    conexiones = _local.__dict__.setdefault("conexiones", {})
+    clave = (os.getpid(), ruta)
+    if clave not in conexiones:
+        os.makedirs(os.path.dirname(ruta) or ".", exist_ok=True)
+        nueva = sqlite3.connect(ruta, timeout=30)
+        nueva.execute("PRAGMA journal_mode=WAL")
+        nueva.execute("PRAGMA synchronous=NORMAL")
+        nueva.execute("PRAGMA foreign_keys=ON")
+        nueva.executescript(_ESQUEMA)
+        fila = nueva.execute("SELECT valor FROM metadatos WHERE clave = 'version_claves'").fetchone()
+        if fila is None or fila[0] != VERSION_CLAVES:
+            with nueva:
+                _migrar_claves(nueva)
+        conexiones[clave] = nueva
+    return conexiones[clave]
+
+
+@contextmanager
+def transaccion(ruta=BD_PATH):
+    """Confirma todo lo escrito dentro del bloque, o nada si hay una excepcion."""
+    c = conexion(ruta)
+    with c:
+        yield c
+
+
+def _ahora():
+    return datetime.now().isoformat(timespec="seconds")
+
+
+def _sin_nan(df):
+    datos = df.astype(object)
+    return datos.where(datos.notna(), None)
+
+
+def clave_norma(titulo, departamento=None, fecha_publicacion=None, url_pdf=None, identificador=None):
+    """
+    Identificador estable de una norma: el identificador del BOE, que viene en el JSON de la
+    API y en la URL del PDF de los sumarios XML, y si no hay ninguno, un hash de su fecha,
+    URL, titulo y departamento. Asi la misma norma tiene la misma clave venga de donde venga.
+    """
+    if isinstance(identificador, str) and identificador:
+        return identificador
+    encontrado = PATRON_IDENTIFICADOR.search(url_pdf) if isinstance(url_pdf, str) else None
+    if encontrado:
+        return encontrado.group(0)
+    partes = ["" if v is None or v != v else str(v) for v in (fecha_publicacion, url_pdf, titulo, departamento)]
+    return hashlib.sha1("|".join(partes).encode("utf-8")).hexdigest()
+
+
+def claves_normas(df):
+    """clave_norma de cada fila de un DataFrame de normas."""
+    columnas = ["titulo", "departamento", "fecha_publicacion", "url_pdf", "identificador"]
+    datos = _sin_nan(df.reindex(columns=columnas))
+    return [clave_norma(*fila) for fila in datos.itertuples(index=False, name=None)]
+
+
+def _mover_etiqueta(c, origen_id, destino_id):
+    """Pasa la etiqueta no automatica de una norma a otra, sin pisar otra que no sea automatica."""
+    c.execute(
+        "INSERT INTO etiquetas (norma_id, impacto, origen, actualizado)"
+        " SELECT ?, impacto, origen, actualizado FROM etiquetas WHERE norma_id = ? AND origen != ?"
+        " ON CONFLICT(norma_id) DO UPDATE SET impacto = excluded.impacto, origen = excluded.origen,"
+        " actualizado = excluded.actualizado WHERE etiquetas.origen = ?",
+        (destino_id, origen_id, ORIGEN_AUTO, ORIGEN_AUTO),
+    )
+
+
+def _migrar_claves(c):
+    """
+    Recalcula las claves guardadas con una regla anterior de clave_norma (hashes de normas
+    cuya URL lleva el identificador del BOE). Si la clave nueva ya existe, las dos filas son
+    la misma norma: se conserva la existente y recibe la etiqueta manual o importada de la otra.
+    """
+    filas = c.execute(
+        "SELECT id, clave, titulo, departamento, fecha_publicacion, url_pdf FROM normas"
+        " WHERE length(clave) = 40 AND url_pdf LIKE '%BOE-%'").fetchall()
+    for id_, clave, *campos in filas:
+        nueva = clave_norma(*campos)
+        if nueva == clave:
+            continue
+        existente = c.execute("SELECT id FROM normas WHERE clave = ?", (nueva,)).fetchone()
+        if existente is None:
+            c.execute("UPDATE normas SET clave = ? WHERE id = ?", (nueva, id_))
+        else:
+            _mover_etiqueta(c, id_, existente[0])
+            c.execute("DELETE FROM normas WHERE id = ?", (id_,))
+    c.execute("INSERT OR REPLACE INTO metadatos (clave, valor) VALUES ('version_claves', ?)", (VERSION_CLAVES,))
+
+
+def _borrar_ausentes(c, condicion, parametros, claves_lote):
+    """
+    Borra las normas que cumplen `condicion` y no vienen en el lote (tabla lote_claves),
+    con sus etiquetas y predicciones. Las que tienen una etiqueta manual o importada no se
+    borran nunca: si con la regla actual su clave esta en el lote, la etiqueta se devuelve
+    para pasarla a esa norma y, si no, la norma se conserva.
+    Devuelve {clave del lote: id de la norma cuya etiqueta hay que pasarle}.
+    """
+    ausentes = f"SELECT id FROM normas WHERE {condicion} AND clave NOT IN (SELECT clave FROM lote_claves)"
+    a_reasignar = {}
+    for valores in parametros:
+        etiquetadas = c.execute(
+            "SELECT n.id, n.titulo, n.departamento, n.fecha_publicacion, n.url_pdf FROM normas n"
+            f" JOIN etiquetas e ON e.norma_id = n.id WHERE e.origen != ? AND n.id IN ({ausentes})",
+            (ORIGEN_AUTO, *valores)).fetchall()
+        for id_, *campos in etiquetadas:
+            clave = clave_norma(*campos)
+            if clave in claves_lote:
+                a_reasignar[clave] = id_
+        c.execute(
+            f"DELETE FROM normas WHERE id IN ({ausentes}) AND NOT EXISTS"
+            " (SELECT 1 FROM etiquetas e WHERE e.norma_id = normas.id AND e.origen != ?)",
+            (*valores, ORIGEN_AUTO))
+    return a_reasignar
+
+
+def guardar_normas(df, fechas_reemplazadas=(), completo=False, borrar_ausentes=False, ruta=BD_PATH):
+    """
+    Inserta o actualiza las normas de `df` (por su clave) y devuelve sus ids, en el mismo orden.
+    Con `borrar_ausentes=True`, `df` es el sumario completo de sus fechas (y de
+    `fechas_reemplazadas`): las normas que ya habia para esos dias y que no vienen en `df` se
+    borran, junto con sus etiquetas automaticas y sus predicciones. Con `completo=True` se
+    borran todas las que no vengan en `df`. Las etiquetas manuales o importadas nunca se
+    pierden al borrar (ver _borrar_ausentes).
+    """
+    claves = claves_normas(df)
+    datos = _sin_nan(df.reindex(columns=CAMPOS_NORMA))
+    filas = [(clave, *fila) for clave, fila in zip(claves, datos.itertuples(index=False, name=None))]
+
+    with transaccion(ruta) as c:
+        c.execute("CREATE TEMP TABLE IF NOT EXISTS lote_claves (posicion INTEGER PRIMARY KEY, clave TEXT)")
+        c.execute("CREATE INDEX IF NOT EXISTS temp.idx_lote_claves ON lote_claves(clave)")
+        c.execute("DELETE FROM lote_claves")
+        c.executemany("INSERT INTO lote_claves (posicion, clave) VALUES (?, ?)", enumerate(claves))
+
+        a_reasignar = {}
+        if completo:
+            a_reasignar = _borrar_ausentes(c, "1", [()], set(claves))
+        elif borrar_ausentes:
+            fechas = set(fechas_reemplazadas) | {f for f in datos["fecha_publicacion"] if f is not None}
+            a_reasignar = _borrar_ausentes(c, "fecha_publicacion = ?", [(str(f),) for f in sorted(fechas)],
+                                           set(claves))
+
+        columnas = ", ".join(CAMPOS_NORMA)
+        c.executemany(
+            f"INSERT INTO normas (clave, {columnas}) VALUES ({', '.join('?' * (len(CAMPOS_NORMA) + 1))})"
+            f" ON CONFLICT(clave) DO UPDATE SET ({columnas}) = ({', '.join('excluded.' + k for k in CAMPOS_NORMA)})"
+            f" WHERE ({', '.join('normas.' + k for k in CAMPOS_NORMA)}) IS NOT"
+            f" ({', '.join('excluded.' + k for k in CAMPOS_NORMA)})",
+            filas,
+        )
+        ids = [fila[0] for fila in c.execute(
+            "SELECT n.id FROM lote_claves l JOIN normas n ON n.clave = l.clave ORDER BY l.posicion")]
+        if a_reasignar:
+            nuevos = dict(zip(claves, ids))
+            for clave, antiguo in a_reasignar.items():
+                _mover_etiqueta(c, antiguo, nuevos[clave])
+                c.execute("DELETE FROM normas WHERE id = ?", (antiguo,))
+        c.execute("DELETE FROM lote_claves")
+    return ids
+
+
+def ultimos_numeros(prefijo, ruta=BD_PATH):
+    """{año: mayor numero} de las claves guardadas con la forma <prefijo><año>-<numero>."""
+    filas = conexion(ruta).execute(
+        f"SELECT CAST(substr(clave, {len(prefijo) + 1}, 4) AS INTEGER),"
+        f" MAX(CAST(substr(clave, {len(prefijo) + 6}) AS INTEGER)) FROM normas WHERE clave GLOB ? GROUP BY 1",
+        (prefijo + "[0-9][0-9][0-9][0-9]-*",))
+    return dict(filas)
+
+
+def leer_normas(columnas=None, desde=None, hasta=None, sin_etiqueta=False, ruta=BD_PATH):
+    """
+    Normas como DataFrame (siempre con su 'id'). `desde`/`hasta` filtran por fecha de
+    publicacion usando el indice; `sin_etiqueta=True` devuelve solo las que no tienen etiqueta.
+    """
+    columnas = ["id"] + [c for c in (columnas or CAMPOS_NORMA) if c != "id"]
+    condiciones, parametros = [], []
+    if desde is not None:
+        condiciones.append("n.fecha_publicacion >= ?")
+        parametros.append(str(desde))
+    if hasta is not None:
+        condiciones.append("n.fecha_publicacion <= ?")
+        parametros.append(str(hasta))
+    if sin_etiqueta:
+        condiciones.append("NOT EXISTS (SELECT 1 FROM etiquetas e WHERE e.norma_id = n.id)")
+    donde = f" WHERE {' AND '.join(condiciones)}" if condiciones else ""
+    sql = f"SELECT {', '.join('n.' + c for c in columnas)} FROM normas n{donde} ORDER BY n.id"
+    return pd.read_sql_query(sql, conexion(ruta), params=parametros)
+
+
+def guardar_etiquetas(ids, impactos, origen=ORIGEN_AUTO, ruta=BD_PATH):
+    """
+    Guarda la etiqueta de impacto (0/1) de cada norma. Una etiqueta automatica no
+    sustituye a una manual o importada. Devuelve cuantas etiquetas se escribieron.
+    """
+    ahora = _ahora()
+    with transaccion(ruta) as c:
+        # rowcount no cuenta las filas que escriben los triggers (registro de cambios)
+        return c.executemany(
+            "INSERT INTO etiquetas (norma_id, impacto, origen, actualizado) VALUES (?, ?, ?, ?)"
+            " ON CONFLICT(norma_id) DO UPDATE SET impacto = excluded.impacto, origen = excluded.origen,"
+            " actualizado = excluded.actualizado WHERE etiquetas.origen = ? OR excluded.origen != ?",
+            [(int(i), int(impacto), origen, ahora, ORIGEN_AUTO, ORIGEN_AUTO) for i, impacto in zip(ids, impactos)],
+        ).rowcount
+
+
+def leer_etiquetadas(ruta=BD_PATH):
+    """Normas con etiqueta 0 o 1: id, titulo, impacto y origen de la etiqueta."""
+    return pd.read_sql_query(
+        "SELECT n.id, n.titulo, e.impacto, e.origen FROM etiquetas e JOIN normas n ON n.id = e.norma_id"
+        " WHERE e.impacto IN (0, 1) ORDER BY n.id",
+        conexion(ruta),
+    )
+
+
+def leer_etiquetas_nuevas(desde=None, ruta=BD_PATH):
+    """
+    Normas con etiqueta 0 o 1 creada o cambiada despues de la secuencia `desde` del registro
+    de cambios (todas si `desde` es None): id, titulo e impacto. Devuelve (df, secuencia),
+    donde `secuencia` es el punto de control para la siguiente lectura.
+    """
+    c = conexion(ruta)
+    # El limite se fija antes de leer: lo que llegue mientras tanto entra en la siguiente lectura
+    secuencia = c.execute("SELECT COALESCE(MAX(secuencia), 0) FROM cambios_etiquetas").fetchone()[0]
+    if desde is None:
+        df = leer_etiquetadas(ruta)[["id", "titulo", "impacto"]]
+    else:
+        df = pd.read_sql_query(
+            "SELECT n.id, n.titulo, e.impacto FROM etiquetas e JOIN normas n ON n.id = e.norma_id"
+            " WHERE e.impacto IN (0, 1) AND e.norma_id IN"
+            " (SELECT norma_id FROM cambios_etiquetas WHERE secuencia > ? AND secuencia <= ?) ORDER BY n.id",
+            c, params=(int(desde), secuencia),
+        )
+    return df, secuencia
+
+
+def guardar_predicciones(ids, impactos, probabilidades=None, version_modelo=None, publicar_fecha=None, ruta=BD_PATH):
+    """
+    Guarda la prediccion vigente de cada norma. Si se indica `publicar_fecha` (el dia
+    procesado), en la misma transaccion se publica una nueva version de las alertas.
+    """
+    if probabilidades is None:
+        probabilidades = [None] * len(ids)
+    ahora = _ahora()
+    with transaccion(ruta) as c:
+        c.executemany(
+            "INSERT OR REPLACE INTO predicciones (norma_id, impacto_predicho, probabilidad, version_modelo, actualizado)"
+            " VALUES (?, ?, ?, ?, ?)",
+            [(int(i), int(impacto), None if p is None else float(p), version_modelo, ahora)
+             for i, impacto, p in zip(ids, impactos, probabilidades)],
+        )
+        if publicar_fecha is not None:
+            _publicar(c, publicar_fecha)
+
+
+def _publicar(c, fecha):
+    c.executemany(
+        "INSERT OR REPLACE INTO metadatos (clave, valor) VALUES (?, ?)",
+        [("alertas_fecha", str(fecha)), ("alertas_version", str(time.time_ns()))],
+    )
+
+
+def publicar_alertas(fecha, ruta=BD_PATH):
+    """Publica una nueva version de las alertas sin guardar predicciones (p. ej. tras borrar normas)."""
+    with transaccion(ruta) as c:
+        _publicar(c, fecha)
+
+
+def ids_con_prediccion(ids, version_modelo, ruta=BD_PATH):
+    """Subconjunto de `ids` que ya tienen una prediccion vigente de `version_modelo`."""
+    c = conexion(ruta)
+    encontrados = set()
+    ids = [int(i) for i in ids]
+    for inicio in range(0, len(ids), 500):  # por tandas, por el limite de parametros de SQLite
+        tanda = ids[inicio:inicio + 500]
+        encontrados.update(fila[0] for fila in c.execute(
+            f"SELECT norma_id FROM predicciones WHERE version_modelo = ? AND norma_id IN ({', '.join('?' * len(tanda))})",
+            [version_modelo] + tanda))
+    return encontrados
+
+
+def estado_alertas(ruta=BD_PATH):
+    """
+    (version, fecha) de las ultimas alertas publicadas por el pipeline, o (None, None) si
+    aun no hay. La version es el instante de publicacion en nanosegundos (epoch) y la fecha,
+    el ultimo dia procesado.
+    """
+    valores = dict(conexion(ruta).execute(
+        "SELECT clave, valor FROM metadatos WHERE clave IN ('alertas_version', 'alertas_fecha')"))
+    return valores.get("alertas_version"), valores.get("alertas_fecha")
+
+
+def leer_alertas(fecha=None, sector=None, departamento=None, q=None, limit=None, offset=0, orden=(), ruta=BD_PATH):
+    """
+    Normas predichas como de alto impacto, acumuladas de todos los dias (o solo de `fecha`),
+    de la mas reciente a la mas antigua, o por las columnas de `orden` ('columna' o '-columna',
+    con los vacios al final). `sector` y `departamento` deben coincidir (sin distinguir
+    mayusculas) y `q` debe aparecer en el titulo.
+    Devuelve (total antes de paginar, DataFrame).
+    """
+    condiciones, parametros = ["p.impacto_predicho = 1"], []
+    for sql, valor in (("n.fecha_publicacion = ?", fecha), ("n.sector = ?", sector), ("n.departamento = ?", departamento),
+                       ("n.titulo LIKE ? ESCAPE '\\'", None if not q else
+                        "%" + q.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_") + "%")):
+        if valor:
+            condiciones.append(sql)
+            parametros.append(valor)
+    desde = f" FROM normas n JOIN predicciones p ON p.norma_id = n.id WHERE {' AND '.join(condiciones)}"
+    criterios = []
+    for columna in orden:
+        nombre = columna.lstrip("-")
+        if nombre not in CAMPOS_NORMA:
+            raise ValueError(f"No se puede ordenar por '{nombre}'.")
+        criterios.append(f"n.{nombre} IS NULL, n.{nombre} {'DESC' if columna.startswith('-') else 'ASC'}")
+
+    c = conexion(ruta)
+    total = c.execute("SELECT COUNT(*)" + desde, parametros).fetchone()[0]
+    df = pd.read_sql_query(
+        f"SELECT {', '.join('n.' + k for k in CAMPOS_NORMA)}, p.impacto_predicho, p.probabilidad, p.version_modelo"
+        + desde + f" ORDER BY {', '.join(criterios + ['n.fecha_publicacion DESC', 'n.id'])} LIMIT ? OFFSET ?",
+        c, params=parametros + [-1 if limit is None else limit, offset],
+    )
+    return total, df
+
+
+def sectores_alertas(ruta=BD_PATH):
+    """Sectores distintos de las alertas publicadas, en orden alfabetico."""
+    return [fila[0] for fila in conexion(ruta).execute(
+        "SELECT DISTINCT n.sector FROM predicciones p JOIN normas n ON n.id = p.norma_id"
+        " WHERE p.impacto_predicho = 1 AND n.sector IS NOT NULL ORDER BY n.sector")]
+
+
+def registrar_descargas(filas, fuente, ruta=BD_PATH):
+    """Registra el resultado de descargas como (fecha, archivo, estado)."""
+    ahora = _ahora()
+    with transaccion(ruta) as c:
+        c.executemany(
+            "INSERT OR REPLACE INTO descargas (fecha, fuente, archivo, estado, actualizado) VALUES (?, ?, ?, ?, ?)",
+            [(str(fecha), fuente, archivo, estado, ahora) for fecha, archivo, estado in filas],
+        )
+
+
+def estados_descargas(fuente, ruta=BD_PATH):
+    """{fecha: estado} de la ultima descarga registrada de cada dia para una fuente."""
+    return dict(conexion(ruta).execute("SELECT fecha, estado FROM descargas WHERE fuente = ?", (fuente,)))
+
+
+def importar_almacen(ruta=BD_PATH):
+    """
+    Migra a la base de datos el dataset Parquet consolidado y las etiquetas del dataset
+    etiquetado, que se marcan como importadas para que el etiquetado automatico no las pise.
+    """
+    try:
+        from almacen import DATASET_PARA_ETIQUETAR, DATASET_ETIQUETADO, leer
+    except ImportError:  # importado como paquete desde la raiz del proyecto
+        from scripts.almacen import DATASET_PARA_ETIQUETAR, DATASET_ETIQUETADO, leer
+
+    normas = leer(DATASET_PARA_ETIQUETAR)
+    guardar_normas(normas, ruta=ruta)
+    n_etiquetas = 0
+    etiquetado = leer(DATASET_ETIQUETADO)
+    if "impacto" in etiquetado.columns:
+        etiquetado = etiquetado[etiquetado["impacto"].isin([0, 1])]
+        ids = guardar_normas(etiquetado.drop(columns=["impacto"]), borrar_ausentes=False, ruta=ruta)
+        n_etiquetas = guardar_etiquetas(ids, etiquetado["impacto"], origen=ORIGEN_IMPORTADO, ruta=ruta)
+    print(f"[OK] {len(normas)} normas y {n_etiquetas} etiquetas importadas en '{ruta}'.")
+
+
+def resumen(ruta=BD_PATH):
+    """Numero de filas de cada tabla."""
+    c = conexion(ruta)
+    return {tabla: c.execute(f"SELECT COUNT(*) FROM {tabla}").fetchone()[0]
+            for tabla in ("normas", "etiquetas", "predicciones", "descargas")}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Utilidades de la base de datos del proyecto.")
+    parser.add_argument("--importar-almacen", action="store_true",
+                        help="Migra las normas y etiquetas del almacen Parquet a la base de datos.")
+    args = parser.parse_args()
+    if args.importar_almacen:
+        importar_almacen()
+    for tabla, filas in resumen().items():
+        print(f"  - {tabla}: {filas} filas")
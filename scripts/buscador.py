@@ -0,0 +1,125 @@
+import re
+import argparse
+import time
+try:
+    from base_datos import BD_PATH, CAMPOS_NORMA as CAMPOS, conexion, transaccion
+except ImportError:  # importado como paquete desde la raiz del proyecto
+    from scripts.base_datos import BD_PATH, CAMPOS_NORMA as CAMPOS, conexion, transaccion
+
+# --- Busqueda de texto completo ---
+# Consultas sobre el indice invertido (SQLite FTS5) que la base de datos mantiene sobre
+# todas las normas. El tokenizador 'unicode61 remove_diacritics 2' pasa a minusculas y
+# quita tildes tanto al indexar como al buscar, asi "subvencion" encuentra "subvención"
+# igual que el [oó] del clasificador.
+
+COLUMNAS_ORDENABLES = ("fecha_publicacion", "titulo", "departamento", "sector", "tipo_norma")
+# Peso de cada columna del indice en el ranking bm25: el titulo cuenta mucho mas
+PESOS_BM25 = (10.0, 1.0)
+MAX_RESULTADOS = 500
+
+
+def reconstruir_indice(ruta=BD_PATH):
+    """Regenera el indice de texto completo a partir de la tabla de normas."""
+    with transaccion(ruta) as c:
+        c.execute("INSERT INTO normas_fts(normas_fts) VALUES ('rebuild')")
+        n = c.execute("SELECT COUNT(*) FROM normas").fetchone()[0]
+    print(f"[OK] Indice de busqueda reconstruido con {n} normas en '{ruta}'.")
+    return n
+
+
+def consulta_fts(texto):
+    """
+    Traduce el texto del usuario a una consulta FTS5: todas las palabras deben aparecer,
+    y la ultima vale como prefijo (para buscar mientras se escribe). None si no hay palabras.
+    """
+    palabras = re.findall(r"\w+", texto or "")
+    if not palabras:
+        return None
+    return " ".join(f'"{p}"' for p in palabras) + "*"
+
+
+class Buscador:
+    """
+    Consultas al indice desde procesos de larga vida (la API): una conexion por hilo.
+    """
+    def __init__(self, ruta=BD_PATH):
+        self.ruta = ruta
+
+    def buscar(self, texto, limit=20, offset=0, sector=None, desde=None, hasta=None, orden=None):
+        """
+        Devuelve (total, resultados): el numero de normas que cumplen la consulta y la pagina
+        pedida, ordenada por relevancia (bm25 sobre todas las coincidencias) o por `orden`
+        ('columna' o '-columna').
+        """
+        consulta = consulta_fts(texto)
+        if consulta is None:
+            return 0, []
+
+        filtros, parametros_filtros = [], []
+        for sql, valor in (("n.sector = ?", sector), ("n.fecha_publicacion >= ?", desde),
+                           ("n.fecha_publicacion <= ?", hasta)):
+            if valor:
+                filtros.append(sql)
+                parametros_filtros.append(str(valor))
+
+        columnas = ", ".join("n." + c for c in CAMPOS)
+        bm25 = f"bm25(normas_fts, {', '.join(map(str, PESOS_BM25))})"
+        donde = " AND ".join(["normas_fts MATCH ?"] + filtros)
+        parametros = [consulta] + parametros_filtros
+        pagina = [min(limit, MAX_RESULTADOS), offset]
+        # CROSS JOIN fija el orden: primero el indice y luego cada norma por su id. Con un JOIN
+        # normal y un filtro por sector, SQLite puede recorrer el sector y consultar el indice
+        # norma a norma, cientos de veces mas lento
+        con_normas = "normas_fts CROSS JOIN normas n ON n.id = normas_fts.rowid"
+        c = conexion(self.ruta)
+
+        # Sin filtros el total sale del indice sin tocar la tabla de normas
+        if filtros:
+            sql_total = f"SELECT COUNT(*) FROM {con_normas} WHERE {donde}"
+        else:
+            sql_total = "SELECT COUNT(*) FROM normas_fts WHERE normas_fts MATCH ?"
+        total = c.execute(sql_total, parametros).fetchone()[0]
+
+        if orden:
+            columna = orden.lstrip("-")
+            if columna not in COLUMNAS_ORDENABLES:
+                raise ValueError(f"No se puede ordenar por '{columna}'.")
+            cursor = c.execute(
+                f"SELECT {columnas}, {bm25} AS puntuacion"
+                f" FROM {con_normas} WHERE {donde}"
+                f" ORDER BY n.{columna} {'DESC' if orden.startswith('-') else 'ASC'}, puntuacion LIMIT ? OFFSET ?",
+                parametros + pagina,
+            )
+        else:
+            # Se puntuan todas las coincidencias, pero solo se guardan las de la pagina (LIMIT) y solo
+            # de esas se leen las columnas; sin filtros, el ranking se hace solo sobre el indice
+            coincidencias = f"{con_normas} WHERE {donde}" if filtros else "normas_fts WHERE normas_fts MATCH ?"
+            cursor = c.execute(
+                f"SELECT {columnas}, r.puntuacion FROM ("
+                f"  SELECT normas_fts.rowid AS id, {bm25} AS puntuacion FROM {coincidencias}"
+                f"  ORDER BY puntuacion LIMIT ? OFFSET ?"
+                f") r JOIN normas n ON n.id = r.id ORDER BY r.puntuacion",
+                parametros + pagina,
+            )
+        resultados = [dict(zip(CAMPOS + ["puntuacion"], fila)) for fila in cursor]
+        for resultado in resultados:
+            resultado["puntuacion"] = round(-resultado["puntuacion"], 4)  # bm25 es mejor cuanto mas negativo
+        return total, resultados
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Busqueda de texto completo sobre las normas de la base de datos.")
+    parser.add_argument("--reconstruir", action="store_true", help="Regenera el indice desde la tabla de normas.")
+    parser.add_argument("--buscar", metavar="TEXTO", help="Busca en el indice y muestra los mejores resultados.")
+    parser.add_argument("--limit", type=int, default=10)
+    args = parser.parse_args()
+    if args.reconstruir:
+        reconstruir_indice()
+    if args.buscar:
+        inicio = time.perf_counter()
+        total, resultados = Buscador().buscar(args.buscar, limit=args.limit)
+        print(f"--- {total} normas encontradas en {(time.perf_counter() - inicio) * 1000:.1f} ms ---")
+        for r in resultados:
+            print(f"  [{r['fecha_publicacion']}] ({r['puntuacion']:.2f}) {r['titulo']}")
+    if not (args.reconstruir or args.buscar):
+        parser.print_help()
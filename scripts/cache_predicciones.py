@@ -0,0 +1,180 @@
+import os
+import hashlib
+import sqlite3
+import threading
+from collections import OrderedDict
+import numpy as np
+try:
+    from modelo import puntuar
+except ImportError:  # importado como paquete desde la raiz del proyecto
+    from scripts.modelo import puntuar
+
+# --- Cache de predicciones ---
+# Muchos titulos del BOE se repiten casi literalmente de un dia para otro (anuncios,
+# nombramientos...). Guardamos la prediccion de cada titulo normalizado junto con la
+# version del modelo que la hizo: en memoria (LRU) y en un SQLite en disco que
+# sobrevive entre ejecuciones. Un modelo nuevo tiene otra version, asi que sus
+# consultas nunca ven predicciones del anterior.
+
+CACHE_PATH = "data/cache_predicciones.sqlite"
+CAPACIDAD_MEMORIA = 100_000
+# Limite de parametros por consulta de SQLite
+_TAMANO_CONSULTA = 500
+
+
+def normalizar_titulo(titulo):
+    """Minusculas y espacios colapsados: cambios que no alteran las features del modelo."""
+    return " ".join(titulo.lower().split())
+
+
+def clave_titulo(titulo):
+    """Hash del titulo normalizado, o None si no es un texto (esos no se cachean)."""
+    if not isinstance(titulo, str):
+        return None
+    return hashlib.sha1(normalizar_titulo(titulo).encode("utf-8")).hexdigest()
+
+
+class CachePredicciones:
+    """
+    Cache de dos niveles de (impacto_predicho, probabilidad) por (version del modelo, clave).
+    Se puede usar desde varios hilos a la vez.
+    """
+    def __init__(self, ruta=CACHE_PATH, capacidad_memoria=CAPACIDAD_MEMORIA):
+        self.ruta = ruta
+        self.capacidad_memoria = capacidad_memoria
+        self._memoria = OrderedDict()
+        self._lock = threading.Lock()
+        self._conexion = None
+
+    def _conectar(self):
+        if self._conexion is None:
+            os.makedirs(os.path.dirname(self.ruta) or ".", exist_ok=True)
+            self._conexion = sqlite3.connect(self.ruta, check_same_thread=False)
+            self._conexion.execute("PRAGMA journal_mode=WAL")
+            self._conexion.execute(
+                "CREATE TABLE IF NOT EXISTS predicciones ("
+                " version TEXT NOT NULL, clave TEXT NOT NULL,"
+                " impacto INTEGER NOT NULL, probabilidad REAL NOT NULL,"
+                " PRIMARY KEY (version, clave)) WITHOUT ROWID"
+            )
+        return self._conexion
+
+    def _recordar(self, version, clave, valor):
+        self._memoria[(version, clave)] = valor
+        self._memoria.move_to_end((version, clave))
+        if len(self._memoria) > self.capacidad_memoria:
+            self._memoria.popitem(last=False)
+
+    def buscar(self, version, claves):
+        """Devuelve {clave: (impacto, probabilidad)} con las claves que ya estaban cacheadas."""
+        encontrados = {}
+        with self._lock:
+            pendientes = []
+            for clave in claves:
+                valor = self._memoria.get((version, clave))
+                if valor is None:
+                    pendientes.append(clave)
+                else:
+                    self._memoria.move_to_end((version, clave))
+                    encontrados[clave] = valor
+
+            conexion = self._conectar()
+            for i in range(0, len(pendientes), _TAMANO_CONSULTA):
+                bloque = pendientes[i:i + _TAMANO_CONSULTA]
+                filas = conexion.execute(
+                    "SELECT clave, impacto, probabilidad FROM predicciones"
+                    f" WHERE version = ? AND clave IN ({','.join('?' * len(bloque))})",
+                    [version, *bloque],
+                )
+                for clave, impacto, probabilidad in filas:
+                    encontrados[clave] = (impacto, probabilidad)
+                    self._recordar(version, clave, (impacto, probabilidad))
+        return encontrados
+
+    def guardar(self, version, valores):
+        """Guarda {clave: (impacto, probabilidad)} en memoria y en disco."""
+        with self._lock:
+            for clave, valor in valores.items():
+                self._recordar(version, clave, valor)
+            conexion = self._conectar()
+            with conexion:
+                conexion.executemany(
+                    "INSERT OR REPLACE INTO predicciones (version, clave, impacto, probabilidad) VALUES (?, ?, ?, ?)",
+                    [(version, clave, int(i), float(p)) for clave, (i, p) in valores.items()],
+                )
+
+    def purgar(self, conservar_version=None):
+        """Borra las predicciones de todas las versiones salvo `conservar_version`. Devuelve cuantas."""
+        with self._lock:
+            self._memoria = OrderedDict(
+                (k, v) for k, v in self._memoria.items() if k[0] == conservar_version
+            )
+            if not os.path.exists(self.ruta):
+                return 0
+            conexion = self._conectar()
+            with conexion:
+                borradas = conexion.execute(
+                    "DELETE FROM predicciones WHERE version IS NOT ?", (conservar_version,)
+                ).rowcount
+            return borradas
+
+    def cerrar(self):
+        with self._lock:
+            if self._conexion is not None:
+                self._conexion.close()
+                self._conexion = None
+
+
+_cache = None
+_lock_cache = threading.Lock()
+
+
+def obtener_cache():
+    """Cache compartida por todo el proceso (asi el nivel en memoria dura entre ejecuciones)."""
+    global _cache
+    with _lock_cache:
+        if _cache is None:
+            _cache = CachePredicciones()
+        return _cache
+
+
+def predecir_con_cache(modelo, vectorizer, titulos, version, matriz_palabras=None, cache=None):
+    """
+    Predice el impacto de una Serie de titulos enviando al modelo solo los que no estan en
+    la cache (y cada titulo repetido una sola vez). Sin `version` no se usa la cache.
+    Devuelve (impactos, probabilidades, resumen) con las dos primeras alineadas con `titulos`.
+    """
+    if version is not None and cache is None:
+        cache = obtener_cache()
+    claves = [clave_titulo(t) for t in titulos]
+    valores = cache.buscar(version, {c for c in claves if c is not None}) if version is not None else {}
+    aciertos = sum(1 for c in claves if c in valores)
+
+    # Una posicion por cada clave que falta; los titulos no cacheables se puntuan siempre
+    pendientes, vistas = [], set()
+    for posicion, clave in enumerate(claves):
+        if clave is None or (clave not in valores and clave not in vistas):
+            pendientes.append(posicion)
+            vistas.add(clave)
+
+    impactos = np.zeros(len(claves), dtype=np.int64)
+    probabilidades = np.zeros(len(claves))
+    if pendientes:
+        sub_matriz = matriz_palabras[pendientes] if matriz_palabras is not None else None
+        predichos, probas, _ = puntuar(modelo, vectorizer, titulos.iloc[pendientes], sub_matriz)
+        nuevos = {}
+        for posicion, impacto, probabilidad in zip(pendientes, predichos, probas):
+            impactos[posicion], probabilidades[posicion] = impacto, probabilidad
+            if claves[posicion] is not None:
+                nuevos[claves[posicion]] = (int(impacto), float(probabilidad))
+        if version is not None and nuevos:
+            cache.guardar(version, nuevos)
+        valores.update(nuevos)
+
+    for posicion, clave in enumerate(claves):
+        if clave is not None:
+            impactos[posicion], probabilidades[posicion] = valores[clave]
+
+    resumen = {"consultas": len(claves), "aciertos": aciertos, "puntuadas": len(pendientes),
+               "tasa_aciertos": round(aciertos / len(claves), 4) if claves else 0.0}
+    return impactos, probabilidades, resumen
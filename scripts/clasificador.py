@@ -1,4 +1,7 @@
 import re
+import numpy as np
+import pandas as pd
+from scipy import sparse
 
 # Versión mejorada: Las expresiones regulares ahora aceptan vocales con o sin tilde.
 # Por ejemplo, [ií] significa "una 'i' o una 'í'".
@@ -8,6 +11,39 @@ SECTORES_KEYWORDS = {
     "energético": r"\b(energ[ií]a|el[eé]ctrico|renovable|combustible|el[eé]ctrica)\b",
 }
 
+
+def _alternativas(patron):
+    """Separa un patron de la forma \\b(a|b|c)\\b en sus palabras clave; si no, lo deja entero."""
+    forma = re.fullmatch(r"\\b\((?P<alternativas>[^()]*)\)\\b", patron)
+    return forma.group("alternativas").split("|") if forma else [f"(?:{patron})"]
+
+
+def _primeros_caracteres(alternativas):
+    """Letras por las que puede empezar una coincidencia, o None si no se pueden deducir."""
+    letras = set()
+    for alt in alternativas:
+        if alt[:1].isalnum():
+            letras.add(alt[0])
+        elif alt.startswith("[") and "]" in alt:
+            letras.update(alt[1:alt.index("]")])
+        else:
+            return None
+    return "".join(sorted(letras))
+
+
+# --- Patrones por sector ---
+# Compilados una sola vez y en orden de prioridad: gana el primer sector cuyo patron aparece,
+# como en la version original. Un patron combinado con un grupo por sector no sirve para la
+# etiqueta: sus coincidencias no se solapan y una de un sector posterior puede tapar otra de
+# uno anterior (p. ej. con palabras clave de varias palabras).
+_SECTORES = list(SECTORES_KEYWORDS)
+_PATRONES_SECTOR = [re.compile(p) for p in SECTORES_KEYWORDS.values()]
+_ALTERNATIVAS = [_alternativas(p) for p in SECTORES_KEYWORDS.values()]
+_INICIOS = _primeros_caracteres([a for alts in _ALTERNATIVAS for a in alts])
+_ETIQUETAS = np.array(_SECTORES + ["otros", "desconocido"], dtype=object)
+_OTROS, _DESCONOCIDO = len(_SECTORES), len(_SECTORES) + 1
+
+
 def clasificar_sector(texto):
     """
     Clasifica el texto de una norma en un sector predefinido usando palabras clave.
@@ -15,11 +51,135 @@ def clasificar_sector(texto):
     """
     if not texto or not isinstance(texto, str):
         return "desconocido"
-    
+
     texto_lower = texto.lower()
-    
-    for sector, pattern in SECTORES_KEYWORDS.items():
-        if re.search(pattern, texto_lower):
+    for sector, patron in zip(_SECTORES, _PATRONES_SECTOR):
+        if patron.search(texto_lower):
             return sector
-            
     return "otros"
+
+
+def _escanear(textos_lower, patron, columna_de_grupo):
+    """
+    Recorre todos los textos (ya en minusculas) con una sola pasada del motor de expresiones
+    regulares: se unen con saltos de linea y cada coincidencia se asigna a su texto por su
+    posicion. El salto de linea no es un caracter de palabra, asi que los \\b de los extremos
+    se comportan igual que en cada texto por separado.
+    Devuelve dos arrays paralelos: fila (texto) y columna (segun `columna_de_grupo`) de cada coincidencia.
+    """
+    if not textos_lower:
+        vacio = np.empty(0, dtype=np.int64)
+        return vacio, vacio
+    largos = np.fromiter(map(len, textos_lower), dtype=np.int64, count=len(textos_lower)) + 1
+    inicios = np.cumsum(largos) - largos
+
+    coincidencias = np.array(
+        [(m.start(), columna_de_grupo[m.lastindex]) for m in patron.finditer("\n".join(textos_lower))],
+        dtype=np.int64,
+    ).reshape(-1, 2)
+    filas = np.searchsorted(inicios, coincidencias[:, 0], side="right") - 1
+    return filas, coincidencias[:, 1]
+
+
+def _unicos_validos(textos):
+    """Factoriza los textos: codigos por fila, textos distintos validos en minusculas y su mascara."""
+    serie = textos if isinstance(textos, pd.Series) else pd.Series(list(textos), dtype=object)
+    codigos, unicos = pd.factorize(serie)
+    validos = np.array([isinstance(t, str) and bool(t) for t in unicos], dtype=bool)
+    return codigos, [t.lower() for t in np.asarray(unicos, dtype=object)[validos]], validos
+
+
+def _como_entrada(textos, valores):
+    """Devuelve `valores` como Serie con el indice de `textos` si esta lo era, o como lista."""
+    if isinstance(textos, pd.Series):
+        return pd.Series(valores, index=textos.index, name=textos.name)
+    return valores.tolist()
+
+
+def clasificar_sectores(textos):
+    """
+    Version por lotes de clasificar_sector para una Serie de pandas o una lista de textos.
+    Devuelve exactamente las mismas etiquetas ("desconocido" y "otros" incluidos), pero cada
+    titulo distinto se pasa a minusculas y se analiza una sola vez (los del BOE se repiten
+    mucho), y cada sector solo busca en los textos que aun no tienen sector.
+    Si recibe una Serie devuelve una Serie con el mismo indice; si no, una lista.
+    """
+    codigos, textos_lower, validos = _unicos_validos(textos)
+    indices_validos = np.full(len(textos_lower), _OTROS, dtype=np.int64)
+    pendientes = range(len(textos_lower))
+    for i, patron in enumerate(_PATRONES_SECTOR):
+        buscar = patron.search
+        encontrados = [j for j in pendientes if buscar(textos_lower[j])]
+        indices_validos[encontrados] = i
+        pendientes = np.flatnonzero(indices_validos == _OTROS)
+
+    # Los nulos vienen con codigo -1: caen en la ultima posicion, que es "desconocido"
+    indices = np.full(len(validos) + 1, _DESCONOCIDO, dtype=np.int64)
+    indices[:-1][validos] = indices_validos
+    return _como_entrada(textos, _ETIQUETAS[indices[codigos]])
+
+
+# --- Matriz documento x palabra clave ---
+# Un unico patron compilado con un grupo por palabra clave (k0, k1, ...) en el orden de
+# SECTORES_KEYWORDS; el lookahead con las posibles primeras letras evita intentar todas las
+# alternativas en cada posicion del texto. De la matriz de coincidencias se derivan las puntuaciones
+# por sector, los conjuntos multi-etiqueta y la etiqueta principal, y sirve como features del modelo.
+PALABRAS_CLAVE = [(sector, alt) for sector, alts in zip(_SECTORES, _ALTERNATIVAS) for alt in alts]
+_PATRON_PALABRAS = re.compile(
+    r"\b" + (f"(?=[{_INICIOS}])" if _INICIOS else "")
+    + "(?:" + "|".join(f"(?P<k{j}>{alt})" for j, (_, alt) in enumerate(PALABRAS_CLAVE)) + r")\b"
+)
+_PALABRA_DE_GRUPO = {_PATRON_PALABRAS.groupindex[f"k{j}"]: j for j in range(len(PALABRAS_CLAVE))}
+# Matriz (palabras x sectores) que suma las coincidencias de cada palabra en su sector
+_PALABRA_A_SECTOR = sparse.csr_matrix(
+    (np.ones(len(PALABRAS_CLAVE)), (np.arange(len(PALABRAS_CLAVE)), [_SECTORES.index(s) for s, _ in PALABRAS_CLAVE])),
+    shape=(len(PALABRAS_CLAVE), len(_SECTORES)),
+)
+
+
+def nombres_palabras_clave():
+    """Nombre de cada columna de la matriz de palabras clave, como 'sector:patron'."""
+    return [f"{sector}:{alt}" for sector, alt in PALABRAS_CLAVE]
+
+
+def matriz_palabras_clave(textos):
+    """
+    Matriz dispersa (CSR) documento x palabra clave con el numero de apariciones de cada
+    palabra de SECTORES_KEYWORDS en cada texto, calculada en una sola pasada sobre el lote.
+    Los textos nulos o vacios dan filas a cero.
+    """
+    codigos, textos_lower, validos = _unicos_validos(textos)
+    filas, columnas = _escanear(textos_lower, _PATRON_PALABRAS, _PALABRA_DE_GRUPO)
+    # Una fila por texto distinto valido y una ultima fila a cero para nulos y no validos
+    por_unico = sparse.csr_matrix(
+        (np.ones(len(filas)), (filas, columnas)), shape=(len(textos_lower) + 1, len(PALABRAS_CLAVE))
+    )
+    fila_de_unico = np.full(len(validos) + 1, len(textos_lower), dtype=np.int64)
+    fila_de_unico[:-1][validos] = np.arange(len(textos_lower))
+    return por_unico[fila_de_unico[codigos]]
+
+
+def puntuaciones_sectores(matriz):
+    """Numero de coincidencias de cada sector por texto (DataFrame con una columna por sector)."""
+    return pd.DataFrame((matriz @ _PALABRA_A_SECTOR).toarray(), columns=_SECTORES)
+
+
+def sectores_multietiqueta(matriz):
+    """Conjunto de todos los sectores con alguna coincidencia en cada texto."""
+    puntos = (matriz @ _PALABRA_A_SECTOR).tocsr()
+    return [{_SECTORES[j] for j in puntos.indices[puntos.indptr[i]:puntos.indptr[i + 1]]}
+            for i in range(puntos.shape[0])]
+
+
+def sector_desde_matriz(matriz, textos):
+    """
+    Misma etiqueta que clasificar_sectores, pero a partir de una matriz ya calculada:
+    gana el primer sector (en el orden de SECTORES_KEYWORDS) con alguna coincidencia. Solo
+    coinciden mientras las palabras clave no puedan solaparse (son palabras sueltas entre \\b).
+    `textos` solo se usa para marcar como "desconocido" los nulos o vacios, sin volver a escanearlos.
+    """
+    puntos = (matriz @ _PALABRA_A_SECTOR).toarray() > 0
+    indices = np.where(puntos.any(axis=1), puntos.argmax(axis=1), _OTROS)
+    validos = np.array([isinstance(t, str) and bool(t) for t in textos], dtype=bool)
+    indices[~validos] = _DESCONOCIDO
+    return _como_entrada(textos, _ETIQUETAS[indices])
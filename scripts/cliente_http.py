@@ -0,0 +1,151 @@
+import requests
+from requests.adapters import HTTPAdapter
+from datetime import date, datetime, timezone
+from email.utils import format_datetime
+import json
+import logging
+import os
+import random
+import threading
+import time
+try:
+    import instrumentacion
+except ImportError:  # importado como paquete desde la raiz del proyecto
+    from scripts import instrumentacion
+
+# --- Cliente HTTP compartido por todos los descargadores del BOE ---
+# Una unica sesion con pool de conexiones (keep-alive), reintentos con backoff
+# exponencial + jitter y revalidacion condicional (ETag / If-Modified-Since).
+
+log = logging.getLogger(__name__)
+
+TAMANO_POOL = 16
+MAX_REINTENTOS = 4
+BACKOFF_BASE = 0.5    # segundos
+BACKOFF_MAX = 30.0    # segundos
+ESTADOS_REINTENTABLES = {429, 500, 502, 503, 504}
+# Los sumarios de los ultimos dias pueden publicarse por partes: se revalidan en lugar de darlos por finales
+DIAS_REVALIDACION = 2
+USER_AGENT = "boe-predictor/1.0"
+
+_sesion = None
+_lock_sesion = threading.Lock()
+
+
+def obtener_sesion():
+    """Devuelve la sesion compartida, creandola la primera vez de forma segura entre hilos."""
+    global _sesion
+    if _sesion is None:
+        with _lock_sesion:
+            if _sesion is None:
+                sesion = requests.Session()
+                adaptador = HTTPAdapter(pool_connections=4, pool_maxsize=TAMANO_POOL)
+                sesion.mount("https://", adaptador)
+                sesion.mount("http://", adaptador)
+                sesion.headers["User-Agent"] = USER_AGENT
+                _sesion = sesion
+    return _sesion
+
+
+def cerrar_sesion():
+    """Cierra las conexiones abiertas del pool (util al final de procesos largos)."""
+    global _sesion
+    with _lock_sesion:
+        if _sesion is not None:
+            _sesion.close()
+            _sesion = None
+
+
+def necesita_revalidacion(fecha: date):
+    """Indica si un sumario ya descargado es lo bastante reciente como para volver a comprobarlo."""
+    return (date.today() - fecha).days < DIAS_REVALIDACION
+
+
+def _ruta_validadores(archivo):
+    return archivo + ".http.json"
+
+
+def cabeceras_condicionales(archivo):
+    """
+    Construye las cabeceras If-None-Match / If-Modified-Since para un archivo ya descargado.
+    Si no guardamos validadores del servidor, usamos la fecha de modificacion del archivo.
+    """
+    if not os.path.exists(archivo):
+        return {}
+    cabeceras = {}
+    try:
+        with open(_ruta_validadores(archivo), "r", encoding="utf-8") as f:
+            validadores = json.load(f)
+        if validadores.get("etag"):
+            cabeceras["If-None-Match"] = validadores["etag"]
+        if validadores.get("last_modified"):
+            cabeceras["If-Modified-Since"] = validadores["last_modified"]
+    except (IOError, json.JSONDecodeError):
+        pass
+    if not cabeceras:
+        mtime = datetime.fromtimestamp(os.path.getmtime(archivo), tz=timezone.utc)
+        cabeceras["If-Modified-Since"] = format_datetime(mtime, usegmt=True)
+    return cabeceras
+
+
+def guardar_respuesta(archivo, contenido, respuesta=None):
+    """
+    Escribe el contenido de forma atomica (nunca deja un archivo a medias) y guarda
+    junto a el los validadores de la respuesta para las siguientes revalidaciones.
+    """
+    os.makedirs(os.path.dirname(archivo) or ".", exist_ok=True)
+    tmp = archivo + ".tmp"
+    with open(tmp, "wb") as f:
+        f.write(contenido)
+    os.replace(tmp, archivo)
+
+    if respuesta is not None:
+        validadores = {
+            "etag": respuesta.headers.get("ETag"),
+            "last_modified": respuesta.headers.get("Last-Modified"),
+        }
+        if any(validadores.values()):
+            with open(_ruta_validadores(archivo), "w", encoding="utf-8") as f:
+                json.dump(validadores, f)
+
+
+def _espera_backoff(intento, retry_after=None):
+    """Backoff exponencial con 'full jitter'; respeta Retry-After si el servidor lo indica."""
+    if retry_after:
+        try:
+            return min(BACKOFF_MAX, float(retry_after))
+        except ValueError:
+            pass
+    return random.uniform(0, min(BACKOFF_MAX, BACKOFF_BASE * 2 ** intento))
+
+
+def get(url, headers=None, timeout=20, archivo_cache=None, reintentos=MAX_REINTENTOS, limitador=None):
+    """
+    GET a traves de la sesion compartida.
+    Reintenta los errores de red y las respuestas 429/5xx; el resto de codigos se devuelven
+    tal cual para que el llamador decida (p. ej. con raise_for_status()).
+    Si se indica `archivo_cache`, la peticion es condicional y puede devolver 304.
+    Con un `limitador` (cualquier objeto con adquirir(), como LimitadorTasa) cada intento,
+    reintentos incluidos, consume un token antes de salir hacia el servidor.
+    """
+    cabeceras = dict(headers or {})
+    if archivo_cache:
+        cabeceras.update(cabeceras_condicionales(archivo_cache))
+
+    for intento in range(reintentos + 1):
+        if limitador is not None:
+            limitador.adquirir()
+        try:
+            respuesta = obtener_sesion().get(url, headers=cabeceras, timeout=timeout)
+        except (requests.exceptions.ConnectionError, requests.exceptions.Timeout) as e:
+            if intento == reintentos:
+                raise
+            espera = _espera_backoff(intento)
+            log.warning(f"Error de red en {url} ({e}). Reintento {intento + 1}/{reintentos} en {espera:.1f}s")
+        else:
+            instrumentacion.contar("bytes_descargados", len(respuesta.content))
+            if respuesta.status_code not in ESTADOS_REINTENTABLES or intento == reintentos:
+                return respuesta
+            espera = _espera_backoff(intento, respuesta.headers.get("Retry-After"))
+            log.warning(f"HTTP {respuesta.status_code} en {url}. Reintento {intento + 1}/{reintentos} en {espera:.1f}s")
+        time.sleep(espera)
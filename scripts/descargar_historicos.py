@@ -1,44 +1,160 @@
 from datetime import date, timedelta
+from concurrent.futures import ThreadPoolExecutor, as_completed
 # Asegúrate de importar la función desde el archivo correcto en la misma carpeta 'scripts'
 from actualizador_diario import descargar_boe
+from cliente_http import necesita_revalidacion
+from base_datos import BD_PATH, registrar_descargas, estados_descargas
+import argparse
+import threading
 import time
 import os
 
-def descargar_rango_fechas(fecha_inicio, fecha_fin):
+RAW_DIR = "data/raw_boe"
+# Nombre de esta fuente en la tabla de descargas de la base de datos
+FUENTE = "xml"
+# Estados que consideramos definitivos: esas fechas no se vuelven a pedir al reanudar
+ESTADOS_COMPLETADOS = ("DOWNLOADED", "EXISTED")
+# Dia sin BOE (404 del servidor): tambien definitivo, salvo que se pida reintentar o sea un dia
+# reciente, cuyo sumario aun puede publicarse
+ESTADO_SIN_BOE = "NOT_FOUND"
+
+
+class LimitadorTasa:
+    """
+    Limitador global tipo 'token bucket' compartido por todos los hilos de descarga.
+    Permite como mucho `tasa` peticiones por segundo, con rafagas de hasta `capacidad`.
+    Una tasa <= 0 desactiva el limite.
+    """
+    def __init__(self, tasa, capacidad=None):
+        self.tasa = float(tasa)
+        self.capacidad = float(capacidad) if capacidad else max(1.0, self.tasa)
+        self._tokens = self.capacidad
+        self._ultimo = time.monotonic()
+        self._lock = threading.Lock()
+
+    def adquirir(self):
+        """Bloquea hasta que haya un token disponible y lo consume."""
+        if self.tasa <= 0:
+            return
+        while True:
+            with self._lock:
+                ahora = time.monotonic()
+                self._tokens = min(self.capacidad, self._tokens + (ahora - self._ultimo) * self.tasa)
+                self._ultimo = ahora
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                espera = (1 - self._tokens) / self.tasa
+            time.sleep(espera)
+
+
+class ManifiestoDescargas:
+    """
+    Estado de cada fecha descargada, guardado en la tabla de descargas de la base de datos,
+    para poder reanudar una expedicion interrumpida sin volver a pedir los dias ya completados.
+    Los estados se escriben por tandas de `guardar_cada` para no abrir una transaccion por dia.
+    Con `reintentar=True` los dias sin BOE se vuelven a pedir.
+    """
+    def __init__(self, ruta=BD_PATH, guardar_cada=10, reintentar=False):
+        self.ruta = ruta
+        self.guardar_cada = guardar_cada
+        self.reintentar = reintentar
+        self._lock = threading.Lock()
+        self._pendientes_de_guardar = []
+        self.fechas = estados_descargas(FUENTE, ruta)
+
+    def completada(self, fecha_iso):
+        """
+        Una fecha esta completada si el manifiesto lo dice y el archivo sigue en disco, o si
+        el servidor ya respondio que ese dia no hay BOE.
+        """
+        estado = self.fechas.get(fecha_iso)
+        if estado == ESTADO_SIN_BOE:
+            return not self.reintentar and not necesita_revalidacion(date.fromisoformat(fecha_iso))
+        if estado not in ESTADOS_COMPLETADOS:
+            return False
+        return os.path.exists(self._archivo(fecha_iso))
+
+    @staticmethod
+    def _archivo(fecha_iso):
+        return os.path.join(RAW_DIR, f"boe_{fecha_iso}.xml")
+
+    def registrar(self, fecha_iso, estado):
+        with self._lock:
+            self.fechas[fecha_iso] = estado
+            self._pendientes_de_guardar.append((fecha_iso, self._archivo(fecha_iso), estado))
+            if len(self._pendientes_de_guardar) >= self.guardar_cada:
+                self._guardar_sin_lock()
+
+    def guardar(self):
+        with self._lock:
+            self._guardar_sin_lock()
+
+    def _guardar_sin_lock(self):
+        # Una sola transaccion por tanda: un corte nunca deja una tanda a medias
+        registrar_descargas(self._pendientes_de_guardar, FUENTE, self.ruta)
+        self._pendientes_de_guardar = []
+
+
+def descargar_rango_fechas(fecha_inicio, fecha_fin, workers=1, peticiones_por_segundo=1.0,
+                           ruta_bd=BD_PATH, reintentar=False):
     """
-    Descarga los boletines del BOE para un rango de fechas específico,
-    limpiando previamente los datos antiguos para asegurar un dataset limpio.
+    Descarga los boletines del BOE para un rango de fechas específico.
+    Las descargas se reparten entre `workers` hilos y un limitador global
+    garantiza que no se superan `peticiones_por_segundo` contra el servidor del BOE.
+    Los datos ya descargados se conservan y las fechas completadas en el manifiesto
+    se saltan, de modo que una ejecucion interrumpida se reanuda donde se quedo. Los dias
+    sin BOE tambien se saltan, salvo con `reintentar=True`.
+    Devuelve un resumen con el numero de dias por estado.
     """
     print(f"--- Iniciando expedicion arqueologica de datos del BOE ---")
-    print(f"--- Rango de busqueda: de {fecha_inicio} a {fecha_fin} ---")
-    
-    raw_dir = "data/raw_boe"
-    if os.path.exists(raw_dir):
-        print("Limpiando yacimiento de datos antiguos...")
-        # Eliminamos todos los archivos dentro de la carpeta, pero no la carpeta en sí
-        for f in os.listdir(raw_dir):
-            os.remove(os.path.join(raw_dir, f))
-    else:
-        os.makedirs(raw_dir)
-
-    fecha_actual = fecha_inicio
+    print(f"--- Rango de busqueda: de {fecha_inicio} a {fecha_fin} ({workers} hilos, {peticiones_por_segundo} pet/s) ---")
+
+    os.makedirs(RAW_DIR, exist_ok=True)
+    manifiesto = ManifiestoDescargas(ruta_bd, reintentar=reintentar)
+
     dias_totales = (fecha_fin - fecha_inicio).days + 1
+    fechas = [fecha_inicio + timedelta(days=i) for i in range(max(dias_totales, 0))]
+    pendientes = [f for f in fechas if not manifiesto.completada(f.isoformat())]
+    resumen = {"REANUDADO": len(fechas) - len(pendientes)}
+    if resumen["REANUDADO"]:
+        print(f"Reanudando: {resumen['REANUDADO']} dias ya estaban completados en el manifiesto.")
+
+    limitador = LimitadorTasa(peticiones_por_segundo)
+
+    def _descargar_dia(fecha):
+        # El limitador se consulta antes de cada peticion, tambien en los reintentos del cliente HTTP
+        _, estado = descargar_boe(fecha.isoformat(), limitador=limitador)
+        return fecha, estado
+
     dias_procesados = 0
+    try:
+        with ThreadPoolExecutor(max_workers=max(1, workers)) as executor:
+            futuros = [executor.submit(_descargar_dia, f) for f in pendientes]
+            for futuro in as_completed(futuros):
+                fecha, estado = futuro.result()
+                dias_procesados += 1
+                manifiesto.registrar(fecha.isoformat(), estado)
+                resumen[estado] = resumen.get(estado, 0) + 1
+                print(f"Excavando fecha: {fecha.isoformat()} ({dias_procesados}/{len(pendientes)}) -> {estado}")
+    finally:
+        manifiesto.guardar()
 
-    while fecha_actual <= fecha_fin:
-        dias_procesados += 1
-        print(f"Excavando fecha: {fecha_actual.isoformat()} ({dias_procesados}/{dias_totales})")
-        descargar_boe(fecha_actual.isoformat())
-        time.sleep(1) # Pausa de 1 segundo para no saturar el servidor del BOE
-        fecha_actual += timedelta(days=1)
-        
     print("\n--- Expedicion completada ---")
+    return resumen
 
 if __name__ == "__main__":
-    # Viajamos 180 días (6 meses) al pasado y descargamos un bloque de 30 días.
+    # Por defecto viajamos 180 días (6 meses) al pasado y descargamos un bloque de 30 días.
     # Esto aumenta masivamente la probabilidad de encontrar datos no corruptos.
     hoy = date.today()
-    fecha_fin_descarga = hoy - timedelta(days=180)
-    fecha_inicio_descarga = fecha_fin_descarga - timedelta(days=30)
-    
-    descargar_rango_fechas(fecha_inicio_descarga, fecha_fin_descarga)
+    parser = argparse.ArgumentParser(description="Descarga historica de sumarios del BOE.")
+    parser.add_argument("--desde", type=date.fromisoformat, default=hoy - timedelta(days=210))
+    parser.add_argument("--hasta", type=date.fromisoformat, default=hoy - timedelta(days=180))
+    parser.add_argument("--workers", type=int, default=4, help="Numero de descargas simultaneas.")
+    parser.add_argument("--tasa", type=float, default=2.0, help="Peticiones por segundo como maximo (0 = sin limite).")
+    parser.add_argument("--reintentar", action="store_true",
+                        help="Vuelve a pedir los dias en los que el servidor respondio que no habia BOE (404).")
+    args = parser.parse_args()
+
+    descargar_rango_fechas(args.desde, args.hasta, workers=args.workers, peticiones_por_segundo=args.tasa,
+                           reintentar=args.reintentar)
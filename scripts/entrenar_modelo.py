@@ -1,39 +1,102 @@
-import pandas as pd
-from sklearn.feature_extraction.text import TfidfVectorizer
-from sklearn.model_selection import train_test_split
+from sklearn.feature_extraction.text import TfidfVectorizer, HashingVectorizer
+from sklearn.linear_model import SGDClassifier
+from sklearn.model_selection import train_test_split, StratifiedKFold, ParameterGrid
 from sklearn.ensemble import RandomForestClassifier
-from sklearn.metrics import accuracy_score, classification_report
-import joblib # Para guardar nuestro modelo entrenado
+from sklearn.metrics import accuracy_score, classification_report, f1_score
+from joblib import Parallel, delayed
+import argparse
+import json
 import os
+import time
+import numpy as np
+from base_datos import BD_PATH, leer_etiquetadas, leer_etiquetas_nuevas
+from clasificador import matriz_palabras_clave
+from features import combinar
+from modelo import cargar_artefactos
+import registro_modelos
+from registro_modelos import MODEL_DIR
+from cache_predicciones import CachePredicciones
 
-DATASET_PATH = "data/dataset_etiquetado.csv"
-MODEL_DIR = "modelos"
-MODEL_PATH = os.path.join(MODEL_DIR, "modelo_impacto.pkl")
-VECTORIZER_PATH = os.path.join(MODEL_DIR, "vectorizer.pkl")
+INFORME_BUSQUEDA_PATH = os.path.join(MODEL_DIR, "informe_busqueda.json")
+# Añade a TF-IDF las coincidencias de palabras clave del clasificador de sectores
+USAR_PALABRAS_CLAVE = True
+STOP_WORDS = ['de', 'la', 'el', 'en', 'y', 'a']
+MIN_ETIQUETADAS = 20
 
-def entrenar():
+# --- Rejilla de la busqueda de hiperparametros ---
+# Cada configuracion del vectorizador se ajusta una vez por fold y sus features se
+# reutilizan para todas las combinaciones de parametros del modelo.
+REJILLA_VECTORIZADOR = [
+    {"max_features": 1500, "ngram_range": (1, 1), "sublinear_tf": False},
+    {"max_features": 5000, "ngram_range": (1, 2), "sublinear_tf": True},
+    {"max_features": None, "ngram_range": (1, 2), "sublinear_tf": True},
+]
+REJILLA_MODELO = {
+    "n_estimators": [100, 300],
+    "max_depth": [None, 40],
+    "min_samples_leaf": [1, 2],
+}
+FOLDS = 5
+
+# --- Entrenamiento incremental ---
+# Extractor sin estado (HashingVectorizer: no hay vocabulario que reajustar) y un clasificador
+# lineal con partial_fit. Cada version incremental guarda en sus metadatos la ultima secuencia
+# del registro de cambios de etiquetas que consumio; la siguiente actualizacion parte de esa
+# version y solo lee las etiquetas creadas o cambiadas despues.
+N_FEATURES_HASHING = 2 ** 18
+# Pasadas barajadas sobre cada lote de etiquetas nuevas
+EPOCAS_INCREMENTALES = 5
+CLASES = np.array([0, 1])
+
+def cargar_entrenamiento():
+    """Normas etiquetadas como 0 o 1 (las saltadas no cuentan), o None si no hay suficientes."""
+    df_train = leer_etiquetadas()
+    if len(df_train) < MIN_ETIQUETADAS:
+        print(f"Necesitas al menos {MIN_ETIQUETADAS} normas etiquetadas para entrenar. Tienes {len(df_train)} en '{BD_PATH}'.")
+        print("Ejecuta 'auto_etiquetador.py' o 'etiquetador_manual.py' primero.")
+        return None
+    return df_train
+
+def _features(vectorizer, titulos, matriz_palabras, ajustar=False):
+    X = vectorizer.fit_transform(titulos) if ajustar else vectorizer.transform(titulos)
+    return combinar(X, matriz_palabras) if USAR_PALABRAS_CLAVE else X
+
+def guardar_modelo(model, vectorizer, datos, promover=True):
     """
-    Carga los datos etiquetados, entrena un modelo de clasificacion y lo guarda.
+    Registra el modelo y el vectorizador como una version nueva, con `datos` (normas,
+    metricas, tiempos) en sus metadatos. Si `promover`, la pone en uso e invalida las
+    predicciones cacheadas del modelo anterior. Devuelve la version.
     """
-    if not os.path.exists(DATASET_PATH):
-        print(f"Error: El dataset etiquetado '{DATASET_PATH}' no existe.")
-        print("Ejecuta 'etiquetador_manual.py' primero.")
-        return
+    version = registro_modelos.registrar(model, vectorizer, datos, promover=promover)
+    print(f"\n--- Modelo registrado como version {version} en '{registro_modelos.ruta_version(version)}' ---")
+    if not promover:
+        print(f"[OK] Version sin promover. Para usarla: python scripts/registro_modelos.py --promover {version}")
+        return version
+    print(f"[OK] Version {version} promovida: el pipeline y la API la usan a partir de ahora.")
 
-    df = pd.read_csv(DATASET_PATH)
-    # Nos aseguramos de usar solo las filas que hemos etiquetado
-    df_train = df[df['impacto'].isin([0, 1])].copy()
-    
-    if len(df_train) < 20:
-        print(f"Necesitas al menos 20 normas etiquetadas para entrenar. Tienes {len(df_train)}.")
+    # Las predicciones cacheadas del modelo anterior ya no sirven: las borramos del disco
+    cache = CachePredicciones()
+    borradas = cache.purgar(conservar_version=version)
+    cache.cerrar()
+    print(f"[OK] Cache de predicciones invalidada ({borradas} predicciones antiguas borradas).")
+    return version
+
+def entrenar(promover=True):
+    """
+    Carga los datos etiquetados, entrena un modelo de clasificacion y lo registra.
+    Los arboles del bosque se construyen en paralelo con todos los nucleos.
+    """
+    df_train = cargar_entrenamiento()
+    if df_train is None:
         return
 
     print(f"--- Iniciando entrenamiento con {len(df_train)} normas etiquetadas ---")
 
     # --- Feature Engineering: Convertir texto a numeros ---
     # Usamos TfidfVectorizer, una técnica clásica y muy efectiva en NLP
-    vectorizer = TfidfVectorizer(max_features=1500, stop_words=['de', 'la', 'el', 'en', 'y', 'a'])
-    X = vectorizer.fit_transform(df_train['titulo'].astype(str))
+    vectorizer = TfidfVectorizer(max_features=1500, stop_words=STOP_WORDS)
+    titulos = df_train['titulo'].astype(str)
+    X = _features(vectorizer, titulos, matriz_palabras_clave(df_train['titulo']), ajustar=True)
     y = df_train['impacto']
 
     # --- Division de datos para validacion ---
@@ -41,8 +104,10 @@ def entrenar():
 
     # --- Entrenamiento del modelo ---
     print("Entrenando el modelo RandomForest...")
-    model = RandomForestClassifier(n_estimators=100, random_state=42, class_weight='balanced')
+    model = RandomForestClassifier(n_estimators=100, random_state=42, class_weight='balanced', n_jobs=-1)
+    inicio = time.perf_counter()
     model.fit(X_train, y_train)
+    segundos = time.perf_counter() - inicio
 
     # --- Evaluacion del modelo ---
     y_pred = model.predict(X_test)
@@ -52,11 +117,220 @@ def entrenar():
     print("Reporte de Clasificacion:")
     print(classification_report(y_test, y_pred))
 
-    # --- Guardado del modelo y el vectorizador ---
-    os.makedirs(MODEL_DIR, exist_ok=True)
-    joblib.dump(model, MODEL_PATH)
-    joblib.dump(vectorizer, VECTORIZER_PATH)
-    print(f"\n--- Modelo y Vectorizador guardados en la carpeta '{MODEL_DIR}' ---")
+    # --- Registro del modelo y el vectorizador ---
+    guardar_modelo(model, vectorizer, {
+        "normas": len(df_train), "segundos_entrenamiento": round(segundos, 2),
+        "metricas": {"accuracy": round(accuracy, 4),
+                     "f1": round(float(f1_score(y_test, y_pred, zero_division=0)), 4)},
+        "parametros": {"n_estimators": 100, "max_features": 1500},
+    }, promover=promover)
+
+# --- Busqueda de hiperparametros ---
+
+def _vectorizar_fold(config, titulos, matriz_palabras, entrenamiento, prueba):
+    """Ajusta el vectorizador en el fold de entrenamiento y transforma ambos lados."""
+    vectorizer = TfidfVectorizer(stop_words=STOP_WORDS, **config)
+    X_train = _features(vectorizer, titulos.iloc[entrenamiento], matriz_palabras[entrenamiento], ajustar=True)
+    X_test = _features(vectorizer, titulos.iloc[prueba], matriz_palabras[prueba])
+    return X_train, X_test
+
+def _evaluar(params, X_train, y_train, X_test, y_test):
+    """Entrena y puntua un candidato en un fold. Devuelve (f1, accuracy, segundos, segundos de CPU)."""
+    inicio, inicio_cpu = time.perf_counter(), time.process_time()
+    # Un solo hilo por modelo: el paralelismo esta en repartir los candidatos entre procesos
+    model = RandomForestClassifier(random_state=42, class_weight='balanced', n_jobs=1, **params)
+    model.fit(X_train, y_train)
+    y_pred = model.predict(X_test)
+    return (f1_score(y_test, y_pred, zero_division=0), accuracy_score(y_test, y_pred),
+            time.perf_counter() - inicio, time.process_time() - inicio_cpu)
+
+def buscar_hiperparametros(n_jobs=-1, folds=FOLDS, informe_path=INFORME_BUSQUEDA_PATH, promover=True):
+    """
+    Busqueda en rejilla sobre REJILLA_VECTORIZADOR x REJILLA_MODELO con validacion cruzada
+    estratificada, repartida entre `n_jobs` procesos. El mejor candidato (por F1 medio de la
+    clase de impacto) se reentrena con todos los datos y se registra; el informe con tiempos y
+    puntuaciones de cada candidato se escribe en `informe_path`.
+    """
+    df_train = cargar_entrenamiento()
+    if df_train is None:
+        return None
+
+    inicio, inicio_cpu = time.perf_counter(), time.process_time()
+    titulos = df_train['titulo'].astype(str)
+    y = df_train['impacto'].to_numpy()
+    matriz_palabras = matriz_palabras_clave(df_train['titulo'])
+    particiones = list(StratifiedKFold(n_splits=folds, shuffle=True, random_state=42).split(titulos, y))
+    parametros_modelo = list(ParameterGrid(REJILLA_MODELO))
+    print(f"--- Busqueda de hiperparametros: {len(REJILLA_VECTORIZADOR)} vectorizadores x "
+          f"{len(parametros_modelo)} modelos x {folds} folds con {len(df_train)} normas ---")
+
+    with Parallel(n_jobs=n_jobs) as paralelo:
+        # 1) Features de cada (vectorizador, fold), calculadas una sola vez
+        features = paralelo(
+            delayed(_vectorizar_fold)(config, titulos, matriz_palabras, entrenamiento, prueba)
+            for config in REJILLA_VECTORIZADOR for entrenamiento, prueba in particiones
+        )
+        # 2) Todos los (vectorizador, modelo, fold) en paralelo sobre esas features
+        tareas = [(v, m, f) for v in range(len(REJILLA_VECTORIZADOR))
+                  for m in range(len(parametros_modelo)) for f in range(folds)]
+        resultados = paralelo(
+            delayed(_evaluar)(parametros_modelo[m], features[v * folds + f][0], y[particiones[f][0]],
+                              features[v * folds + f][1], y[particiones[f][1]])
+            for v, m, f in tareas
+        )
+
+    candidatos = {}
+    for (v, m, _), (f1, accuracy, segundos, cpu) in zip(tareas, resultados):
+        candidato = candidatos.setdefault((v, m), {"f1": [], "accuracy": [], "segundos": 0.0, "cpu": 0.0})
+        candidato["f1"].append(f1)
+        candidato["accuracy"].append(accuracy)
+        candidato["segundos"] += segundos
+        candidato["cpu"] += cpu
+    informe_candidatos = [
+        {"vectorizador": {k: list(val) if isinstance(val, tuple) else val for k, val in REJILLA_VECTORIZADOR[v].items()},
+         "modelo": parametros_modelo[m],
+         "f1_medio": round(float(np.mean(c["f1"])), 4), "f1_std": round(float(np.std(c["f1"])), 4),
+         "accuracy_media": round(float(np.mean(c["accuracy"])), 4),
+         "segundos_entrenamiento": round(c["segundos"], 2), "segundos_cpu": round(c["cpu"], 2)}
+        for (v, m), c in candidatos.items()
+    ]
+    informe_candidatos.sort(key=lambda c: c["f1_medio"], reverse=True)
+    mejor_v, mejor_m = max(candidatos, key=lambda k: np.mean(candidatos[k]["f1"]))
+    segundos_busqueda = time.perf_counter() - inicio
+
+    # --- Reentrenamiento del mejor candidato con todos los datos ---
+    print(f"Mejor candidato: {REJILLA_VECTORIZADOR[mejor_v]} + {parametros_modelo[mejor_m]} "
+          f"(F1 medio {informe_candidatos[0]['f1_medio']:.3f})")
+    vectorizer = TfidfVectorizer(stop_words=STOP_WORDS, **REJILLA_VECTORIZADOR[mejor_v])
+    X = _features(vectorizer, titulos, matriz_palabras, ajustar=True)
+    model = RandomForestClassifier(random_state=42, class_weight='balanced', n_jobs=n_jobs, **parametros_modelo[mejor_m])
+    inicio_final = time.perf_counter()
+    model.fit(X, y)
+    mejor = informe_candidatos[0]
+    version = guardar_modelo(model, vectorizer, {
+        "normas": len(df_train), "segundos_entrenamiento": round(time.perf_counter() - inicio_final, 2),
+        "metricas": {"f1_cv": mejor["f1_medio"], "accuracy_cv": mejor["accuracy_media"]},
+        "parametros": {**mejor["vectorizador"], **mejor["modelo"]}, "informe_busqueda": informe_path,
+    }, promover=promover)
+
+    informe = {
+        "normas": len(df_train), "folds": folds, "n_jobs": n_jobs, "nucleos": os.cpu_count(),
+        "segundos_busqueda": round(segundos_busqueda, 2),
+        "segundos_total": round(time.perf_counter() - inicio, 2),
+        # El CPU de los procesos del pool va sumado en los candidatos; aqui solo el del proceso principal
+        "segundos_cpu_principal": round(time.process_time() - inicio_cpu, 2),
+        "segundos_cpu_candidatos": round(sum(c["segundos_cpu"] for c in informe_candidatos), 2),
+        "version": version,
+        "mejor": mejor,
+        "candidatos": informe_candidatos,
+    }
+    os.makedirs(os.path.dirname(informe_path) or ".", exist_ok=True)
+    with open(informe_path, "w", encoding="utf-8") as f:
+        json.dump(informe, f, indent=2, ensure_ascii=False)
+    print(f"[OK] Busqueda completada en {informe['segundos_busqueda']:.1f}s "
+          f"({informe['segundos_cpu_candidatos']:.1f}s de CPU en candidatos). Informe en '{informe_path}'.")
+    return informe
+
+# --- Entrenamiento incremental ---
+
+def _nuevo_modelo_incremental():
+    vectorizer = HashingVectorizer(n_features=N_FEATURES_HASHING, alternate_sign=False, stop_words=STOP_WORDS)
+    model = SGDClassifier(loss="log_loss", alpha=1e-5, random_state=42)
+    return model, vectorizer
+
+def _es_incremental(meta):
+    return "secuencia_etiquetas" in meta
+
+def _version_base_incremental():
+    """
+    Metadatos de la version incremental sobre la que se aprende, o None, y si la version
+    en uso es incremental (o no hay ninguna). Se parte de la version promovida; si no es
+    incremental (p. ej. tras un revertir a un modelo completo), de la incremental mas reciente.
+    """
+    actual = registro_modelos.version_actual()
+    if actual is not None:
+        meta = registro_modelos.metadatos(actual)
+        if _es_incremental(meta):
+            return meta, True
+    incrementales = [m for m in registro_modelos.listar() if _es_incremental(m)]
+    return (incrementales[-1] if incrementales else None), actual is None
+
+def _aprender(model, X, y):
+    rng = np.random.default_rng(42)
+    for _ in range(EPOCAS_INCREMENTALES):
+        orden = rng.permutation(len(y))
+        model.partial_fit(X[orden], y[orden], classes=CLASES)
+
+def entrenar_incremental(promover=True, forzar_promocion=False):
+    """
+    Actualiza la version incremental en uso solo con las etiquetas nuevas o cambiadas desde
+    su punto de control y la registra como una version nueva. Si todavia no hay ninguna, la
+    crea con todas las normas etiquetadas. Si la version en uso es un modelo completo, la
+    nueva se registra sin promover salvo con `forzar_promocion`.
+    Devuelve la version, o None si no habia nada nuevo.
+    """
+    inicio = time.perf_counter()
+    base, en_uso_incremental = _version_base_incremental()
+    if promover and not en_uso_incremental and not forzar_promocion:
+        print(f"[AVISO] La version en uso ({registro_modelos.version_actual()}) es un modelo completo: "
+              f"la version incremental se registrara sin promover (usa --forzar-promocion para sustituirlo).")
+        promover = False
+    if base is None:
+        df, secuencia = leer_etiquetas_nuevas()
+        if len(df) < MIN_ETIQUETADAS:
+            print(f"Necesitas al menos {MIN_ETIQUETADAS} normas etiquetadas para entrenar. Tienes {len(df)} en '{BD_PATH}'.")
+            return None
+        print(f"--- Sin modelo incremental previo: se crea con las {len(df)} normas etiquetadas ---")
+        model, vectorizer = _nuevo_modelo_incremental()
+    else:
+        df, secuencia = leer_etiquetas_nuevas(base["secuencia_etiquetas"])
+        if df.empty:
+            print(f"[OK] No hay etiquetas nuevas desde la version {base['version']}: nada que actualizar.")
+            return None
+        print(f"--- Actualizando la version {base['version']} con {len(df)} etiquetas nuevas o cambiadas ---")
+        model, vectorizer = cargar_artefactos(base["version"], compacto=False)
+
+    X = _features(vectorizer, df['titulo'].fillna("").astype(str), matriz_palabras_clave(df['titulo']))
+    y = df['impacto'].to_numpy()
+    if base is None:
+        # Misma particion que entrenar() para que las metricas sean comparables; despues
+        # el modelo aprende tambien la parte de prueba
+        X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, random_state=42, stratify=y)
+        _aprender(model, X_train, y_train)
+        y_pred = model.predict(X_test)
+        metricas = {"accuracy": round(accuracy_score(y_test, y_pred), 4),
+                    "f1": round(float(f1_score(y_test, y_pred, zero_division=0)), 4)}
+        _aprender(model, X_test, y_test)
+    else:
+        # Evaluacion progresiva: el modelo anterior predice las etiquetas nuevas antes de aprenderlas
+        metricas = {"accuracy_progresiva": round(accuracy_score(y, model.predict(X)), 4)}
+        _aprender(model, X, y)
+    segundos = time.perf_counter() - inicio
+
+    return guardar_modelo(model, vectorizer, {
+        "normas": len(df) + (base or {}).get("normas", 0), "normas_nuevas": len(df),
+        "version_base": None if base is None else base["version"], "secuencia_etiquetas": secuencia,
+        "segundos_entrenamiento": round(segundos, 2), "metricas": metricas,
+        "parametros": {"n_features": N_FEATURES_HASHING, "epocas": EPOCAS_INCREMENTALES},
+    }, promover=promover)
 
 if __name__ == "__main__":
-    entrenar()
+    parser = argparse.ArgumentParser(description="Entrena el modelo de impacto con las normas etiquetadas.")
+    modo = parser.add_mutually_exclusive_group()
+    modo.add_argument("--incremental", action="store_true",
+                      help="Actualiza el modelo incremental solo con las etiquetas nuevas desde la ultima version.")
+    modo.add_argument("--buscar", action="store_true",
+                      help="Busqueda de hiperparametros en paralelo con validacion cruzada; guarda el mejor modelo.")
+    parser.add_argument("--jobs", type=int, default=-1, help="Procesos de la busqueda (-1 = todos los nucleos).")
+    parser.add_argument("--folds", type=int, default=FOLDS)
+    parser.add_argument("--sin-promover", action="store_true",
+                        help="Registra la version nueva sin ponerla en uso (se promueve con registro_modelos.py).")
+    parser.add_argument("--forzar-promocion", action="store_true",
+                        help="Con --incremental, promueve la version nueva aunque la version en uso sea un modelo completo.")
+    args = parser.parse_args()
+    if args.incremental:
+        entrenar_incremental(promover=not args.sin_promover, forzar_promocion=args.forzar_promocion)
+    elif args.buscar:
+        buscar_hiperparametros(n_jobs=args.jobs, folds=args.folds, promover=not args.sin_promover)
+    else:
+        entrenar(promover=not args.sin_promover)
@@ -0,0 +1,41 @@
+from scipy import sparse
+try:
+    from clasificador import PALABRAS_CLAVE, matriz_palabras_clave
+except ImportError:  # importado como paquete desde la raiz del proyecto
+    from scripts.clasificador import PALABRAS_CLAVE, matriz_palabras_clave
+
+# --- Features del modelo ---
+# TF-IDF del titulo + (opcionalmente) la matriz de coincidencias de palabras clave del
+# clasificador, pegada a la derecha. Si el llamador ya calculo la matriz para clasificar
+# los sectores, se reutiliza y el texto no se vuelve a escanear.
+
+
+def _num_features_texto(vectorizer):
+    if hasattr(vectorizer, "vocabulary_"):
+        return len(vectorizer.vocabulary_)
+    return getattr(vectorizer, "n_features", None)
+
+
+def usa_palabras_clave(modelo, vectorizer):
+    """Indica si el modelo se entreno con las columnas de palabras clave (los antiguos no)."""
+    n_texto = _num_features_texto(vectorizer)
+    return n_texto is not None and getattr(modelo, "n_features_in_", None) == n_texto + len(PALABRAS_CLAVE)
+
+
+def combinar(X_texto, matriz_palabras):
+    """Pega la matriz de palabras clave a la derecha de las features de texto."""
+    return sparse.hstack([X_texto, matriz_palabras], format="csr")
+
+
+def construir_features(vectorizer, titulos, modelo=None, matriz_palabras=None):
+    """
+    Features de inferencia para una Serie de titulos, en el formato con el que se entreno `modelo`.
+    `matriz_palabras` es la matriz de palabras clave ya calculada para esos mismos titulos.
+    """
+    # Los titulos nulos se vectorizan como texto vacio (con pandas 3 astype(str) los deja como NaN)
+    X = vectorizer.transform(titulos.fillna("").astype(str))
+    if modelo is not None and not usa_palabras_clave(modelo, vectorizer):
+        return X
+    if matriz_palabras is None:
+        matriz_palabras = matriz_palabras_clave(titulos)
+    return combinar(X, matriz_palabras)
@@ -1,7 +1,13 @@
-import pandas as pd
-import random
 import os
-from clasificador import clasificar_sector # Reutilizamos nuestro clasificador
+import json
+import argparse
+from datetime import date, timedelta
+from xml.sax.saxutils import escape, quoteattr
+import numpy as np
+import pandas as pd
+from clasificador import clasificar_sectores # Reutilizamos nuestro clasificador
+from almacen import DATASET_PARA_ETIQUETAR, escribir
+from base_datos import BD_PATH, guardar_normas, ultimos_numeros
 from tqdm import tqdm
 
 # --- "Ingredientes" para generar títulos de normas realistas ---
@@ -12,42 +18,241 @@ SECTORES_TEMAS = {
     "energético": ["energía eólica marina", "el autoconsumo eléctrico", "combustibles sintéticos", "la red de distribución eléctrica"],
     "otros": ["la pesca de bajura", "la sanidad animal", "el patrimonio cultural", "la seguridad vial"]
 }
-DEPARTAMENTOS = ["MINISTERIO DE ECONOMÍA", "MINISTERIO DE HACIENDA", "MINISTERIO DE TRANSPORTES", "MINISTERIO PARA LA TRANSICIÓN ECOLÓGICA", "MINISTERIO DE CULTURA"]
+# Como en el BOE real, la mayoria de las normas no son de los sectores que vigilamos
+PESOS_SECTORES = {"inmobiliario": 0.08, "financiero": 0.12, "energético": 0.06, "otros": 0.74}
+# Ordenados de mas a menos frecuente: el reparto sigue una ley de Zipf
+DEPARTAMENTOS = ["MINISTERIO DE HACIENDA", "MINISTERIO DE ECONOMÍA", "MINISTERIO DE TRANSPORTES", "MINISTERIO PARA LA TRANSICIÓN ECOLÓGICA", "MINISTERIO DE CULTURA",
+                 "MINISTERIO DEL INTERIOR", "MINISTERIO DE VIVIENDA Y AGENDA URBANA", "MINISTERIO DE AGRICULTURA, PESCA Y ALIMENTACIÓN", "MINISTERIO DE SANIDAD",
+                 "COMUNIDAD DE MADRID", "JUNTA DE ANDALUCÍA", "ADMINISTRACIÓN LOCAL", "UNIVERSIDADES"]
+EXPONENTE_ZIPF = 0.8
+# Departamento que firma la mayoria de las normas de cada sector vigilado
+DEPARTAMENTO_DEL_SECTOR = {"inmobiliario": "MINISTERIO DE VIVIENDA Y AGENDA URBANA", "financiero": "MINISTERIO DE HACIENDA",
+                           "energético": "MINISTERIO PARA LA TRANSICIÓN ECOLÓGICA"}
+AFINIDAD_DEPARTAMENTO = 0.6
 TIPOS_NORMA = ["Disposiciones generales", "Anuncios", "Autoridades y personal"]
+PESOS_TIPOS = [0.15, 0.5, 0.35]
+# Ambito territorial del final del titulo ("" = sin ambito) y numero de expediente: dan variedad al vocabulario
+AMBITOS = ["", "", "", " en la Comunidad de Madrid", " en Andalucía", " en Cataluña", " en la Comunitat Valenciana", " en Galicia", " en el ámbito estatal"]
+PROBABILIDAD_EXPEDIENTE = 0.5
+
+# --- Volumen por fecha ---
+# Peso de cada dia de la semana (lunes = 0): el BOE no se publica en domingo y los sabados sale mas corto
+PESO_DIA_SEMANA = [1.0, 1.1, 1.1, 1.0, 0.9, 0.6, 0.0]
+PESO_AGOSTO = 0.7
+NORMAS_POR_DIA = 250
+DESDE = date(2024, 1, 1)
+HASTA = date(2024, 12, 31)
+TAMANO_LOTE = 100_000
+# pyarrow no escribe mas de 1024 particiones (dias) en una misma llamada
+MAX_DIAS_POR_LOTE = 366
+
+# Identificadores <prefijo><año>-<n>: las disposiciones reales son BOE-A/BOE-B, asi que las
+# sinteticas nunca coinciden con una norma descargada
+PREFIJO_IDENTIFICADOR = "BOE-S-"
 
-def generar_titulo_aleatorio():
-    """Genera un título de norma plausible de forma aleatoria."""
-    accion = random.choice(ACCIONES)
-    sector = random.choice(list(SECTORES_TEMAS.keys()))
-    tema = random.choice(SECTORES_TEMAS[sector])
-    return f"{accion} {tema}."
+# Las mismas carpetas en las que dejan los sumarios descargar_historicos.py y descargador_api.py
+RAW_XML_DIR = "data/raw_boe"
+RAW_JSON_DIR = "data/raw_boe_json"
 
-def generar_dataset_falso(num_filas=200):
+# --- Tablas precalculadas para el muestreo vectorizado ---
+_SECTORES = list(SECTORES_TEMAS)
+_P_SECTORES = np.array([PESOS_SECTORES[s] for s in _SECTORES]) / sum(PESOS_SECTORES.values())
+_TEMAS = np.array([t for s in _SECTORES for t in SECTORES_TEMAS[s]], dtype=object)
+_N_TEMAS = np.array([len(SECTORES_TEMAS[s]) for s in _SECTORES])
+_INICIO_TEMAS = np.cumsum(_N_TEMAS) - _N_TEMAS
+_ACCIONES = np.array(ACCIONES, dtype=object)
+_AMBITOS = np.array(AMBITOS, dtype=object)
+_DEPARTAMENTOS = np.array(DEPARTAMENTOS, dtype=object)
+_P_DEPARTAMENTOS = 1.0 / np.arange(1, len(DEPARTAMENTOS) + 1) ** EXPONENTE_ZIPF
+_P_DEPARTAMENTOS /= _P_DEPARTAMENTOS.sum()
+_DEPARTAMENTO_AFIN = np.array([DEPARTAMENTOS.index(DEPARTAMENTO_DEL_SECTOR[s]) if s in DEPARTAMENTO_DEL_SECTOR else -1
+                               for s in _SECTORES])
+_TIPOS = np.array(TIPOS_NORMA, dtype=object)
+
+
+def _volumen_por_dia(fechas, rng, num_filas=None, por_dia=NORMAS_POR_DIA):
     """
-    Crea un DataFrame de pandas con datos sintéticos que imitan al BOE.
+    Normas de cada fecha: reparte exactamente `num_filas` segun el peso de cada dia o,
+    si no se indica, saca de una Poisson una media de `por_dia` en un dia laborable normal.
     """
-    print(f"--- Generando un dataset sintetico de {num_filas} normas ---")
-    datos = []
-    for _ in tqdm(range(num_filas), desc="Generando datos"):
-        datos.append({
-            "titulo": generar_titulo_aleatorio(),
-            "departamento": random.choice(DEPARTAMENTOS),
-            "tipo_norma": random.choice(TIPOS_NORMA),
-            "url_pdf": "/boe_sintetico.pdf"
-        })
-    
-    df = pd.DataFrame(datos)
-    
-    print("\n--- Aplicando clasificador de sectores a los datos generados ---")
-    tqdm.pandas(desc="Clasificando sectores")
-    df['sector'] = df['titulo'].progress_apply(clasificar_sector)
-    
-    output_filename = "data/dataset_para_etiquetar.csv"
-    os.makedirs(os.path.dirname(output_filename), exist_ok=True)
-    df.to_csv(output_filename, index=False, encoding='utf-8-sig')
-    
-    print(f"\n--- ¡Exito! Dataset sintetico guardado en '{output_filename}' ---")
+    pesos = np.array([PESO_DIA_SEMANA[f.weekday()] * (PESO_AGOSTO if f.month == 8 else 1.0) for f in fechas])
+    if num_filas is None:
+        return rng.poisson(por_dia * pesos)
+    if pesos.sum() == 0:  # un rango solo de domingos
+        pesos = np.ones(len(fechas))
+    return rng.multinomial(num_filas, pesos / pesos.sum())
+
+
+def _bloques_de_dias(conteos, tamano_lote):
+    """Rangos [inicio, fin) de dias consecutivos con como mucho `tamano_lote` normas (un dia nunca se parte)."""
+    inicio, acumulado = 0, 0
+    for i, n in enumerate(conteos):
+        if i > inicio and (acumulado + n > tamano_lote or i - inicio >= MAX_DIAS_POR_LOTE):
+            yield inicio, i
+            inicio, acumulado = i, 0
+        acumulado += n
+    if inicio < len(conteos):
+        yield inicio, len(conteos)
+
+
+def _generar_bloque(fechas, conteos, siguiente_numero, rng):
+    """DataFrame con las normas de unos dias. `siguiente_numero` lleva la numeracion de cada año entre bloques."""
+    n = int(conteos.sum())
+    dias = np.repeat(np.arange(len(fechas)), conteos)
+
+    sectores = rng.choice(len(_SECTORES), n, p=_P_SECTORES)
+    temas = _INICIO_TEMAS[sectores] + rng.integers(0, _N_TEMAS[sectores])
+    expedientes = np.where(rng.random(n) < PROBABILIDAD_EXPEDIENTE,
+                           " (expediente " + rng.integers(1, 10 ** 6, n).astype(str).astype(object) + ")", "")
+    titulos = (_ACCIONES[rng.integers(0, len(ACCIONES), n)] + " " + _TEMAS[temas]
+               + _AMBITOS[rng.integers(0, len(AMBITOS), n)] + expedientes + ".")
+
+    afin = _DEPARTAMENTO_AFIN[sectores]
+    usar_afin = (afin >= 0) & (rng.random(n) < AFINIDAD_DEPARTAMENTO)
+    departamentos = _DEPARTAMENTOS[np.where(usar_afin, afin, rng.choice(len(DEPARTAMENTOS), n, p=_P_DEPARTAMENTOS))]
+
+    # Identificadores correlativos dentro de cada año, como los reales
+    primeros = []
+    for fecha, cantidad in zip(fechas, conteos):
+        primeros.append(siguiente_numero.get(fecha.year, 1))
+        siguiente_numero[fecha.year] = primeros[-1] + int(cantidad)
+    posicion = np.arange(n) - np.repeat(np.cumsum(conteos) - conteos, conteos)
+    numeros = (np.repeat(primeros, conteos) + posicion).astype(str).astype(object)
+    iso = np.array([f.isoformat() for f in fechas], dtype=object)[dias]
+    anios = np.array([str(f.year) for f in fechas], dtype=object)[dias]
+    rutas = np.array([f.strftime("%Y/%m/%d") for f in fechas], dtype=object)[dias]
+    identificadores = PREFIJO_IDENTIFICADOR + anios + "-" + numeros
+
+    df = pd.DataFrame({
+        "identificador": identificadores,
+        "titulo": titulos,
+        "departamento": departamentos,
+        "tipo_norma": _TIPOS[rng.choice(len(TIPOS_NORMA), n, p=PESOS_TIPOS)],
+        "url_pdf": "/boe/dias/" + rutas + "/pdfs/" + identificadores + ".pdf",
+        "fecha_publicacion": iso,
+    })
+    df['sector'] = clasificar_sectores(df['titulo'])
+    return df
+
+
+def generar_lotes(num_filas=None, desde=DESDE, hasta=HASTA, por_dia=NORMAS_POR_DIA, semilla=42, tamano_lote=TAMANO_LOTE,
+                  ultimos=None):
+    """
+    Genera normas sinteticas entre `desde` y `hasta` en DataFrames de dias completos, por orden
+    de fecha y de como mucho `tamano_lote` filas: la memoria no depende del total.
+    Con `num_filas` se generan exactamente esas; si no, una media de `por_dia` por dia laborable.
+    Los identificadores de cada año empiezan despues de `ultimos` ({año: ultimo numero usado}).
+    La misma semilla y los mismos parametros dan siempre las mismas normas.
+    """
+    rng = np.random.default_rng(semilla)
+    fechas = [desde + timedelta(days=i) for i in range((hasta - desde).days + 1)]
+    conteos = _volumen_por_dia(fechas, rng, num_filas, por_dia)
+    siguiente_numero = {anio: numero + 1 for anio, numero in (ultimos or {}).items()}
+    for inicio, fin in _bloques_de_dias(conteos, tamano_lote):
+        if conteos[inicio:fin].sum() > 0:
+            yield _generar_bloque(fechas[inicio:fin], conteos[inicio:fin], siguiente_numero, rng)
+
+
+# --- Sumarios por dia ---
+
+def sumario_xml(df_dia):
+    """Sumario de un dia en el XML del BOE que descarga actualizador_diario.py y lee parser_normas.py."""
+    partes = ["<?xml version=\"1.0\" encoding=\"utf-8\"?>\n<boe><sumario><boletin>\n"]
+    for tipo, grupo in df_dia.groupby("tipo_norma", sort=False):
+        partes.append(f"<seccion nombre={quoteattr(tipo)}>\n")
+        partes.extend(
+            f"<epigrafe><titulo>{escape(t)}</titulo><urlPdf>{u}</urlPdf>"
+            f"<departamento>{escape(d)}</departamento></epigrafe>\n"
+            for t, u, d in zip(grupo["titulo"], grupo["url_pdf"], grupo["departamento"])
+        )
+        partes.append("</seccion>\n")
+    partes.append("</boletin></sumario></boe>\n")
+    return "".join(partes)
+
+
+def sumario_json(df_dia):
+    """Sumario de un dia en el JSON de la API de datos abiertos que lee run_prediction_pipeline.py."""
+    secciones = [
+        {"nombre": tipo, "item": [
+            {"identificador": i, "titulo": t, "departamento": d, "urlPdf": u}
+            for i, t, d, u in zip(grupo["identificador"], grupo["titulo"], grupo["departamento"], grupo["url_pdf"])
+        ]}
+        for tipo, grupo in df_dia.groupby("tipo_norma", sort=False)
+    ]
+    return {"sumario": {"diario": {"seccion": secciones}}}
 
-if __name__ == "__main__":
-    generar_dataset_falso(num_filas=200)
 
+def escribir_sumarios(df, formatos=("xml", "json"), dir_xml=RAW_XML_DIR, dir_json=RAW_JSON_DIR):
+    """Escribe un sumario por dia de `df` (boe_<fecha>.xml / .json). Devuelve cuantos archivos escribe."""
+    escritos = 0
+    for fecha, df_dia in df.groupby("fecha_publicacion", sort=False):
+        if "xml" in formatos:
+            os.makedirs(dir_xml, exist_ok=True)
+            with open(os.path.join(dir_xml, f"boe_{fecha}.xml"), "w", encoding="utf-8") as f:
+                f.write(sumario_xml(df_dia))
+            escritos += 1
+        if "json" in formatos:
+            os.makedirs(dir_json, exist_ok=True)
+            with open(os.path.join(dir_json, f"boe_{fecha}.json"), "w", encoding="utf-8") as f:
+                json.dump(sumario_json(df_dia), f, ensure_ascii=False)
+            escritos += 1
+    return escritos
+
+
+def generar_dataset_falso(num_filas=200, desde=DESDE, hasta=HASTA, por_dia=NORMAS_POR_DIA, semilla=42,
+                          tamano_lote=TAMANO_LOTE, guardar_bd=True, sumarios=(), reemplazar=False):
+    """
+    Crea normas sintéticas que imitan al BOE y las añade lote a lote al dataset Parquet
+    y a la base de datos (o, con `sumarios`, las escribe como sumarios por dia en esos formatos).
+    Solo con `reemplazar=True` sustituyen a todo lo que hubiera en el dataset y en la base de datos.
+    La numeracion sigue a la de las normas sinteticas que ya haya en la base de datos, de modo
+    que una segunda ejecucion nunca reescribe las de la anterior.
+    """
+    ultimos = ultimos_numeros(PREFIJO_IDENTIFICADOR) if os.path.exists(BD_PATH) else {}
+    cantidad = f"{num_filas} normas" if num_filas is not None else f"unas {por_dia} normas por dia"
+    print(f"--- Generando un dataset sintetico de {cantidad} entre {desde} y {hasta} (semilla {semilla}) ---")
+    total, archivos = 0, 0
+    with tqdm(desc="Generando datos", unit=" normas") as barra:
+        for lote in generar_lotes(num_filas, desde, hasta, por_dia, semilla, tamano_lote, ultimos):
+            if sumarios:
+                archivos += escribir_sumarios(lote, sumarios)
+            else:
+                # Solo si se pide, el primer lote reemplaza todo lo anterior; los demas se van añadiendo
+                primero = reemplazar and total == 0
+                escribir(lote, DATASET_PARA_ETIQUETAR, modo="overwrite" if primero else "append")
+                if guardar_bd:
+                    guardar_normas(lote, completo=primero)
+            total += len(lote)
+            barra.update(len(lote))
+
+    if sumarios:
+        print(f"\n--- ¡Exito! {total} normas en {archivos} sumarios ({', '.join(sumarios)}) "
+              f"en '{RAW_XML_DIR}' / '{RAW_JSON_DIR}' ---")
+    elif guardar_bd:
+        print(f"\n--- ¡Exito! {total} normas guardadas en '{DATASET_PARA_ETIQUETAR}' y en '{BD_PATH}' ---")
+    else:
+        print(f"\n--- ¡Exito! {total} normas guardadas en '{DATASET_PARA_ETIQUETAR}' ---")
+    return total
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Genera normas sinteticas del BOE para probar el proyecto a escala.")
+    volumen = parser.add_mutually_exclusive_group()
+    volumen.add_argument("--filas", type=int, default=200, help="Numero exacto de normas a generar.")
+    volumen.add_argument("--por-dia", type=int, help="En lugar de --filas, media de normas por dia laborable.")
+    parser.add_argument("--desde", type=date.fromisoformat, default=DESDE, help="Primera fecha (AAAA-MM-DD).")
+    parser.add_argument("--hasta", type=date.fromisoformat, default=HASTA, help="Ultima fecha (AAAA-MM-DD).")
+    parser.add_argument("--semilla", type=int, default=42)
+    parser.add_argument("--lote", type=int, default=TAMANO_LOTE, help="Normas por lote escrito.")
+    parser.add_argument("--sin-bd", action="store_true", help="Escribe solo el dataset Parquet, sin la base de datos.")
+    parser.add_argument("--reemplazar", action="store_true",
+                        help="Borra el dataset y las normas de la base de datos (con sus etiquetas automaticas y "
+                             "predicciones) y deja solo las generadas. Por defecto se añaden a lo que hay.")
+    parser.add_argument("--sumarios", nargs="+", choices=["xml", "json"],
+                        help=f"Escribe sumarios por dia en '{RAW_XML_DIR}' / '{RAW_JSON_DIR}' en lugar del dataset.")
+    args = parser.parse_args()
+    if args.desde > args.hasta:
+        parser.error("--desde no puede ser posterior a --hasta.")
+    generar_dataset_falso(None if args.por_dia else args.filas, args.desde, args.hasta, args.por_dia or NORMAS_POR_DIA,
+                          args.semilla, args.lote, guardar_bd=not args.sin_bd, sumarios=tuple(args.sumarios or ()),
+                          reemplazar=args.reemplazar)
@@ -0,0 +1,278 @@
+import os
+import json
+import time
+import argparse
+import threading
+from contextlib import contextmanager
+from datetime import datetime
+import numpy as np
+
+# --- Instrumentacion de los pipelines ---
+# Cada ejecucion lleva una Traza. Sus etapas (context managers) miden tiempo real, tiempo de
+# CPU del proceso y memoria pico, y acumulan contadores (normas, bytes descargados...). Al
+# terminar, la ejecucion se añade como una linea JSON al registro de ejecuciones, que este
+# mismo modulo resume en tablas de percentiles.
+# Con la traza desactivada las etapas solo cronometran (dos perf_counter por etapa): no se
+# lee la memoria, contar() no hace nada y no se escribe el registro.
+
+REGISTRO_EJECUCIONES = "logs/ejecuciones_pipeline.jsonl"
+PERCENTILES = (50, 90, 99)
+ULTIMAS_EJECUCIONES = 50
+# Campos del resultado de un pipeline que se guardan en su traza
+CAMPOS_RESULTADO = ("estado", "normas", "nuevas", "puntuadas", "alertas", "version_modelo")
+
+# Traza en curso en el proceso. Los pipelines no se solapan (la API los ejecuta en un unico
+# hilo de trabajos), asi que basta con una para que cliente_http pueda contar los bytes.
+_actual = None
+
+
+def _memoria_pico_mb():
+    """Pico de memoria residente del proceso (VmHWM) en MB, o None fuera de Linux."""
+    try:
+        with open("/proc/self/status") as f:
+            for linea in f:
+                if linea.startswith("VmHWM:"):
+                    return int(linea.split()[1]) / 1024
+    except OSError:
+        pass
+    return None
+
+
+def _reiniciar_pico():
+    """Pone el pico de memoria al valor actual (Linux >= 4.0)."""
+    try:
+        with open("/proc/self/clear_refs", "w") as f:
+            f.write("5")
+    except OSError:
+        pass
+
+
+class Etapa:
+    """Una pasada por una etapa de la traza. Se usa como context manager (ver Traza.etapa)."""
+    __slots__ = ("traza", "nombre", "contadores", "pico_hijas", "_inicio", "_cpu")
+
+    def __init__(self, traza, nombre):
+        self.traza = traza
+        self.nombre = nombre
+        self.contadores = {}
+        self.pico_hijas = None
+
+    def contar(self, contador, cantidad=1):
+        self.contadores[contador] = self.contadores.get(contador, 0) + cantidad
+
+    def __enter__(self):
+        if self.traza.activa:
+            self.traza._pila().append(self)
+            # Si no se puede reiniciar, el pico medido es el del proceso hasta ese momento
+            _reiniciar_pico()
+        self._cpu = time.process_time()
+        self._inicio = time.perf_counter()
+        return self
+
+    def __exit__(self, tipo_error, error, _traceback):
+        segundos = time.perf_counter() - self._inicio
+        cpu = time.process_time() - self._cpu
+        pico = None
+        if self.traza.activa:
+            pila = self.traza._pila()
+            pila.pop()
+            pico = _memoria_pico_mb()
+            # Las etapas anidadas reinician el pico: la de fuera se queda con el mayor de los suyos
+            if pico is not None and self.pico_hijas is not None:
+                pico = max(pico, self.pico_hijas)
+            if pila and pico is not None:
+                pila[-1].pico_hijas = max(pila[-1].pico_hijas or 0.0, pico)
+        self.traza._acumular(self.nombre, segundos, cpu, pico, self.contadores, tipo_error is not None)
+        return False
+
+
+class Traza:
+    """
+    Medidas de una ejecucion: por etapa, veces, segundos, segundos de CPU, pico de memoria (MB)
+    y contadores; y contadores de la ejecucion para lo que ocurre fuera de las etapas (p. ej.
+    en los hilos de descarga). Una etapa que se repite acumula sus medidas.
+    """
+    def __init__(self, tipo, activa=True):
+        self.tipo = tipo
+        self.activa = activa
+        self.etapas = {}
+        self.contadores = {}
+        self.resultado = {}
+        self.inicio = datetime.now()
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._cpu = time.process_time()
+        self._perf = time.perf_counter()
+
+    def _pila(self):
+        if not hasattr(self._local, "pila"):
+            self._local.pila = []
+        return self._local.pila
+
+    def etapa(self, nombre):
+        return Etapa(self, nombre)
+
+    def contar(self, contador, cantidad=1):
+        """Suma a la etapa abierta en este hilo o, si no hay ninguna, a la ejecucion."""
+        pila = self._pila()
+        if pila:
+            pila[-1].contar(contador, cantidad)
+            return
+        with self._lock:
+            self.contadores[contador] = self.contadores.get(contador, 0) + cantidad
+
+    def anotar(self, nombre, segundos, **contadores):
+        """Suma a una etapa tiempo medido en otro hilo (sin CPU ni memoria)."""
+        self._acumular(nombre, segundos, None, None, contadores, False)
+
+    def _acumular(self, nombre, segundos, cpu, pico, contadores, error):
+        with self._lock:
+            medida = self.etapas.setdefault(nombre, {"veces": 0, "segundos": 0.0})
+            medida["veces"] += 1
+            medida["segundos"] += segundos
+            if cpu is not None:
+                medida["cpu_segundos"] = medida.get("cpu_segundos", 0.0) + cpu
+            if pico is not None:
+                medida["pico_mb"] = max(medida.get("pico_mb", 0.0), pico)
+            for contador, cantidad in contadores.items():
+                medida[contador] = medida.get(contador, 0) + cantidad
+            if error:
+                medida["errores"] = medida.get("errores", 0) + 1
+
+    def segundos_por_etapa(self):
+        with self._lock:
+            return {nombre: medida["segundos"] for nombre, medida in self.etapas.items()}
+
+    def finalizar(self, resultado):
+        """Guarda en la traza los campos del resultado del pipeline (estado, normas...)."""
+        self.resultado.update({k: v for k, v in (resultado or {}).items() if k in CAMPOS_RESULTADO})
+
+    def registro(self):
+        """La traza como un dict listo para el registro de ejecuciones."""
+        with self._lock:
+            picos = [m["pico_mb"] for m in self.etapas.values() if "pico_mb" in m]
+            etapas = {nombre: {k: round(v, 1 if k == "pico_mb" else 4) if isinstance(v, float) else v
+                               for k, v in medida.items()}
+                      for nombre, medida in self.etapas.items()}
+            contadores = dict(self.contadores)
+        return {
+            "tipo": self.tipo, "inicio": self.inicio.isoformat(timespec="seconds"), "pid": os.getpid(),
+            "segundos": round(time.perf_counter() - self._perf, 4),
+            "cpu_segundos": round(time.process_time() - self._cpu, 4),
+            "pico_mb": round(max(picos), 1) if picos else None,
+            **self.resultado, "etapas": etapas, "contadores": contadores,
+        }
+
+
+def contar(contador, cantidad=1):
+    """Suma a la traza en curso, si la hay (p. ej. los bytes que descarga cliente_http)."""
+    traza = _actual
+    if traza is not None:
+        traza.contar(contador, cantidad)
+
+
+@contextmanager
+def ejecucion(tipo, activa=True, ruta=REGISTRO_EJECUCIONES):
+    """
+    Abre la traza de una ejecucion y, si `activa`, la añade al registro al terminar (tambien si
+    termina con una excepcion, con estado "error").
+    """
+    global _actual
+    traza = Traza(tipo, activa)
+    if not activa:
+        yield traza
+        return
+    _actual = traza
+    try:
+        yield traza
+    except BaseException as e:
+        traza.resultado.update(estado="error", error=f"{type(e).__name__}: {e}")
+        raise
+    finally:
+        _actual = None
+        try:
+            escribir_registro(traza.registro(), ruta)
+        except OSError as e:
+            print(f"  [AVISO] No se pudo escribir la traza en '{ruta}': {e}")
+
+
+def escribir_registro(registro, ruta=REGISTRO_EJECUCIONES):
+    os.makedirs(os.path.dirname(ruta) or ".", exist_ok=True)
+    # Una sola escritura en modo append: las lineas de dos procesos no se mezclan
+    with open(ruta, "a", encoding="utf-8") as f:
+        f.write(json.dumps(registro, ensure_ascii=False, default=str) + "\n")
+
+
+def leer_registro(ruta=REGISTRO_EJECUCIONES, tipo=None, ultimas=ULTIMAS_EJECUCIONES):
+    """Las `ultimas` trazas del registro (de `tipo`, si se indica), de la mas antigua a la mas reciente."""
+    if not os.path.exists(ruta):
+        return []
+    trazas = []
+    with open(ruta, "r", encoding="utf-8") as f:
+        for linea in f:
+            try:
+                traza = json.loads(linea)
+            except json.JSONDecodeError:  # una linea cortada por una ejecucion interrumpida
+                continue
+            if tipo is None or traza.get("tipo") == tipo:
+                trazas.append(traza)
+    return trazas[-ultimas:] if ultimas else trazas
+
+
+# --- Resumen del registro ---
+
+MEDIDAS_DE_TIEMPO = ("segundos", "cpu_segundos", "pico_mb")
+
+
+def _valores_por_etapa(trazas, medida):
+    """{etapa: valores} de una medida, en orden de aparicion; al final, los de la ejecucion completa."""
+    valores = {}
+    for traza in trazas:
+        for nombre, etapa in traza.get("etapas", {}).items():
+            if etapa.get(medida) is not None:
+                valores.setdefault(nombre, []).append(etapa[medida])
+    # De la ejecucion: su tiempo y memoria totales, o los contadores de fuera de las etapas
+    fuera = [t.get(medida) if medida in MEDIDAS_DE_TIEMPO else t.get("contadores", {}).get(medida) for t in trazas]
+    fuera = [v for v in fuera if v is not None]
+    if fuera:
+        valores["(ejecucion)"] = fuera
+    return valores
+
+
+def _celda(valor):
+    return f"{valor:>12,.0f}" if abs(valor) >= 1000 else f"{valor:>12.3f}"
+
+
+def resumir(trazas, percentiles=PERCENTILES):
+    """Imprime una tabla de percentiles por etapa para cada medida presente en las trazas."""
+    estados = {}
+    for traza in trazas:
+        estados[traza.get("estado", "?")] = estados.get(traza.get("estado", "?"), 0) + 1
+    print(f"--- {len(trazas)} ejecuciones, del {trazas[0]['inicio']} al {trazas[-1]['inicio']} "
+          f"({', '.join(f'{n} {e}' for e, n in estados.items())}) ---")
+
+    medidas = list(MEDIDAS_DE_TIEMPO)
+    for traza in trazas:
+        for etapa in list(traza.get("etapas", {}).values()) + [traza.get("contadores", {})]:
+            medidas.extend(m for m in etapa if m not in medidas and m not in ("veces", "errores"))
+    for medida in medidas:
+        valores_por_etapa = _valores_por_etapa(trazas, medida)
+        if not valores_por_etapa:
+            continue
+        print(f"\n{medida:<22}{'n':>5}" + "".join(f"{'p' + str(p):>12}" for p in percentiles) + f"{'max':>12}")
+        for nombre, valores in valores_por_etapa.items():
+            print(f"  {nombre:<20}{len(valores):>5}" + "".join(_celda(v) for v in np.percentile(valores, percentiles))
+                  + _celda(max(valores)))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Resume las ultimas ejecuciones del registro de trazas del pipeline.")
+    parser.add_argument("--ultimas", type=int, default=ULTIMAS_EJECUCIONES, help="Ejecuciones a resumir (0 = todas).")
+    parser.add_argument("--tipo", help="Solo ejecuciones de este tipo (p. ej. 'diario' o 'backfill').")
+    parser.add_argument("--registro", default=REGISTRO_EJECUCIONES, help="Archivo JSONL de trazas.")
+    args = parser.parse_args()
+    trazas = leer_registro(args.registro, args.tipo, args.ultimas)
+    if not trazas:
+        print(f"[AVISO] No hay ejecuciones en '{args.registro}'. Ejecuta 'run_prediction_pipeline.py' primero.")
+    else:
+        resumir(trazas)
@@ -0,0 +1,121 @@
+import threading
+import time
+import joblib
+import numpy as np
+try:
+    from clasificador import matriz_palabras_clave, sector_desde_matriz
+    from features import construir_features
+    import artefactos_compactos
+    import registro_modelos
+except ImportError:  # importado como paquete desde la raiz del proyecto
+    from scripts.clasificador import matriz_palabras_clave, sector_desde_matriz
+    from scripts.features import construir_features
+    from scripts import artefactos_compactos, registro_modelos
+
+MODEL_DIR = registro_modelos.MODEL_DIR
+
+
+def artefactos_disponibles(directorio=MODEL_DIR):
+    return version_artefactos(directorio) is not None
+
+
+def cargar_artefactos(version=None, compacto=True, directorio=MODEL_DIR):
+    """
+    Carga desde el registro una version del modelo (por defecto la promovida). Devuelve
+    (modelo, vectorizer). Si la version tiene artefactos compactos los usa (mapeados en
+    memoria, sin deserializar); si no, lee los pickles.
+    """
+    if version is None:
+        version = version_artefactos(directorio)
+        if version is None:
+            raise FileNotFoundError(f"No hay ningun modelo promovido en '{directorio}'. Entrena uno con "
+                                    f"'entrenar_modelo.py' o importa los .pkl antiguos con "
+                                    f"'registro_modelos.py --importar-legado'.")
+    model_path, vectorizer_path, compacto_path = registro_modelos.rutas_artefactos(version, directorio)
+    if compacto and artefactos_compactos.disponible(compacto_path):
+        return artefactos_compactos.cargar(compacto_path)
+    return joblib.load(model_path), joblib.load(vectorizer_path)
+
+
+def version_artefactos(directorio=MODEL_DIR):
+    """
+    Version del modelo promovida ahora mismo en el registro, o None si no hay modelo.
+    Quien la usa la resuelve una vez y carga justo esa version con cargar_artefactos(version).
+    Si aun no hay nada promovido pero quedan los .pkl de antes del registro, se importan
+    (y promueven) para que una instalacion antigua siga prediciendo sin pasos manuales.
+    """
+    version = registro_modelos.version_actual(directorio)
+    if version is None:
+        try:
+            version = registro_modelos.importar_legado(directorio)
+        except Exception as e:
+            print(f"[AVISO] No se pudieron importar los .pkl antiguos de '{directorio}': {e}")
+            return None
+        if version is not None:
+            print(f"[OK] Modelo anterior al registro importado como version {version}.")
+    return version
+
+
+class ModeloEnCaliente:
+    """
+    Mantiene el modelo y el vectorizador cargados en memoria para procesos de larga vida
+    (la API). Como mucho cada `intervalo` segundos lee el puntero del registro y, si se ha
+    promovido otra version (o se ha revertido), la carga. Si la carga falla se sigue
+    sirviendo la version anterior.
+    """
+    def __init__(self, directorio=MODEL_DIR, intervalo=1.0):
+        self.directorio = directorio
+        self.intervalo = intervalo
+        # Artefactos y version se sustituyen juntos para que nunca se lean desparejados
+        self._cargado = (None, None)
+        self._ultima_comprobacion = 0.0
+        # Segundos que tardo la ultima carga y cuando termino (time.time()), para las metricas
+        self.segundos_carga = None
+        self.cargado_en = None
+        self._lock = threading.Lock()
+
+    @property
+    def version(self):
+        return self._cargado[1]
+
+    def obtener(self):
+        """Devuelve (modelo, vectorizer), o None si todavia no hay modelo entrenado."""
+        return self.obtener_con_version()[0]
+
+    def obtener_con_version(self):
+        """Devuelve ((modelo, vectorizer), version), o (None, None) si no hay modelo."""
+        ahora = time.monotonic()
+        if self._cargado[0] is not None and ahora - self._ultima_comprobacion < self.intervalo:
+            return self._cargado
+
+        with self._lock:
+            self._ultima_comprobacion = ahora
+            version = version_artefactos(self.directorio)
+            if version is not None and version != self.version:
+                try:
+                    inicio = time.perf_counter()
+                    self._cargado = (cargar_artefactos(version, directorio=self.directorio), version)
+                    self.segundos_carga = time.perf_counter() - inicio
+                    self.cargado_en = time.time()
+                    print(f"[OK] Modelo cargado en memoria (version {self.version}).")
+                except Exception as e:
+                    print(f"[AVISO] No se pudo cargar la version {version}, se mantiene la anterior: {e}")
+            return self._cargado
+
+def puntuar(modelo, vectorizer, titulos, matriz_palabras=None):
+    """
+    Puntua una Serie de titulos con el modelo ya cargado, con una sola llamada a
+    vectorizer.transform y otra a predict_proba para todo el lote.
+    `matriz_palabras` es la matriz de palabras clave de esos titulos, si ya se calculo.
+    Devuelve tres arrays paralelos: impacto predicho, probabilidad de impacto alto (clase 1) y sector.
+    """
+    if matriz_palabras is None:
+        matriz_palabras = matriz_palabras_clave(titulos)
+    X = construir_features(vectorizer, titulos, modelo, matriz_palabras)
+    probas = modelo.predict_proba(X)
+    clases = list(modelo.classes_)
+    # La clase predicha es la de mayor probabilidad, igual que modelo.predict
+    predicciones = np.asarray(modelo.classes_)[probas.argmax(axis=1)]
+    probabilidades = probas[:, clases.index(1)] if 1 in clases else np.zeros(len(predicciones))
+    sectores = sector_desde_matriz(matriz_palabras, titulos)
+    return predicciones, probabilidades, np.asarray(sectores, dtype=object)
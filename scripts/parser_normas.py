@@ -1,6 +1,76 @@
-import xmltodict
+import xml.etree.ElementTree as ET
 import os
 
+# Ruta de etiquetas hasta cada disposicion: boe/sumario/boletin/seccion/epigrafe
+RUTA_SECCION = ["boe", "sumario", "boletin", "seccion"]
+RUTA_EPIGRAFE = RUTA_SECCION + ["epigrafe"]
+
+
+def _elemento_a_valor(elem):
+    """
+    Convierte un elemento (ya completo) al mismo valor que produciria xmltodict:
+    texto (o None) si es una hoja sin atributos; si no, un dict con '@atributos',
+    hijos (en lista si se repiten) y '#text'.
+    """
+    hijos = list(elem)
+    texto = "".join(t for t in [elem.text] + [h.tail for h in hijos] if t).strip()
+    if not elem.attrib and not hijos:
+        return texto or None
+
+    valor = {f"@{k}": v for k, v in elem.attrib.items()}
+    for hijo in hijos:
+        contenido = _elemento_a_valor(hijo)
+        if hijo.tag in valor:
+            if not isinstance(valor[hijo.tag], list):
+                valor[hijo.tag] = [valor[hijo.tag]]
+            valor[hijo.tag].append(contenido)
+        else:
+            valor[hijo.tag] = contenido
+    if texto:
+        valor["#text"] = texto
+    return valor
+
+
+def iterar_disposiciones(xml_path):
+    """
+    Parser en streaming de un sumario XML del BOE: va leyendo el archivo por eventos
+    y devuelve las disposiciones de una en una, liberando cada elemento al terminar con el.
+    Los errores de lectura o de XML se propagan al llamador.
+    """
+    fecha_publicacion = os.path.basename(xml_path).replace('boe_', '').replace('.xml', '').replace('_', '-')
+    pila = []
+    etiquetas = []
+    nombre_seccion = "No especificado"
+
+    for evento, elem in ET.iterparse(xml_path, events=("start", "end")):
+        if evento == "start":
+            pila.append(elem)
+            etiquetas.append(elem.tag)
+            if etiquetas == RUTA_SECCION:
+                nombre_seccion = elem.get("nombre", "No especificado")
+            continue
+
+        profundidad = len(pila)
+        if etiquetas == RUTA_EPIGRAFE:
+            dispo = _elemento_a_valor(elem)
+            if not isinstance(dispo, dict):
+                dispo = {}
+            yield {
+                "titulo": dispo.get("titulo"),
+                "url_pdf": dispo.get("urlPdf"),
+                "departamento": dispo.get("departamento", "No especificado"),
+                "fecha_publicacion": fecha_publicacion,
+                "tipo_norma": nombre_seccion
+            }
+
+        pila.pop()
+        etiquetas.pop()
+        # Desenganchamos del arbol todo lo que ya hemos recorrido hasta el nivel de epigrafe,
+        # asi la memoria no crece con el tamaño del sumario.
+        if pila and profundidad <= len(RUTA_EPIGRAFE):
+            pila[-1].remove(elem)
+
+
 def parsear_boe(xml_path):
     """
     Parsea un archivo XML del BOE y extrae las disposiciones de forma segura.
@@ -8,36 +78,9 @@ def parsear_boe(xml_path):
     if not os.path.exists(xml_path):
         print(f"❌ Error: El archivo {xml_path} no existe.")
         return []
-        
-    with open(xml_path, "rb") as f:
-        try:
-            data = xmltodict.parse(f)
-        except Exception as e:
-            print(f"❌ Error al parsear el archivo XML {xml_path}: {e}")
-            return []
-    
-    procesadas = []
-    sumario = data.get("boe", {}).get("sumario", {})
-    boletines = sumario.get("boletin", [])
-    if not isinstance(boletines, list):
-        boletines = [boletines]
-
-    for boletin in boletines:
-        secciones = boletin.get("seccion", [])
-        if not isinstance(secciones, list):
-            secciones = [secciones]
-
-        for seccion in secciones:
-            disposiciones = seccion.get("epigrafe", [])
-            if not isinstance(disposiciones, list):
-                disposiciones = [disposiciones]
-
-            for dispo in disposiciones:
-                procesadas.append({
-                    "titulo": dispo.get("titulo"),
-                    "url_pdf": dispo.get("urlPdf"),
-                    "departamento": dispo.get("departamento", "No especificado"),
-                    "fecha_publicacion": os.path.basename(xml_path).replace('boe_', '').replace('.xml', '').replace('_', '-'),
-                    "tipo_norma": seccion.get("@nombre", "No especificado")
-                })
-    return procesadas
+
+    try:
+        return list(iterar_disposiciones(xml_path))
+    except Exception as e:
+        print(f"❌ Error al parsear el archivo XML {xml_path}: {e}")
+        return []
@@ -1,64 +1,165 @@
 import os
+import json
+import argparse
 import pandas as pd
+from concurrent.futures import ProcessPoolExecutor
 from parser_normas import parsear_boe
-from clasificador import clasificar_sector
+from clasificador import clasificar_sectores
+from almacen import DATASET_PARA_ETIQUETAR, escribir, existe
+from base_datos import guardar_normas
 from tqdm import tqdm
-import sys
 
-def consolidar_historicos(usar_muestra=False, output_filename="data/dataset_para_etiquetar.csv"):
+RAW_DIR = "data/raw_boe"
+MANIFIESTO_PATH = "data/manifiesto_consolidacion.json"
+
+
+def _huella(ruta):
+    """Identifica la version de un archivo por su tamaño y fecha de modificacion."""
+    stat = os.stat(ruta)
+    return {"tamano": stat.st_size, "mtime_ns": stat.st_mtime_ns}
+
+
+def _fecha_de_archivo(filename):
+    # Misma regla que usa el parser para rellenar 'fecha_publicacion'
+    return filename.replace('boe_', '').replace('.xml', '').replace('_', '-')
+
+
+def cargar_manifiesto(ruta=MANIFIESTO_PATH):
+    if not os.path.exists(ruta):
+        return {}
+    try:
+        with open(ruta, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (IOError, json.JSONDecodeError) as e:
+        print(f"[AVISO] Manifiesto '{ruta}' ilegible, se consolidara todo de nuevo: {e}")
+        return {}
+
+
+def guardar_manifiesto(manifiesto, ruta=MANIFIESTO_PATH):
+    os.makedirs(os.path.dirname(ruta), exist_ok=True)
+    tmp = ruta + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(manifiesto, f, indent=2, sort_keys=True)
+    os.replace(tmp, ruta)
+
+
+def procesar_archivo(ruta):
+    """Parsea y clasifica un unico XML. Se ejecuta dentro de los procesos del pool."""
+    normas = parsear_boe(ruta)
+    sectores = clasificar_sectores([norma['titulo'] for norma in normas])
+    for norma, sector in zip(normas, sectores):
+        norma['sector'] = sector
+    return os.path.basename(ruta), normas
+
+
+def registrar(df, fechas_reemplazadas=()):
+    """
+    Lleva a la base de datos los mismos dias que se acaban de consolidar. Cada XML es el sumario
+    completo de su dia, asi que solo se sustituyen esos dias: las normas que no cambian (la clave
+    es el identificador del BOE de su URL) conservan su id, sus etiquetas y sus predicciones.
+    Si falla, la excepcion se propaga antes de guardar el manifiesto y la proxima ejecucion lo reintenta.
+    """
+    ids = guardar_normas(df, fechas_reemplazadas, borrar_ausentes=True)
+    print(f"[OK] {len(ids)} normas registradas en la base de datos.")
+
+
+def consolidar_historicos(usar_muestra=False, output_path=DATASET_PARA_ETIQUETAR,
+                          workers=None, completo=False):
     """
-    Lee los archivos XML, los procesa y los consolida en un CSV.
+    Lee los archivos XML, los procesa y los consolida en el almacen Parquet.
     Incluye un modo de muestra para usar datos de laboratorio.
+
+    Los archivos se parsean y clasifican en paralelo con `workers` procesos (por defecto,
+    todos los nucleos). Un manifiesto recuerda que archivos ya estan consolidados, de modo
+    que solo se procesan los nuevos o modificados y sus filas sustituyen a las de su dia.
+    Con `completo=True` se ignora el manifiesto y se reconstruye todo.
     """
-    lista_completa_normas = []
-    
     if usar_muestra:
         print("--- Ejecutando en MODO MUESTRA ---")
         sample_file = "data/sample_boe.xml"
         if not os.path.exists(sample_file):
             print(f"Error: El archivo de muestra '{sample_file}' no existe.")
             return
-        normas = parsear_boe(sample_file)
+        _, normas = procesar_archivo(sample_file)
+        if not normas:
+            print("Proceso detenido: no se pudieron extraer normas validas.")
+            return
+        df = pd.DataFrame(normas)
+        escribir(df, output_path, modo="overwrite")
+        registrar(df)
+        print(f"\n--- Proceso completado. Dataset con {len(df)} normas guardado en '{output_path}' ---")
+        return
+
+    if not os.path.exists(RAW_DIR) or not os.listdir(RAW_DIR):
+        print(f"Error: La carpeta '{RAW_DIR}' no existe o está vacía. Ejecuta 'descargar_historicos.py' primero.")
+        return
+
+    xml_files = sorted(f for f in os.listdir(RAW_DIR) if f.endswith(".xml"))
+    huellas = {f: _huella(os.path.join(RAW_DIR, f)) for f in xml_files}
+
+    # Sin dataset previo no hay nada a lo que añadir: reconstruimos desde cero
+    manifiesto = {} if completo or not existe(output_path) else cargar_manifiesto()
+    nuevos = [f for f in xml_files if f not in manifiesto]
+    modificados = [f for f in xml_files if f in manifiesto and manifiesto[f] != huellas[f]]
+    a_procesar = nuevos + modificados
+
+    if not a_procesar:
+        print(f"--- Nada que consolidar: los {len(xml_files)} archivos XML ya estaban en '{output_path}' ---")
+        return
+
+    print(f"--- Procesando {len(a_procesar)} archivos XML ({len(nuevos)} nuevos, {len(modificados)} modificados, "
+          f"{len(xml_files) - len(a_procesar)} ya consolidados) ---")
+    rutas = [os.path.join(RAW_DIR, f) for f in a_procesar]
+    lista_completa_normas = []
+    archivos_fallidos = []
+
+    workers = workers or os.cpu_count() or 1
+    if workers > 1 and len(rutas) > 1:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            chunksize = max(1, len(rutas) // (workers * 4))
+            resultados = list(tqdm(executor.map(procesar_archivo, rutas, chunksize=chunksize),
+                                   total=len(rutas), desc="Procesando archivos"))
+    else:
+        resultados = [procesar_archivo(r) for r in tqdm(rutas, desc="Procesando archivos")]
+
+    for filename, normas in resultados:
         if normas:
             lista_completa_normas.extend(normas)
-    else:
-        # Lógica original
-        raw_dir = "data/raw_boe"
-        if not os.path.exists(raw_dir) or not os.listdir(raw_dir):
-            print(f"Error: La carpeta '{raw_dir}' no existe o está vacía. Ejecuta 'descargar_historicos.py' primero.")
-            return
+        else:
+            archivos_fallidos.append(filename)
+
+    print(f"\nResumen: {len(a_procesar) - len(archivos_fallidos)} archivos procesados con exito, {len(archivos_fallidos)} descartados.\n")
+
+    if archivos_fallidos:
+        # Un archivo vacio o ilegible (p. ej. una descarga a medias) no toca los datos ya
+        # consolidados de su dia ni entra en el manifiesto: la proxima ejecucion lo reintenta
+        print(f"[AVISO] Se conservan los datos anteriores de: {', '.join(sorted(archivos_fallidos))}")
+    validos = [f for f in a_procesar if f not in set(archivos_fallidos)]
+    df_nuevas = pd.DataFrame(lista_completa_normas)
 
-        xml_files = [f for f in os.listdir(raw_dir) if f.endswith(".xml")]
-        archivos_fallidos = []
-        
-        print(f"--- Procesando {len(xml_files)} archivos XML ---")
-        for filename in tqdm(xml_files, desc="Procesando archivos"):
-            ruta_completa = os.path.join(raw_dir, filename)
-            normas = parsear_boe(ruta_completa)
-            if normas:
-                lista_completa_normas.extend(normas)
-            else:
-                archivos_fallidos.append(filename)
-
-        print(f"\nResumen: {len(xml_files) - len(archivos_fallidos)} archivos procesados con exito, {len(archivos_fallidos)} descartados.\n")
-
-    if not lista_completa_normas:
+    if df_nuevas.empty:
         print("Proceso detenido: no se pudieron extraer normas validas.")
         return
 
-    df = pd.DataFrame(lista_completa_normas)
-    
-    print("--- Clasificando sectores ---")
-    tqdm.pandas(desc="Clasificando sectores")
-    df['sector'] = df['titulo'].progress_apply(clasificar_sector)
-    
-    os.makedirs(os.path.dirname(output_filename), exist_ok=True)
-    df.to_csv(output_filename, index=False, encoding='utf-8-sig')
-    print(f"\n--- Proceso completado. Dataset con {len(df)} normas guardado en '{output_filename}' ---")
+    # Cada XML es el sumario completo de su dia: sus filas sustituyen a las que hubiera de esa
+    # fecha, tanto si el archivo es nuevo como si ha cambiado, y nunca se duplican
+    fechas_tocadas = {_fecha_de_archivo(f) for f in validos}
+    if not manifiesto:
+        escribir(df_nuevas, output_path, modo="overwrite")
+    else:
+        escribir(df_nuevas, output_path, modo="reemplazar_particiones")
+    registrar(df_nuevas, fechas_tocadas)
+
+    for f in validos:
+        manifiesto[f] = huellas[f]
+    guardar_manifiesto(manifiesto)
+
+    print(f"\n--- Proceso completado. {len(df_nuevas)} normas consolidadas en '{output_path}' ---")
 
 if __name__ == "__main__":
-    # La línea de abajo es la que hemos corregido. Hemos eliminado el '1' final.
-    if '--muestra' in sys.argv:
-        consolidar_historicos(usar_muestra=True)
-    else:
-        consolidar_historicos(usar_muestra=False)
+    parser = argparse.ArgumentParser(description="Consolida los XML historicos del BOE en un dataset.")
+    parser.add_argument("--muestra", action="store_true", help="Usa el archivo de laboratorio data/sample_boe.xml.")
+    parser.add_argument("--workers", type=int, default=None, help="Procesos en paralelo (por defecto, todos los nucleos).")
+    parser.add_argument("--completo", action="store_true", help="Ignora el manifiesto y reconstruye el dataset entero.")
+    args = parser.parse_args()
+    consolidar_historicos(usar_muestra=args.muestra, workers=args.workers, completo=args.completo)
@@ -0,0 +1,212 @@
+import os
+import json
+import time
+import shutil
+import argparse
+from datetime import datetime
+import joblib
+try:
+    import artefactos_compactos
+except ImportError:  # importado como paquete desde la raiz del proyecto
+    from scripts import artefactos_compactos
+
+# --- Registro de versiones del modelo ---
+# Cada entrenamiento se guarda en su propia carpeta modelos/versiones/<version>/ (pickles,
+# artefactos compactos y meta.json) que ya no se vuelve a tocar. La version en uso la marca
+# un puntero (modelos/actual.json) que se reescribe con os.replace: quien lo lee ve la
+# version anterior o la nueva completa, nunca un modelo con el vectorizador de otro.
+# Volver atras es solo apuntar el puntero a otra carpeta.
+
+MODEL_DIR = "modelos"
+MODELO_ARCHIVO = "modelo_impacto.pkl"
+VECTORIZER_ARCHIVO = "vectorizer.pkl"
+COMPACTO_ARCHIVO = "compacto"
+# Versiones que se conservan en disco; la promovida y su anterior nunca se borran
+VERSIONES_CONSERVADAS = 10
+
+
+def _versiones_dir(directorio=MODEL_DIR):
+    return os.path.join(directorio, "versiones")
+
+
+def _puntero_path(directorio=MODEL_DIR):
+    return os.path.join(directorio, "actual.json")
+
+
+def ruta_version(version, directorio=MODEL_DIR):
+    return os.path.join(_versiones_dir(directorio), version)
+
+
+def rutas_artefactos(version, directorio=MODEL_DIR):
+    """(modelo, vectorizer, carpeta de artefactos compactos) de una version."""
+    ruta = ruta_version(version, directorio)
+    return (os.path.join(ruta, MODELO_ARCHIVO), os.path.join(ruta, VECTORIZER_ARCHIVO),
+            os.path.join(ruta, COMPACTO_ARCHIVO))
+
+
+def existe(version, directorio=MODEL_DIR):
+    return os.path.exists(os.path.join(ruta_version(version, directorio), "meta.json"))
+
+
+def _escribir_json(ruta, datos):
+    """Escribe en un temporal y lo renombra: los lectores nunca ven el archivo a medias."""
+    tmp = f"{ruta}.tmp{os.getpid()}"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(datos, f, indent=2, ensure_ascii=False, default=str)
+    os.replace(tmp, ruta)
+
+
+def leer_puntero(directorio=MODEL_DIR):
+    """Contenido de actual.json (version, anterior, promovido), o None si no hay nada promovido."""
+    try:
+        with open(_puntero_path(directorio), "r", encoding="utf-8") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+
+
+def version_actual(directorio=MODEL_DIR):
+    """Version promovida, o None si todavia no hay ninguna."""
+    puntero = leer_puntero(directorio)
+    return None if puntero is None else puntero["version"]
+
+
+def metadatos(version, directorio=MODEL_DIR):
+    with open(os.path.join(ruta_version(version, directorio), "meta.json"), "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def listar(directorio=MODEL_DIR):
+    """Metadatos de todas las versiones, de la mas antigua a la mas reciente."""
+    if not os.path.isdir(_versiones_dir(directorio)):
+        return []
+    return [metadatos(v, directorio) for v in sorted(os.listdir(_versiones_dir(directorio)))
+            if existe(v, directorio)]
+
+
+def _nueva_version():
+    # Ordenable por fecha y distinta aunque se registren dos en el mismo segundo
+    return f"{time.strftime('%Y%m%d-%H%M%S')}-{os.urandom(2).hex()}"
+
+
+def registrar(modelo, vectorizer, datos=None, promover=True, directorio=MODEL_DIR):
+    """
+    Guarda el modelo y el vectorizador como una version nueva, con `datos` (normas, metricas,
+    tiempos...) en su meta.json, y la promueve si `promover`. Devuelve la version.
+    """
+    version = _nueva_version()
+    destino = ruta_version(version, directorio)
+    tmp = destino + f".tmp{os.getpid()}"
+    os.makedirs(tmp)
+    joblib.dump(modelo, os.path.join(tmp, MODELO_ARCHIVO))
+    joblib.dump(vectorizer, os.path.join(tmp, VECTORIZER_ARCHIVO))
+    # Copia en arrays .npy que los procesos cargan sin deserializar (ver artefactos_compactos)
+    try:
+        artefactos_compactos.exportar(modelo, vectorizer, os.path.join(tmp, COMPACTO_ARCHIVO))
+        compacto = True
+    except ValueError as e:
+        print(f"[AVISO] Version {version} sin artefactos compactos, se cargara desde los pickles: {e}")
+        compacto = False
+    meta = {"version": version, "fecha_entrenamiento": datetime.now().isoformat(timespec="seconds"),
+            "tipo_modelo": type(modelo).__name__, "compacto": compacto, **(datos or {})}
+    _escribir_json(os.path.join(tmp, "meta.json"), meta)
+    os.replace(tmp, destino)
+
+    if promover:
+        promover_version(version, directorio)
+    _purgar(directorio)
+    return version
+
+
+def promover_version(version, directorio=MODEL_DIR):
+    """Apunta el puntero a `version`. Devuelve la version que estaba en uso (o None)."""
+    if not existe(version, directorio):
+        raise ValueError(f"La version '{version}' no existe en el registro.")
+    anterior = version_actual(directorio)
+    if anterior == version:
+        return anterior
+    _escribir_json(_puntero_path(directorio), {
+        "version": version, "anterior": anterior, "promovido": datetime.now().isoformat(timespec="seconds"),
+    })
+    return anterior
+
+
+def revertir(directorio=MODEL_DIR):
+    """
+    Vuelve a la version que estaba en uso antes de la ultima promocion (o, si ya no existe,
+    a la inmediatamente anterior en el registro). Devuelve la version que queda en uso.
+    """
+    puntero = leer_puntero(directorio)
+    if puntero is None:
+        raise ValueError("No hay ninguna version promovida que revertir.")
+    destino = puntero.get("anterior")
+    if not destino or not existe(destino, directorio):
+        anteriores = [m["version"] for m in listar(directorio) if m["version"] < puntero["version"]]
+        if not anteriores:
+            raise ValueError(f"No hay ninguna version anterior a '{puntero['version']}'.")
+        destino = anteriores[-1]
+    promover_version(destino, directorio)
+    return destino
+
+
+def _purgar(directorio=MODEL_DIR):
+    """Borra las versiones mas antiguas por encima de VERSIONES_CONSERVADAS."""
+    puntero = leer_puntero(directorio) or {}
+    protegidas = {puntero.get("version"), puntero.get("anterior")}
+    versiones = [m["version"] for m in listar(directorio)]
+    sobrantes = len(versiones) - VERSIONES_CONSERVADAS
+    for version in versiones:
+        if sobrantes <= 0:
+            break
+        if version not in protegidas:
+            shutil.rmtree(ruta_version(version, directorio), ignore_errors=True)
+            sobrantes -= 1
+
+
+def importar_legado(directorio=MODEL_DIR):
+    """Registra y promueve el modelo de antes del registro (modelos/*.pkl). Devuelve la version o None."""
+    modelo_path = os.path.join(directorio, MODELO_ARCHIVO)
+    vectorizer_path = os.path.join(directorio, VECTORIZER_ARCHIVO)
+    if not (os.path.exists(modelo_path) and os.path.exists(vectorizer_path)):
+        return None
+    return registrar(joblib.load(modelo_path), joblib.load(vectorizer_path),
+                     {"origen": "importado", "archivo": modelo_path}, directorio=directorio)
+
+
+def _imprimir_versiones(directorio=MODEL_DIR):
+    actual = version_actual(directorio)
+    versiones = listar(directorio)
+    if not versiones:
+        print(f"[AVISO] El registro '{_versiones_dir(directorio)}' esta vacio. Ejecuta 'entrenar_modelo.py' primero.")
+        return
+    print(f"{'':2}{'version':<24} {'entrenado':<20} {'modelo':<24} {'normas':>7}  metricas")
+    for meta in versiones:
+        marca = "*" if meta["version"] == actual else ""
+        metricas = ", ".join(f"{k}={v}" for k, v in meta.get("metricas", {}).items())
+        print(f"{marca:<2}{meta['version']:<24} {meta['fecha_entrenamiento']:<20} {meta['tipo_modelo']:<24} "
+              f"{meta.get('normas', '-'):>7}  {metricas}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Versiones del modelo: listar, promover y revertir.")
+    accion = parser.add_mutually_exclusive_group()
+    accion.add_argument("--promover", metavar="VERSION", help="Pone en uso una version del registro.")
+    accion.add_argument("--revertir", action="store_true", help="Vuelve a la version en uso antes de la ultima promocion.")
+    accion.add_argument("--importar-legado", action="store_true",
+                        help=f"Registra el modelo guardado en '{MODEL_DIR}/' antes de existir el registro.")
+    args = parser.parse_args()
+    try:
+        if args.promover:
+            anterior = promover_version(args.promover)
+            print(f"[OK] Version {args.promover} en uso (antes: {anterior}).")
+        elif args.revertir:
+            print(f"[OK] Version {revertir()} en uso de nuevo.")
+        elif args.importar_legado:
+            version = importar_legado()
+            if version is None:
+                print(f"[ERROR] No hay '{MODELO_ARCHIVO}' y '{VECTORIZER_ARCHIVO}' en '{MODEL_DIR}/'.")
+            else:
+                print(f"[OK] Modelo anterior registrado y promovido como version {version}.")
+        _imprimir_versiones()
+    except ValueError as e:
+        print(f"[ERROR] {e}")